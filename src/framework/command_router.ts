@@ -1,6 +1,9 @@
-import { Command, Response, isCommandSystem, isCommandSystemExit, isCommandUI, CommandUI, CommandSystem } from './types/commands'
+import { Command, Response, isCommandSystem, isCommandSystemDonate, isCommandSystemDonateBatch, isCommandSystemExit, isCommandUI, isCommandUITablePage, CommandUI, CommandSystem, PayloadFalse, PayloadTrue } from './types/commands'
 import { CommandHandler, Bridge, VisualisationEngine } from './types/modules'
 
+const payloadTrue: PayloadTrue = { __type__: 'PayloadTrue', value: true }
+const payloadFalse: PayloadFalse = { __type__: 'PayloadFalse', value: false }
+
 export default class CommandRouter implements CommandHandler {
   bridge: Bridge
   visualisationEngine: VisualisationEngine
@@ -23,12 +26,29 @@ export default class CommandRouter implements CommandHandler {
   }
 
   onCommandSystem (command: CommandSystem, resolve: (response: Response) => void): void {
-    this.bridge.send(command)
+    if (isCommandSystemDonate(command) && command.chunk !== undefined && this.bridge.sendChunk !== undefined) {
+      // The script resends chunks that are answered with PayloadFalse
+      this.bridge.sendChunk(command).then(
+        (delivered) => { resolve({ __type__: 'Response', command, payload: delivered ? payloadTrue : payloadFalse }) },
+        () => { resolve({ __type__: 'Response', command, payload: payloadFalse }) }
+      )
+      return
+    }
+
+    if (isCommandSystemDonateBatch(command)) {
+      // Bridges receive the donations one by one, the batch only saves round trips to the worker
+      command.donations.forEach((donation) => this.bridge.send(donation))
+    } else {
+      this.bridge.send(command)
+    }
     resolve({ __type__: 'Response', command, payload: { __type__: 'PayloadVoid', value: undefined } })
   }
 
   onCommandUI (command: CommandUI, reject: (reason?: any) => void): void {
-    this.visualisationEngine.render(command).then(
+    const rendered = isCommandUITablePage(command)
+      ? this.visualisationEngine.renderTablePage(command)
+      : this.visualisationEngine.render(command)
+    rendered.then(
       (response) => { reject(response) },
       () => {}
     )
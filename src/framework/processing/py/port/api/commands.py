@@ -11,6 +11,29 @@ class CommandUIRender:
         return dict
 
 
+class CommandUITablePage:
+    """
+    Page of a paged consent form table, sent in response to a PayloadTablePageRequest
+    """
+    __slots__ = "table", "page"
+
+    def __init__(self, table, page):
+        self.table = table
+        self.page = page
+
+    def toDict(self):
+        dict = {}
+        dict["__type__"] = "CommandUITablePage"
+        dict["table_id"] = self.table.id
+        dict["page"] = self.page
+        dict["page_count"] = self.table.page_count()
+        dict.update(self.table.encode_rows(self.table.page(self.page)))
+        if self.page == 0:
+            # A deferred table is sent without aggregates, they are known once its first page is requested
+            dict["aggregates"] = self.table.aggregates()
+        return dict
+
+
 class CommandSystemDonate:
     __slots__ = "key", "json_string"
 
@@ -26,6 +49,39 @@ class CommandSystemDonate:
         return dict
 
 
+class CommandSystemDonateChunk(CommandSystemDonate):
+    """
+    Part of a chunked donation, hosts can respond with PayloadFalse to have it resent
+    """
+    __slots__ = "index", "sha256"
+
+    def __init__(self, key, json_string, index, sha256):
+        super().__init__(key, json_string)
+        self.index = index
+        self.sha256 = sha256
+
+    def toDict(self):
+        dict = super().toDict()
+        dict["chunk"] = {"index": self.index, "sha256": self.sha256}
+        return dict
+
+
+class CommandSystemDonateBatch:
+    """
+    Donations the script sends to the host at once, a chunk of a chunked donation cannot be part of a batch
+    """
+    __slots__ = "donations",
+
+    def __init__(self, donations):
+        self.donations = donations
+
+    def toDict(self):
+        dict = {}
+        dict["__type__"] = "CommandSystemDonateBatch"
+        dict["donations"] = [donation.toDict() for donation in self.donations]
+        return dict
+
+
 class CommandSystemExit:
     __slots__ = "code", "info"
 
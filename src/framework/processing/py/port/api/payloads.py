@@ -0,0 +1,20 @@
+from typing import Any
+
+
+class Payload:
+    """
+    Payload the host responds with, the script accesses __type__ and value as attributes.
+    In the browser payloads are JavaScript objects, this class is used where the
+    script or another host has to create a payload itself.
+    """
+    __slots__ = "__type__", "value"
+
+    def __init__(self, type: str, value: Any = None):
+        self.__type__ = type
+        self.value = value
+
+    @staticmethod
+    def from_dict(data: dict[str, Any] | None) -> "Payload | None":
+        if data is None:
+            return None
+        return Payload(data.get("__type__", "PayloadVoid"), data.get("value"))
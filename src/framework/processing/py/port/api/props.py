@@ -1,8 +1,14 @@
-from dataclasses import dataclass
-from typing import Optional, TypedDict
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional, TypedDict
+import logging
+import math
+import random
 
+import numpy as np
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class Translations:
@@ -99,6 +105,70 @@ class PropsUIPromptConfirm:
         return dict
 
 
+def to_columns(df: pd.DataFrame) -> list[dict]:
+    """
+    Convert a pd.DataFrame to a list of columns backed by contiguous arrays.
+
+    Pyodide converts objects supporting the buffer protocol to typed arrays with a single copy,
+    this is much cheaper than serializing to and parsing from json.
+    Cells decode to the same values the json transport gives:
+
+    * "number": float64 values, NaN for missing values, rounded to 10 decimals like pd.DataFrame.to_json.
+    * "bool": uint8 values.
+    * "datetime": float64 milliseconds since epoch, NaN for missing values.
+    * "dictionary": int32 codes into a list of unique values, -1 for missing values.
+
+    Args:
+        df (pd.DataFrame): The table to convert.
+
+    Returns:
+        list[dict]: Per column its name, kind and values, and for dictionary encoded columns the dictionary.
+    """
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        column = {"name": str(name)}
+        if pd.api.types.is_bool_dtype(series.dtype):
+            column["kind"] = "bool"
+            column["values"] = np.ascontiguousarray(series.to_numpy(dtype=np.uint8))
+        elif pd.api.types.is_numeric_dtype(series.dtype):
+            column["kind"] = "number"
+            column["values"] = np.ascontiguousarray(np.round(series.to_numpy(dtype=np.float64, na_value=np.nan), 10))
+        elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+            column["kind"] = "datetime"
+            # Same instant in UTC, as the json transport gives
+            milliseconds = series.dt.tz_convert(None) if getattr(series.dt, "tz", None) else series
+            milliseconds = (milliseconds - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+            column["values"] = np.ascontiguousarray(milliseconds.to_numpy(dtype=np.float64, na_value=np.nan))
+        else:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            column["kind"] = "dictionary"
+            column["values"] = np.ascontiguousarray(codes.astype(np.int32))
+            column["dictionary"] = uniques.tolist()
+        columns.append(column)
+    return columns
+
+
+def _allocate(size: int, counts: list[int]) -> list[int]:
+    """
+    Divides size over groups in proportion to their counts, with the largest remainder method.
+    Every group gets at least one if size allows, so small groups are not left out.
+    """
+    minimum = 1 if len(counts) <= size else 0
+    rest = [count - minimum for count in counts]
+    size -= minimum * len(counts)
+    total = sum(rest)
+    if total == 0:
+        return [minimum] * len(counts)
+
+    quotas = [size * count / total for count in rest]
+    allocation = [math.floor(quota) for quota in quotas]
+    by_remainder = sorted(range(len(counts)), key=lambda i: allocation[i] - quotas[i])
+    for i in by_remainder[:size - sum(allocation)]:
+        allocation[i] += 1
+    return [minimum + a for a in allocation]
+
+
 @dataclass
 class PropsUIPromptConsentFormTable:
     """
@@ -107,19 +177,178 @@ class PropsUIPromptConsentFormTable:
     Attributes:
         id (str): A unique string to identify the table after donation.
         title (Translatable): Title of the table.
-        data_frame (pd.DataFrame): Table to be shown.
+        data_frame (pd.DataFrame | Callable[[], pd.DataFrame] | Iterable[pd.DataFrame]): Table to be shown.
+            Can be deferred: a callable returning the table, or an iterable of batches of rows.
+            A deferred table is evaluated when it is serialized or its first page is requested,
+            and then cached. A folded paged table that is deferred is only evaluated when the participant
+            opens it, if they never do it is donated without rows.
         description (Optional[Translatable]): Optional description of the table.
         visualizations (Optional[list]): Optional visualizations to be shown.
         folded (Optional[bool]): Whether the table should be initially folded.
         delete_option (Optional[bool]): Whether to show a delete option for the table.
+        transport (Optional[str]): "json" sends the rows as a json string, "columnar" sends every column as
+            a contiguous array which Pyodide hands to JavaScript as a typed array, see to_columns.
+        preview_size (Optional[int]): If set and the table has more rows, the consent form shows a sample of
+            preview_size rows together with aggregates over all rows. The donation contains
+            all rows, except for the rows the participant deleted from the sample.
+            The visualizations are computed by the consent form, so they only show the sample.
+        preview_strata (Optional[str]): Column to stratify the sample on, every value of the column is
+            represented, in proportion to its number of rows.
+        preview_seed (int): Seed of the sample, the same table always gives the same sample.
+        page_size (Optional[int]): If set, the consent form receives the shown rows page_size rows at a time,
+            further pages are sent when the participant asks for them, see port_helpers.serve_consent_form.
+            The donation contains all rows, also the ones on pages that were never loaded,
+            except for the rows the participant deleted.
     """
     id: str
     title: Translatable
-    data_frame: pd.DataFrame
+    data_frame: pd.DataFrame | Callable[[], pd.DataFrame] | Iterable[pd.DataFrame]
     description: Optional[Translatable] = None
     visualizations: Optional[list] = None
     folded: Optional[bool] = False
     delete_option: Optional[bool] = True
+    transport: Optional[str] = "json"
+    preview_size: Optional[int] = None
+    preview_strata: Optional[str] = None
+    preview_seed: int = 0
+    page_size: Optional[int] = None
+    _preview_rows: Optional[list[int]] = field(default=None, init=False, repr=False, compare=False)
+
+    def is_materialized(self) -> bool:
+        """
+        Whether the table has been evaluated.
+        """
+        return isinstance(self.data_frame, pd.DataFrame)
+
+    def materialize(self) -> pd.DataFrame:
+        """
+        Evaluate a deferred table and cache the result.
+
+        Returns:
+            pd.DataFrame: The table, an empty pd.DataFrame if it could not be evaluated.
+        """
+        if isinstance(self.data_frame, pd.DataFrame):
+            return self.data_frame
+
+        source = self.data_frame
+        try:
+            if callable(source):
+                df = source()
+            else:
+                batches = list(source)
+                df = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+        except MemoryError:
+            raise
+        except Exception as e:
+            logger.error("Could not evaluate table %s: %s", self.id, e)
+            df = pd.DataFrame()
+
+        self.data_frame = df
+        return df
+
+    def sends_first_page(self) -> bool:
+        """
+        Whether rows are sent with the consent form, a folded paged table that is deferred is sent without rows.
+        """
+        return not (self.page_size and self.folded and not self.is_materialized())
+
+    def is_sampled(self) -> bool:
+        """
+        Whether the consent form shows a sample of the table instead of all rows.
+        """
+        return bool(self.preview_size) and len(self.materialize()) > self.preview_size
+
+    def preview_rows(self) -> list[int]:
+        """
+        Positions of the rows in the sample, in ascending order so the sample keeps the order of the table.
+
+        Returns:
+            list[int]: The positions, all positions if the table is not sampled.
+        """
+        if self._preview_rows is not None:
+            return self._preview_rows
+
+        df = self.materialize()
+        if not self.is_sampled():
+            return list(range(len(df)))
+
+        rng = random.Random(self.preview_seed)
+        if self.preview_strata is None:
+            rows = rng.sample(range(len(df)), self.preview_size)
+        elif self.preview_strata not in df.columns:
+            logger.error("Table %s has no column %s to stratify on", self.id, self.preview_strata)
+            rows = rng.sample(range(len(df)), self.preview_size)
+        else:
+            rows = []
+            strata = list(df.groupby(self.preview_strata, sort=False, dropna=False).indices.values())
+            quotas = _allocate(self.preview_size, [len(positions) for positions in strata])
+            for positions, quota in zip(strata, quotas):
+                rows.extend(rng.sample(positions.tolist(), quota))
+
+        self._preview_rows = sorted(rows)
+        return self._preview_rows
+
+    def preview(self) -> pd.DataFrame:
+        """
+        The rows in the sample, indexed from 0.
+        """
+        return self.materialize().iloc[self.preview_rows()].reset_index(drop=True)
+
+    def page_count(self) -> int:
+        """
+        Number of pages of the shown rows, 1 if the table is not paged.
+        """
+        if not self.page_size:
+            return 1
+        return max(math.ceil(len(self.preview_rows()) / self.page_size), 1)
+
+    def page_rows(self, page: int) -> list[int]:
+        """
+        Positions of the rows on a page, in ascending order.
+        Pages divide the shown rows, so the rows in the sample if the table is sampled.
+        """
+        rows = self.preview_rows()
+        if not self.page_size:
+            return rows
+        return rows[page * self.page_size:(page + 1) * self.page_size]
+
+    def page(self, page: int) -> pd.DataFrame:
+        """
+        The rows on a page, indexed from 0.
+        """
+        if not self.page_size and not self.is_sampled():
+            return self.materialize()
+        return self.materialize().iloc[self.page_rows(page)].reset_index(drop=True)
+
+    def encode_rows(self, df: pd.DataFrame) -> dict:
+        """
+        Encodes rows of the table for the consent form according to the transport.
+
+        Returns:
+            dict: The data_frame and for the columnar transport the columns.
+        """
+        if self.transport == "columnar":
+            return {"data_frame": None, "columns": to_columns(df)}
+        return {"data_frame": df.to_json()}
+
+    def aggregates(self) -> dict:
+        """
+        Aggregates over all rows of the table, so they do not depend on the rows that were sent.
+
+        Returns:
+            dict: The total number of rows, and the sum, mean, min and max of every numeric column.
+        """
+        df = self.materialize()
+        columns = {}
+        for column in df.select_dtypes(include="number").columns:
+            series = df[column]
+            columns[str(column)] = {
+                "sum": float(series.sum()),
+                "mean": float(series.mean()) if len(series) else None,
+                "min": float(series.min()) if len(series) else None,
+                "max": float(series.max()) if len(series) else None,
+            }
+        return {"total_rows": len(df), "columns": columns}
 
     def toDict(self):
         """
@@ -132,11 +361,20 @@ class PropsUIPromptConsentFormTable:
         dict["__type__"] = "PropsUIPromptConsentFormTable"
         dict["id"] = self.id
         dict["title"] = self.title.toDict()
-        dict["data_frame"] = self.data_frame.to_json()
+        # page_count and aggregates are unknown until a folded deferred table is opened
+        sends_first_page = self.sends_first_page()
+        dict.update(self.encode_rows(self.page(0) if sends_first_page else pd.DataFrame()))
         dict["description"] = self.description.toDict() if self.description else None
         dict["visualizations"] = self.visualizations if self.visualizations else None
         dict["folded"] = self.folded
         dict["delete_option"] = self.delete_option
+        if self.preview_size:
+            dict["preview_size"] = self.preview_size
+        if self.page_size:
+            dict["page_size"] = self.page_size
+            dict["page_count"] = self.page_count() if sends_first_page else None
+        if self.preview_size or self.page_size:
+            dict["aggregates"] = self.aggregates() if sends_first_page else None
         return dict
 
 
@@ -170,6 +408,18 @@ class PropsUIPromptConsentForm:
             output.append(table.toDict())
         return output
 
+    def find_table(self, table_id: str) -> Optional[PropsUIPromptConsentFormTable]:
+        """
+        Find a table or meta table by its id.
+
+        Returns:
+            Optional[PropsUIPromptConsentFormTable]: The table, or None if there is no table with that id.
+        """
+        for table in self.tables + self.meta_tables:
+            if table.id == table_id:
+                return table
+        return None
+
     def translate_meta_tables(self):
         """
         Translate the meta tables to a list of dictionaries.
@@ -475,6 +725,7 @@ class PropsUIPageDonation:
         return dict
 
 
+@dataclass
 class PropsUIPageEnd:
     """
     An ending page to show the user they are done.
@@ -0,0 +1,306 @@
+"""
+Offline batch processing of DDPs
+
+Researchers sometimes receive DDPs through other channels than the donation flow.
+This module runs the exact same extraction as the donation flow over a directory
+of zipfiles, using a process pool so throughput scales with the number of cores.
+
+For every zipfile a json file is written containing the donations, shaped like
+CommandSystemDonate. The json_string of each donation is identical to the one a
+participant donates when they do not delete any rows.
+
+Usage:
+    python -m port.batch <input_dir> <output_dir> --platform netflix --workers 4 --timeout 600
+
+With --platform auto the platform of every zipfile is detected with port.platforms.registry.
+
+A zipfile that takes longer than --timeout seconds is reported as TIMEOUT. The worker
+processing it is killed and replaced, as the extraction cannot be stopped halfway
+without giving partial results. A worker that dies, for example because it ran out of
+memory, is replaced as well and its zipfile is reported as ERROR.
+"""
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+from typing import Callable
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+import port.donation as donation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SECONDS = 600
+
+
+@dataclass
+class BatchResult:
+    """
+    Result of processing a single DDP
+
+    Attributes:
+        file (str): Name of the zipfile.
+        platform (str): Platform the DDP was processed as.
+        status (str): "DONATED", "INVALID_DDP", "NO_DATA", "TIMEOUT" or "ERROR".
+        donations (list[dict[str, str]]): Donations shaped as CommandSystemDonate, without the __type__.
+        error (str): Error message in case of failure.
+        duration (float): Processing time in seconds.
+    """
+    file: str
+    platform: str
+    status: str
+    donations: list[dict[str, str]] = field(default_factory=list)
+    error: str = ""
+    duration: float = 0.0
+
+
+def extract_netflix(path: str, key: str) -> tuple[str, list[dict[str, str]]]:
+    """
+    Runs the Netflix extraction of port.script for every profile in the DDP
+    """
+    import port.netflix as netflix
+    import port.script as script
+    from port.memory import MemoryGovernor
+
+    validation = netflix.validate_zip(path)
+    if validation.ddp_category is None:
+        return "INVALID_DDP", []
+
+    donations = []
+    for user in script.extract_users(path, MemoryGovernor()):
+        # Every profile gets the full budget, as in the donation flow where a participant picks one profile
+        tables = script.extract_netflix(path, user, MemoryGovernor())
+        donations.append({
+            "key": f"{key}-Netflix-{user}",
+            "json_string": donation.consent_form_to_json_string(tables),
+        })
+
+    return ("DONATED" if donations else "NO_DATA"), donations
+
+
+def extract_chatgpt(path: str, key: str) -> tuple[str, list[dict[str, str]]]:
+    """
+    Runs the ChatGPT extraction of port.platforms.chatgpt
+    """
+    import port.platforms.chatgpt as chatgpt
+    import port.helpers.validate as validate
+
+    validation = validate.validate_zip(chatgpt.DDP_CATEGORIES, path)
+    if validation.get_status_code_id() != 0:
+        return "INVALID_DDP", []
+
+    tables = chatgpt.extraction(path)
+    if not tables:
+        return "NO_DATA", []
+
+    return "DONATED", [{
+        "key": f"{key}-ChatGPT",
+        "json_string": donation.consent_form_to_json_string(tables),
+    }]
+
+
+PLATFORMS: dict[str, Callable[[str, str], tuple[str, list[dict[str, str]]]]] = {
+    "netflix": extract_netflix,
+    "chatgpt": extract_chatgpt,
+}
+
+
+AUTO_DETECT = "auto"
+
+
+def process_file(path: str, platform: str) -> BatchResult:
+    """
+    Processes a single DDP, runs inside a worker process
+    """
+    start = time.perf_counter()
+    result = BatchResult(file=Path(path).name, platform=platform, status="ERROR")
+
+    try:
+        if platform == AUTO_DETECT:
+            import port.platforms.registry as registry
+
+            detection = registry.detect(path)
+            if detection is None:
+                result.status = "INVALID_DDP"
+                result.duration = time.perf_counter() - start
+                return result
+            platform = result.platform = detection.platform.name
+        result.status, result.donations = PLATFORMS[platform](path, Path(path).stem)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def _worker_main(conn: Connection, platform: str) -> None:
+    """
+    Main loop of a worker process, processes the DDPs the parent sends until it sends None
+    """
+    while True:
+        path = conn.recv()
+        if path is None:
+            break
+        conn.send(process_file(path, platform))
+
+
+@dataclass
+class _Worker:
+    """
+    A worker process, the connection to it and the DDP it is processing
+    """
+    process: multiprocessing.Process
+    conn: Connection
+    path: str | None = None
+    start: float = 0.0
+
+    @staticmethod
+    def spawn(platform: str) -> "_Worker":
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_worker_main, args=(child_conn, platform), daemon=True)
+        process.start()
+        # Only the worker holds the other end, so recv raises EOFError when the worker dies
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def submit(self, path: str) -> None:
+        self.path = path
+        self.start = time.perf_counter()
+        self.conn.send(path)
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+def write_result(result: BatchResult, output_dir: Path) -> Path:
+    """
+    Writes the result of a single DDP to output_dir
+    """
+    output_path = output_dir / f"{Path(result.file).stem}.json"
+    with open(output_path, "w", encoding="utf8") as f:
+        json.dump(asdict(result), f, ensure_ascii=False)
+    return output_path
+
+
+def run(
+    input_dir: str,
+    output_dir: str,
+    platform: str = "netflix",
+    workers: int | None = None,
+    timeout: float = DEFAULT_TIMEOUT_SECONDS,
+) -> list[BatchResult]:
+    """
+    Processes all zipfiles in input_dir in a process pool and writes the results to output_dir
+
+    Args:
+        input_dir (str): Directory containing the zipfiles.
+        output_dir (str): Directory to write a json file per zipfile to.
+        platform (str): One of the keys of PLATFORMS, or "auto" to detect the platform of every zipfile.
+        workers (int | None): Number of worker processes, defaults to the number of cores.
+        timeout (float): Maximum number of seconds to spend on a single zipfile, 0 for no limit.
+
+    Returns:
+        list[BatchResult]: The results, in order of completion.
+    """
+    if platform not in PLATFORMS and platform != AUTO_DETECT:
+        raise ValueError(f"Unknown platform: {platform}, choose from {', '.join(PLATFORMS)}")
+
+    paths = sorted(str(p) for p in Path(input_dir).glob("*.zip"))
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    pending = deque(paths)
+    pool = [_Worker.spawn(platform) for _ in range(min(workers or os.cpu_count() or 1, len(paths)))]
+    try:
+        while pending or any(worker.path for worker in pool):
+            for worker in pool:
+                if worker.path is None and pending:
+                    worker.submit(pending.popleft())
+
+            busy = [worker for worker in pool if worker.path is not None]
+            wait_for = None
+            if timeout > 0:
+                wait_for = max(min(worker.start for worker in busy) + timeout - time.perf_counter(), 0)
+            ready = wait([worker.conn for worker in busy], wait_for)
+
+            for i, worker in enumerate(pool):
+                if worker.path is None:
+                    continue
+
+                duration = time.perf_counter() - worker.start
+                if worker.conn in ready:
+                    try:
+                        result = worker.conn.recv()
+                    except EOFError:
+                        # The worker process died, for example because it ran out of memory
+                        worker.kill()
+                        result = BatchResult(
+                            file=Path(worker.path).name, platform=platform, status="ERROR",
+                            error=f"Worker process exited with code {worker.process.exitcode}", duration=duration,
+                        )
+                        pool[i] = _Worker.spawn(platform)
+                elif timeout > 0 and duration >= timeout:
+                    # The extraction cannot be interrupted from the inside without leaving it half done,
+                    # the worker is replaced instead
+                    worker.kill()
+                    result = BatchResult(
+                        file=Path(worker.path).name, platform=platform, status="TIMEOUT",
+                        error=f"Processing took longer than {timeout} seconds", duration=duration,
+                    )
+                    pool[i] = _Worker.spawn(platform)
+                else:
+                    continue
+
+                worker.path = None
+                write_result(result, out)
+                logger.info("%s: %s in %.2f seconds", result.file, result.status, result.duration)
+                results.append(result)
+    finally:
+        for worker in pool:
+            if worker.path is None:
+                worker.stop()
+            else:
+                worker.kill()
+
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the port extraction over a directory of DDPs")
+    parser.add_argument("input_dir", help="Directory containing the zipfiles")
+    parser.add_argument("output_dir", help="Directory to write the donations to")
+    parser.add_argument("--platform", choices=sorted(PLATFORMS) + [AUTO_DETECT], default="netflix")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes, defaults to the number of cores")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS, help="Maximum number of seconds per zipfile")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s --- %(name)s --- %(levelname)s --- %(message)s", force=True)
+    results = run(args.input_dir, args.output_dir, args.platform, args.workers, args.timeout)
+
+    statuses: dict[str, int] = {}
+    for result in results:
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+    logger.info("Processed %s files: %s", len(results), statuses)
+
+
+if __name__ == "__main__":
+    main()
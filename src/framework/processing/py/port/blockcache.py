@@ -0,0 +1,137 @@
+"""
+Read-ahead, block-aligned buffering of uploaded files
+
+In the browser the uploaded file is mounted with WORKERFS, every read on it
+becomes a File.slice call across the JavaScript boundary. zipfile makes many
+small reads and seeks: local headers, the central directory and compressed data
+in chunks of a few KB. BlockCacheFile serves these from a small LRU of aligned
+blocks, and fills missing blocks with one large read that includes the blocks
+after it, so reading a member from start to end costs a few reads instead of
+thousands.
+"""
+from collections import OrderedDict
+from typing import Any
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+# At most DEFAULT_MAX_BLOCKS * DEFAULT_BLOCK_SIZE bytes are cached per open file
+DEFAULT_MAX_BLOCKS = 16
+# Number of blocks read at once on a miss
+DEFAULT_READ_AHEAD = 4
+
+
+class BlockCacheFile(io.RawIOBase):
+    """
+    Read-only file object that reads its underlying file in aligned blocks and caches the most recent ones
+
+    Args:
+        raw (Any): Seekable binary file object to read from.
+        block_size (int): Size of a block in bytes.
+        max_blocks (int): Number of blocks to keep, the least recently used block is dropped first.
+        read_ahead (int): Number of consecutive blocks to read when a block is missing.
+
+    Attributes:
+        raw_reads (int): Number of reads on the underlying file.
+    """
+    def __init__(
+        self,
+        raw: Any,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        max_blocks: int = DEFAULT_MAX_BLOCKS,
+        read_ahead: int = DEFAULT_READ_AHEAD,
+    ):
+        super().__init__()
+        self.raw = raw
+        self.block_size = block_size
+        self.max_blocks = max(max_blocks, read_ahead, 1)
+        self.read_ahead = max(read_ahead, 1)
+        self.raw_reads = 0
+        self._size = raw.seek(0, io.SEEK_END)
+        self._position = 0
+        self._blocks: OrderedDict[int, bytes] = OrderedDict()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+
+        if position < 0:
+            # Same as a file on disk, zipfile relies on this for files smaller than an end of central directory record
+            raise OSError(f"Negative seek position {position}")
+        self._position = position
+        return position
+
+    def readinto(self, buffer: Any) -> int:
+        out = memoryview(buffer).cast("B")
+        n = max(min(len(out), self._size - self._position), 0)
+
+        written = 0
+        while written < n:
+            index, start = divmod(self._position, self.block_size)
+            block = self._block(index)
+            chunk = block[start:start + n - written]
+            if not chunk:
+                # The file got shorter than it was when it was opened
+                break
+            out[written:written + len(chunk)] = chunk
+            written += len(chunk)
+            self._position += len(chunk)
+
+        return written
+
+    def _block(self, index: int) -> bytes:
+        block = self._blocks.get(index)
+        if block is not None:
+            self._blocks.move_to_end(index)
+            return block
+
+        # Coalesce the missing block with the missing blocks after it into a single read
+        count = 1
+        while (
+            count < self.read_ahead
+            and index + count not in self._blocks
+            and (index + count) * self.block_size < self._size
+        ):
+            count += 1
+
+        self.raw.seek(index * self.block_size)
+        data = self.raw.read(count * self.block_size)
+        self.raw_reads += 1
+
+        for i in range(count):
+            self._blocks[index + i] = data[i * self.block_size:(i + 1) * self.block_size]
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+        return self._blocks[index]
+
+    def close(self) -> None:
+        if not self.closed:
+            logger.debug("Closed after %s reads of %s bytes", self.raw_reads, self.block_size)
+            self._blocks.clear()
+            self.raw.close()
+        super().close()
+
+
+def open_upload(path: str) -> BlockCacheFile:
+    """
+    Opens an uploaded file for reading through a BlockCacheFile
+    """
+    return BlockCacheFile(open(path, "rb", buffering=0))
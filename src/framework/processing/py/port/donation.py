@@ -0,0 +1,661 @@
+"""
+Contains functions to shape donations
+
+The consent form in the browser turns the tables it received into the json string
+that is donated. The functions in this module do the same in Python, so donations
+produced outside of the browser are identical to the ones participants donate.
+
+Donations can optionally be compressed before they are sent. A compressed donation
+is a json object describing how it was encoded, so the storage side can decode it:
+
+    {"__type__": "CompressedDonation", "codec": "gzip", "transfer": "base64", "original_size": 1234, "data": "H4sI..."}
+
+Use decompress_json_string to get the original json string back.
+
+Large donations are split into numbered chunks, every chunk is donated under its own key
+followed by a manifest with the checksum of every chunk:
+
+    {"__type__": "ChunkedDonation", "key": "123-Netflix", "codec": null, "transfer": null,
+     "size": 4096, "sha256": "...", "chunks": [{"index": 0, "key": "123-Netflix-part-00000", ...}]}
+
+Use join_chunks to reassemble the original json string.
+"""
+from decimal import Decimal
+from typing import Any, Generator, Iterable, Iterator
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import math
+import zlib
+
+import pandas as pd
+
+import port.api.props as props
+from port.api.commands import CommandSystemDonate, CommandSystemDonateChunk
+
+logger = logging.getLogger(__name__)
+
+# Keys JavaScript treats as array indices, these come first in object key order
+_MAX_ARRAY_INDEX = 2**32 - 2
+
+
+def _is_array_index(key: str) -> bool:
+    return key.isdigit() and str(int(key)) == key and int(key) <= _MAX_ARRAY_INDEX
+
+
+def js_key_order(keys: list[str]) -> list[str]:
+    """
+    Orders object keys the way JavaScript does:
+    array indices in ascending order first, then all other keys in insertion order
+    """
+    indices = sorted((k for k in keys if _is_array_index(k)), key=int)
+    others = [k for k in keys if not _is_array_index(k)]
+    return indices + others
+
+
+def js_string(value: Any) -> str:
+    """
+    Converts a value parsed from json to a string, the way String() does in JavaScript
+    """
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return _js_number(value)
+    if isinstance(value, list):
+        return ",".join("" if v is None else js_string(v) for v in value)
+    if isinstance(value, dict):
+        return "[object Object]"
+    return str(value)
+
+
+def _js_number(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "Infinity" if value > 0 else "-Infinity"
+    if value == 0:
+        return "0"
+    if value.is_integer() and abs(value) < 1e21:
+        return str(int(value))
+
+    # repr gives the shortest round trip representation, as does JavaScript
+    # only the exponent notation differs
+    digits = repr(value)
+    if "e" in digits:
+        mantissa, exponent = digits.split("e")
+        exponent_value = int(exponent)
+        if -7 < exponent_value < 21:
+            return format(Decimal(digits), "f")
+        mantissa = mantissa.rstrip("0").rstrip(".") if "." in mantissa else mantissa
+        sign = "+" if exponent_value > 0 else "-"
+        return f"{mantissa}e{sign}{abs(exponent_value)}"
+    return digits
+
+
+_encode_string = json.encoder.encode_basestring
+
+# Same as json.dumps(value, ensure_ascii=False, separators=(",", ":")) without creating an encoder per call
+_JS_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def js_json_dumps(value: Any) -> str:
+    """
+    Serializes a value the way JSON.stringify does in JavaScript
+    """
+    return _JS_JSON_ENCODER.encode(value)
+
+
+def table_to_rows(table: props.PropsUIPromptConsentFormTable) -> list[dict[str, str]]:
+    """
+    Converts a consent form table to the rows the consent form donates
+    """
+    return data_frame_json_to_rows(table.materialize().to_json())
+
+
+def data_frame_json_to_rows(data_frame_json: str) -> list[dict[str, str]]:
+    """
+    Converts the data_frame of a serialized consent form table to the rows the consent form donates
+    """
+    data_frame = json.loads(data_frame_json)
+    columns = js_key_order(list(data_frame.keys()))
+    if not columns:
+        return []
+
+    # The consent form looks rows up by position, not by index label
+    n_rows = len(data_frame[columns[0]])
+    return [
+        {column: _cell(data_frame[column], str(row)) for column in columns}
+        for row in range(n_rows)
+    ]
+
+
+def columns_to_rows(columns: list[dict[str, Any]]) -> list[dict[str, str]]:
+    """
+    Converts the columns of a consent form table sent with the columnar transport to the rows the consent form donates
+    Mirrors decodeColumns in consent_form.tsx
+    """
+    if not columns:
+        return []
+
+    names = js_key_order([column["name"] for column in columns])
+    cells = {column["name"]: [_columnar_cell(column, value) for value in column["values"]] for column in columns}
+    n_rows = len(columns[0]["values"])
+    return [{name: cells[name][row] for name in names} for row in range(n_rows)]
+
+
+def _columnar_cell(column: dict[str, Any], value: Any) -> str:
+    kind = column["kind"]
+    if kind == "dictionary":
+        return "null" if value < 0 else js_string(column["dictionary"][int(value)])
+    if kind == "bool":
+        return js_string(bool(value))
+    if value is None or math.isnan(value):
+        return "null"
+    return js_string(float(value))
+
+
+def _cell(column: dict[str, Any], row: str) -> str:
+    if row not in column:
+        return "undefined"
+    return js_string(column[row])
+
+
+def iter_consent_form_json(
+    tables: list[props.PropsUIPromptConsentFormTable],
+    meta_tables: list[props.PropsUIPromptConsentFormTable] | None = None,
+) -> Iterator[str]:
+    """
+    Yields the json string the consent form donates in parts, row by row
+    Joined together the parts are equal to consent_form_to_json_string
+    """
+    yield "["
+    for table in tables + (meta_tables or []):
+        yield "{" + js_json_dumps(table.id) + ":["
+        for i, row in enumerate(table_to_rows(table)):
+            yield ("," if i > 0 else "") + js_json_dumps(row)
+        yield "]},"
+    yield js_json_dumps({"user_omissions": js_json_dumps([])})
+    yield "]"
+
+
+def consent_form_to_json_string(
+    tables: list[props.PropsUIPromptConsentFormTable],
+    meta_tables: list[props.PropsUIPromptConsentFormTable] | None = None,
+) -> str:
+    """
+    Produces the json string the consent form donates when the participant
+    does not delete any rows and presses the donate button
+    """
+    return "".join(iter_consent_form_json(tables, meta_tables))
+
+
+def merge_shown_rows(full_rows: list[dict[str, str]], shown: list[int], donated_rows: list[dict[str, str]]) -> list[dict[str, str]]:
+    """
+    Maps the rows a participant donated from a part of a table back onto the full table
+
+    The participant was shown the rows at positions shown and donated donated_rows,
+    which are the shown rows minus the ones they deleted, in the same order.
+    Rows that were not shown are donated in full, rows that were shown but deleted are left out.
+
+    Args:
+        full_rows (list[dict[str, str]]): All rows of the table, as returned by table_to_rows.
+        shown (list[int]): Positions in full_rows of the rows that were shown, in ascending order.
+        donated_rows (list[dict[str, str]]): The rows the consent form donated for this table.
+
+    Returns:
+        list[dict[str, str]]: The rows to donate.
+    """
+    deleted = _deleted_positions(full_rows.__getitem__, shown, donated_rows)
+    if deleted is None:
+        return donated_rows
+    return [row for position, row in enumerate(full_rows) if position not in deleted]
+
+
+def _deleted_positions(row_at, shown: list[int], donated_rows: list[dict[str, str]]) -> set[int] | None:
+    """
+    Positions of the shown rows the participant deleted, None if the donated rows are not the shown rows
+    """
+    kept = set()
+    j = 0
+    for position in shown:
+        if j < len(donated_rows) and donated_rows[j] == row_at(position):
+            kept.add(position)
+            j += 1
+
+    if j < len(donated_rows):
+        # Never donate more than the participant agreed to
+        logger.error("Donated rows do not match the rows that were shown, donating the shown rows only")
+        return None
+    return set(shown) - kept
+
+
+class _EncodedTable:
+    """
+    The cells of a table as the consent form shows them, encoded once per column
+
+    Cells are converted the same way the transport of the table sends them, so they are equal to
+    the rows the consent form donates. Columns of objects convert every distinct value once,
+    and no dict is built per row.
+    """
+
+    def __init__(self, table: props.PropsUIPromptConsentFormTable):
+        df = table.materialize()
+        if table.transport == "columnar":
+            columns = {column["name"]: _columnar_strings(column) for column in props.to_columns(df)}
+        else:
+            columns = {str(name): _json_strings(df[name]) for name in df.columns}
+
+        self.names = js_key_order(list(columns))
+        self.n_rows = len(df)
+        # Per column the codes of its cells, None if every cell has its own string, and per code the string
+        # and the json fragment of the cell
+        self.codes = []
+        self.strings = []
+        self.fragments = []
+        for name in self.names:
+            codes, strings = columns[name]
+            key = js_json_dumps(name) + ":"
+            self.codes.append(codes)
+            self.strings.append(strings)
+            self.fragments.append([key + _encode_string(string) for string in strings])
+
+    def row(self, position: int) -> dict[str, str]:
+        return {
+            name: strings[position if codes is None else codes[position]]
+            for name, codes, strings in zip(self.names, self.codes, self.strings)
+        }
+
+    def row_json(self, position: int) -> str:
+        return "{" + ",".join(
+            fragments[position if codes is None else codes[position]]
+            for codes, fragments in zip(self.codes, self.fragments)
+        ) + "}"
+
+
+def _json_strings(series) -> tuple[list[int] | None, list[str]]:
+    """
+    Codes into the distinct cells of a column, as the json transport shows them
+    """
+    if series.dtype == object or isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(series.dtype):
+        try:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        except TypeError:
+            # Unhashable cells such as lists are converted one by one
+            codes = None
+        if codes is not None:
+            # Encoded like DataFrame.to_json encodes the cells, the missing value is the last string
+            values = json.loads(pd.Series(uniques, dtype=object).to_json(orient="values")) + [None]
+            codes[codes < 0] = len(values) - 1
+            return codes.tolist(), [js_string(value) for value in values]
+
+    values = json.loads(series.to_json(orient="values"))
+    return None, [js_string(value) for value in values]
+
+
+def _columnar_strings(column: dict[str, Any]) -> tuple[list[int] | None, list[str]]:
+    """
+    Codes into the distinct cells of a column, as the columnar transport shows them
+    """
+    if column["kind"] == "dictionary":
+        strings = [js_string(value) for value in column["dictionary"]] + ["null"]
+        codes = column["values"].copy()
+        codes[codes < 0] = len(strings) - 1
+        return codes.tolist(), strings
+
+    return None, [_columnar_cell(column, value) for value in column["values"].tolist()]
+
+
+def iter_expanded_table_json(
+    table: props.PropsUIPromptConsentFormTable,
+    shown: list[int],
+    donated_rows: list[dict[str, str]],
+) -> Iterator[str]:
+    """
+    Yields the json of the rows to donate from a partially shown table, row by row, see merge_shown_rows
+    """
+    encoded = _EncodedTable(table)
+    deleted = _deleted_positions(encoded.row, shown, donated_rows)
+    if deleted is None:
+        yield from (js_json_dumps(row) for row in donated_rows)
+        return
+
+    for position in range(encoded.n_rows):
+        if position not in deleted:
+            yield encoded.row_json(position)
+
+
+def iter_expanded_consent_json(
+    consent_json_string: str,
+    partial_tables: dict[str, tuple[props.PropsUIPromptConsentFormTable, list[int]]],
+) -> Iterator[str]:
+    """
+    Yields the json string to donate in parts, the rows of partially shown tables are replaced
+    by the full set of rows minus the rows the participant deleted
+
+    Only the rows the participant was shown are parsed, the rows of the full tables
+    are encoded straight from their columns, see _EncodedTable.
+    """
+    items = json.loads(consent_json_string)
+    yield "["
+    for i, item in enumerate(items):
+        separator = "," if i > 0 else ""
+        partial = [table_id for table_id, rows in item.items() if table_id in partial_tables and isinstance(rows, list)]
+        if not partial:
+            yield separator + js_json_dumps(item)
+            continue
+
+        yield separator + "{"
+        for j, (table_id, rows) in enumerate(item.items()):
+            yield ("," if j > 0 else "") + js_json_dumps(table_id) + ":"
+            if table_id not in partial:
+                yield js_json_dumps(rows)
+                continue
+            table, shown = partial_tables[table_id]
+            yield "["
+            for k, row_json in enumerate(iter_expanded_table_json(table, sorted(shown), rows)):
+                yield ("," if k > 0 else "") + row_json
+            yield "]"
+        yield "}"
+    yield "]"
+
+
+def expand_partial_tables(
+    consent_json_string: str,
+    partial_tables: dict[str, tuple[props.PropsUIPromptConsentFormTable, list[int]]],
+) -> str:
+    """
+    Replaces the rows of tables that were only partially shown by the full set of rows,
+    minus the rows the participant deleted, see merge_shown_rows and iter_expanded_consent_json
+
+    Args:
+        consent_json_string (str): The json string the consent form resolved with.
+        partial_tables (dict[str, tuple[PropsUIPromptConsentFormTable, list[int]]]): Per table id, the table and
+            the positions of the rows that were shown.
+
+    Returns:
+        str: The json string to donate.
+    """
+    if not partial_tables:
+        return consent_json_string
+    return "".join(iter_expanded_consent_json(consent_json_string, partial_tables))
+
+
+COMPRESSED_DONATION_TYPE = "CompressedDonation"
+CODECS = ("gzip", "zlib")
+
+# Compressing small donations costs more than it saves
+MIN_COMPRESS_SIZE = 1024
+
+
+def compress_json_string(json_string: str, codec: str = "gzip", level: int = 6) -> str:
+    """
+    Compresses a json string and wraps it in a json object describing the encoding
+
+    Args:
+        json_string (str): The json string to compress.
+        codec (str): "gzip" or "zlib".
+        level (int): Compression level, 1 is fastest, 9 is smallest.
+
+    Returns:
+        str: A json string containing the compressed data as base64.
+    """
+    data = json_string.encode("utf8")
+    if codec == "gzip":
+        # mtime is fixed so identical donations compress to identical bytes
+        compressed = gzip.compress(data, compresslevel=level, mtime=0)
+    elif codec == "zlib":
+        compressed = zlib.compress(data, level)
+    else:
+        raise ValueError(f"Unknown codec: {codec}, choose from {', '.join(CODECS)}")
+
+    return json.dumps({
+        "__type__": COMPRESSED_DONATION_TYPE,
+        "codec": codec,
+        "transfer": "base64",
+        "original_size": len(data),
+        "data": base64.b64encode(compressed).decode("ascii"),
+    })
+
+
+def is_compressed(json_string: str) -> bool:
+    """
+    Checks whether a donated json string was compressed with compress_json_string
+    """
+    if f'"{COMPRESSED_DONATION_TYPE}"' not in json_string[:64]:
+        return False
+    try:
+        return json.loads(json_string).get("__type__") == COMPRESSED_DONATION_TYPE
+    except (json.JSONDecodeError, AttributeError):
+        return False
+
+
+def decompress_json_string(json_string: str) -> str:
+    """
+    Returns the original json string of a donation
+    Donations that are not compressed are returned as is
+    """
+    if not is_compressed(json_string):
+        return json_string
+
+    envelope = json.loads(json_string)
+    compressed = base64.b64decode(envelope["data"])
+    if envelope["codec"] == "gzip":
+        data = gzip.decompress(compressed)
+    elif envelope["codec"] == "zlib":
+        data = zlib.decompress(compressed)
+    else:
+        raise ValueError(f"Unknown codec: {envelope['codec']}")
+
+    return data.decode("utf8")
+
+
+def maybe_compress(json_string: str, codec: str = "gzip") -> str:
+    """
+    Compresses a json string if it is large enough for compression to pay off
+    """
+    if len(json_string) < MIN_COMPRESS_SIZE:
+        return json_string
+    return compress_json_string(json_string, codec)
+
+
+CHUNKED_DONATION_TYPE = "ChunkedDonation"
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_RETRIES = 3
+
+
+def _iter_pieces(source: str | Iterable[str], size: int) -> Iterator[str]:
+    """
+    Cuts a string, or the concatenation of an iterable of strings, in pieces of size characters
+    """
+    if isinstance(source, str):
+        for start in range(0, len(source), size):
+            yield source[start:start + size]
+        return
+
+    buffer: list[str] = []
+    buffered = 0
+    for part in source:
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= size:
+            joined = "".join(buffer)
+            end = len(joined) - len(joined) % size
+            for start in range(0, end, size):
+                yield joined[start:start + size]
+            buffer = [joined[end:]]
+            buffered = len(buffer[0])
+
+    if buffered > 0:
+        yield "".join(buffer)
+
+
+def _iter_compressed_pieces(source: str | Iterable[str], size: int, codec: str) -> Iterator[str]:
+    """
+    Compresses a string, or an iterable of strings, and cuts the result in base64 encoded pieces
+    Pieces hold a multiple of 3 bytes, so the concatenated pieces are valid base64 as well
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec: {codec}, choose from {', '.join(CODECS)}")
+
+    wbits = 31 if codec == "gzip" else 15
+    compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+    raw_size = max(size // 4 * 3, 3)
+    buffer = b""
+
+    parts = [source] if isinstance(source, str) else source
+    for part in parts:
+        buffer += compressor.compress(part.encode("utf8"))
+        while len(buffer) >= raw_size:
+            yield base64.b64encode(buffer[:raw_size]).decode("ascii")
+            buffer = buffer[raw_size:]
+
+    buffer += compressor.flush()
+    while buffer:
+        yield base64.b64encode(buffer[:raw_size]).decode("ascii")
+        buffer = buffer[raw_size:]
+
+
+def _is_acknowledged(result: Any) -> bool:
+    """
+    Hosts that do not acknowledge chunks respond with PayloadVoid, that counts as acknowledged
+    """
+    return getattr(result, "__type__", None) not in ("PayloadFalse", "PayloadError")
+
+
+def donate_chunked(
+    key: str,
+    source: str | Iterable[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    compress: bool = False,
+    codec: str = "gzip",
+    max_retries: int = MAX_CHUNK_RETRIES,
+) -> Generator[CommandSystemDonate, Any, None]:
+    """
+    Donates a json string in chunks, must be used with yield from:
+
+        yield from donation.donate_chunked(key, json_string)
+
+    If the donation fits in a single chunk it is donated as usual.
+    Otherwise every chunk is donated under its own key, and retried when
+    the host responds with PayloadFalse or PayloadError. A manifest is donated last.
+    The source can be an iterable of strings, for example iter_consent_form_json,
+    then the full json string never exists in memory.
+
+    Args:
+        key (str): The key of the donation.
+        source (str | Iterable[str]): The json string, or an iterable of parts of it.
+        chunk_size (int): Maximum number of characters per chunk.
+        compress (bool): Whether to compress the donation.
+        codec (str): "gzip" or "zlib", used when compress is True.
+        max_retries (int): Number of times a chunk is resent before giving up.
+    """
+    pieces = _iter_compressed_pieces(source, chunk_size, codec) if compress else _iter_pieces(source, chunk_size)
+
+    first = next(pieces, "")
+    second = next(pieces, None)
+    if second is None:
+        # Everything fits in a single chunk
+        if compress:
+            first = _single_compressed(first, codec)
+        yield CommandSystemDonate(key, first)
+        return
+
+    def all_pieces() -> Iterator[str]:
+        yield first
+        yield second  # type: ignore
+        yield from pieces
+
+    total = hashlib.sha256()
+    size = 0
+    chunks = []
+    for index, piece in enumerate(all_pieces()):
+        data = piece.encode("utf8")
+        checksum = hashlib.sha256(data).hexdigest()
+        total.update(data)
+        size += len(data)
+
+        chunk = CommandSystemDonateChunk(f"{key}-part-{index:05d}", piece, index, checksum)
+        acknowledged = False
+        for attempt in range(max_retries + 1):
+            result = yield chunk
+            if _is_acknowledged(result):
+                acknowledged = True
+                break
+            logger.info("Chunk %s of %s was not acknowledged, attempt %s", index, key, attempt + 1)
+
+        if not acknowledged:
+            logger.error("Giving up on chunk %s of %s", index, key)
+
+        chunks.append({
+            "index": index,
+            "key": chunk.key,
+            "size": len(data),
+            "sha256": checksum,
+            "acknowledged": acknowledged,
+        })
+
+    manifest = {
+        "__type__": CHUNKED_DONATION_TYPE,
+        "key": key,
+        "codec": codec if compress else None,
+        "transfer": "base64" if compress else None,
+        "size": size,
+        "sha256": total.hexdigest(),
+        "chunks": chunks,
+    }
+    logger.info("Donated %s in %s chunks", key, len(chunks))
+    yield CommandSystemDonate(f"{key}-manifest", json.dumps(manifest))
+
+
+def _single_compressed(data: str, codec: str) -> str:
+    """
+    Wraps base64 encoded compressed data in the envelope of compress_json_string
+    """
+    raw = base64.b64decode(data)
+    original = gzip.decompress(raw) if codec == "gzip" else zlib.decompress(raw)
+    return json.dumps({
+        "__type__": COMPRESSED_DONATION_TYPE,
+        "codec": codec,
+        "transfer": "base64",
+        "original_size": len(original),
+        "data": data,
+    })
+
+
+def join_chunks(manifest_json_string: str, chunks: dict[str, str]) -> str:
+    """
+    Reassembles a chunked donation
+
+    Args:
+        manifest_json_string (str): The donated manifest.
+        chunks (dict[str, str]): The donated chunks by key.
+
+    Returns:
+        str: The original json string.
+
+    Raises:
+        ValueError: If a chunk is missing or its checksum does not match.
+    """
+    manifest = json.loads(manifest_json_string)
+    pieces = []
+    for chunk in sorted(manifest["chunks"], key=lambda c: c["index"]):
+        if chunk["key"] not in chunks:
+            raise ValueError(f"Missing chunk: {chunk['key']}")
+        piece = chunks[chunk["key"]]
+        if hashlib.sha256(piece.encode("utf8")).hexdigest() != chunk["sha256"]:
+            raise ValueError(f"Checksum mismatch: {chunk['key']}")
+        pieces.append(piece)
+
+    joined = "".join(pieces)
+    if manifest["codec"] is None:
+        return joined
+
+    raw = base64.b64decode(joined)
+    data = gzip.decompress(raw) if manifest["codec"] == "gzip" else zlib.decompress(raw)
+    return data.decode("utf8")
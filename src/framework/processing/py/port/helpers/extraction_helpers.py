@@ -1,11 +1,15 @@
 """
 This module contains helper functions that can be used during the data extraction process
 """ 
+import bisect
+import itertools
 import math
 import re
 import logging 
+import functools
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any, Callable
+from typing import Any, Callable, Iterator
 from pathlib import Path
 import zipfile
 import csv
@@ -15,9 +19,15 @@ import json
 import pandas as pd
 import numpy as np
 
+import port.unzipddp as unzipddp
+from port.my_exceptions import ZipResourceLimitError
+
 
 logger = logging.getLogger(__name__)
 
+# Number of characters read at a time when a json file is parsed incrementally
+JSON_STREAM_CHUNK_SIZE = 64 * 1024
+
 
 def dict_denester(inp: dict[Any, Any] | list[Any], new: dict[Any, Any] | None = None, name: str = "", run_first: bool = True) -> dict[Any, Any]:
     """
@@ -58,12 +68,184 @@ def dict_denester(inp: dict[Any, Any] | list[Any], new: dict[Any, Any] | None =
     return new  # type: ignore
 
 
-def find_item(d: dict[Any, Any], key_to_match: str) -> str:
+# Characters that make key_to_match of find_item and find_items a regular expression instead of plain text
+_REGEX_CHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+
+@dataclass
+class KeyQuery:
+    """
+    A compiled key_to_match of find_item and find_items, create it with compile_key_query.
+
+    Args:
+        key_to_match (str): Regular expression that is matched anywhere in a denested key.
+
+    Attributes:
+        regex (re.Pattern): The compiled regular expression, used when key_to_match is not plain text.
+        literal (bool): Whether key_to_match is plain text, it is then matched as a substring.
+        anchor (str): The longest part of a literal key_to_match between "-", it is contained in a single segment of a matching key.
+            Empty if the query cannot be answered from the segment index.
+    """
+    key_to_match: str
+
+    regex: re.Pattern = field(init=False)
+    literal: bool = field(init=False)
+    anchor: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.regex = re.compile(f"^.*{self.key_to_match}.*$")
+        self.literal = not any(c in _REGEX_CHARACTERS for c in self.key_to_match)
+        self.anchor = max(self.key_to_match.split("-"), key=len) if self.literal else ""
+
+    def matches(self, key: str) -> bool:
+        """
+        Whether key matches, same as re.match(rf"^.*{key_to_match}.*$", key)
+        """
+        if self.literal and "\n" not in key:
+            return self.key_to_match in key
+        return self.regex.match(key) is not None
+
+
+@functools.lru_cache(maxsize=256)
+def compile_key_query(key_to_match: str) -> KeyQuery:
+    """
+    Compiles key_to_match of find_item and find_items once, queries are cached by key_to_match.
+
+    Args:
+        key_to_match (str): Regular expression that is matched anywhere in a denested key.
+
+    Returns:
+        KeyQuery: The compiled query.
+
+    Raises:
+        re.error: If key_to_match is not a valid regular expression.
+    """
+    return KeyQuery(key_to_match)
+
+
+class DenestedIndex:
+    """
+    Denests a dictionary or list like dict_denester, and indexes the denested keys by their segments.
+    A segment is a dictionary key or list index on the path to a value, the segments of "a-b-c" are "a", "b" and "c".
+
+    find_item and find_items answer queries on a DenestedIndex from the index,
+    the cost depends on the number of matching keys instead of the number of keys.
+    Create one per dictionary that is queried more than once.
+
+    Args:
+        inp (dict[Any, Any] | list[Any]): The input dictionary or list to be denested.
+
+    Attributes:
+        values (dict[str, Any]): The denested dictionary, equal to dict_denester(inp).
+
+    Examples:
+        >>> index = DenestedIndex({"a": {"b": {"c": 1}}, "d": [2, 3]})
+        >>> find_item(index, "c")
+        "1"
+    """
+    def __init__(self, inp: dict[Any, Any] | list[Any]):
+        self.values: dict[str, Any] = {}
+        self._keys: list[str] = []
+        # The values below a segment are stored one after another, a segment maps to the ranges of their positions
+        self._segments: dict[str, list[tuple[int, int]]] = {}
+        # The segments joined by "\0" and the position of every segment in that text, built on the first query
+        self._segment_text: str | None = None
+        self._segment_list: list[str] = []
+        self._segment_starts: list[int] = []
+        if isinstance(inp, (dict, list)):
+            self._add(inp, "")
+        else:
+            self._keys.append("")
+            self.values[""] = inp
+
+    def _add(self, inp: dict[Any, Any] | list[Any], prefix: str) -> None:
+        values = self.values
+        keys = self._keys
+        segments = self._segments
+        for segment, value in (inp.items() if isinstance(inp, dict) else enumerate(inp)):
+            segment = str(segment)
+            start = len(keys)
+            if isinstance(value, (dict, list)):
+                self._add(value, f"{prefix}{segment}-")
+            else:
+                key = prefix + segment
+                # Same as dict_denester, a key that is already present keeps its position and gets the last value
+                if key not in values:
+                    keys.append(key)
+                values[key] = value
+
+            ranges = segments.get(segment)
+            if ranges is None:
+                ranges = segments[segment] = []
+            ranges.append((start, len(keys)))
+
+    def positions(self, query: KeyQuery) -> list[int]:
+        """
+        Positions of the keys that match query, in order
+        """
+        keys = self._keys
+        if not query.anchor:
+            return [p for p, key in enumerate(keys) if query.matches(key)]
+
+        ranges = [r for segment in self._matching_segments(query.anchor) for r in self._segments[segment]]
+        if len(ranges) == 1:
+            candidates = range(*ranges[0])
+        else:
+            candidates = sorted({p for r in ranges for p in range(*r)})
+        return [p for p in candidates if query.matches(keys[p])]
+
+    def _matching_segments(self, anchor: str) -> list[str]:
+        """
+        Segments that contain anchor, found with str.find in the joined segments instead of a check per segment
+        """
+        if "\0" in anchor:
+            return [segment for segment in self._segments if anchor in segment]
+
+        if self._segment_text is None:
+            self._segment_list = list(self._segments)
+            self._segment_text = "\0".join(self._segment_list)
+            self._segment_starts = list(itertools.accumulate((len(segment) + 1 for segment in self._segment_list[:-1]), initial=0))
+
+        text = self._segment_text
+        segments = self._segment_list
+        starts = self._segment_starts
+        out = []
+        position = text.find(anchor)
+        while position != -1:
+            i = bisect.bisect_right(starts, position) - 1
+            out.append(segments[i])
+            if i + 1 == len(starts):
+                break
+            position = text.find(anchor, starts[i + 1])
+        return out
+
+    def find_item(self, key_to_match: str) -> str:
+        """
+        See find_item
+        """
+        positions = self.positions(compile_key_query(key_to_match))
+        if not positions:
+            return ""
+        # min returns the first of the least nested keys, as find_item does
+        key = min((self._keys[p] for p in positions), key=lambda k: k.count("-"))
+        return str(self.values[key])
+
+    def find_items(self, key_to_match: str) -> list:
+        """
+        See find_items
+        """
+        return [str(self.values[self._keys[p]]) for p in self.positions(compile_key_query(key_to_match))]
+
+
+def find_item(d: dict[Any, Any] | DenestedIndex, key_to_match: str) -> str:
     """
     Finds the least nested value in a denested dictionary whose key contains the given key_to_match.
 
+    key_to_match is compiled once and cached. On a DenestedIndex only the keys that can match are checked,
+    use one when a dictionary is queried more than once.
+
     Args:
-        d (dict[Any, Any]): A denested dictionary to search in.
+        d (dict[Any, Any] | DenestedIndex): A denested dictionary or a DenestedIndex to search in.
         key_to_match (str): The substring to match in the keys.
 
     Returns:
@@ -79,12 +261,15 @@ def find_item(d: dict[Any, Any], key_to_match: str) -> str:
         "2"
     """
     out = ""
-    pattern = r"{}".format(f"^.*{key_to_match}.*$")
     depth = math.inf
 
     try:
+        if isinstance(d, DenestedIndex):
+            return d.find_item(key_to_match)
+
+        query = compile_key_query(key_to_match)
         for k, v in d.items():
-            if re.match(pattern, k):
+            if query.matches(k):
                 depth_current_match = k.count("-")
                 if depth_current_match < depth:
                     depth = depth_current_match
@@ -95,12 +280,15 @@ def find_item(d: dict[Any, Any], key_to_match: str) -> str:
     return out
 
 
-def find_items(d: dict[Any, Any], key_to_match: str) -> list:
+def find_items(d: dict[Any, Any] | DenestedIndex, key_to_match: str) -> list:
     """
     Finds all values in a denested dictionary whose keys contain the given key_to_match.
 
+    key_to_match is compiled once and cached. On a DenestedIndex only the keys that can match are checked,
+    use one when a dictionary is queried more than once.
+
     Args:
-        d (dict[Any, Any]): A denested dictionary to search in.
+        d (dict[Any, Any] | DenestedIndex): A denested dictionary or a DenestedIndex to search in.
         key_to_match (str): The substring to match in the keys.
 
     Returns:
@@ -115,11 +303,14 @@ def find_items(d: dict[Any, Any], key_to_match: str) -> list:
         ["a", "b"]
     """
     out = []
-    pattern = r"{}".format(f"^.*{key_to_match}.*$")
 
     try:
+        if isinstance(d, DenestedIndex):
+            return d.find_items(key_to_match)
+
+        query = compile_key_query(key_to_match)
         for k, v in d.items():
-            if re.match(pattern, k):
+            if query.matches(k):
                 out.append(str(v))
     except Exception as e:
         logger.error("bork bork: %s", e)
@@ -129,7 +320,7 @@ def find_items(d: dict[Any, Any], key_to_match: str) -> list:
 
 def json_dumper(zfile: str) -> pd.DataFrame:
     """
-    Reads all JSON files in a zip file, flattens them, and combines them into a single DataFrame.
+    Reads all JSON files in a zip file and in the zip files nested in it, flattens them, and combines them into a single DataFrame.
 
     Args:
         zfile (str): Path to the zip file containing JSON files.
@@ -148,12 +339,14 @@ def json_dumper(zfile: str) -> pd.DataFrame:
     datapoints = []
 
     try:
-        with zipfile.ZipFile(zfile, "r") as zf:
-            for f in zf.namelist():
-                logger.debug("Contained in zip: %s", f)
-                fp = Path(f)
+        with unzipddp.open_zip(zfile) as zf:
+            unzipddp.check_zip_limits(zf, lambda info: Path(info.filename).suffix == ".json")
+            # Files are read in the order they are stored, so reads on the upload are sequential
+            for container, info in unzipddp.walk_zip(zf):
+                logger.debug("Contained in zip: %s", info.filename)
+                fp = Path(info.filename)
                 if fp.suffix == ".json":
-                    b = io.BytesIO(zf.read(f))
+                    b = unzipddp.read_member(container, info)
                     d = dict_denester(unzipddp.read_json_from_bytes(b))
                     for k, v in d.items():
                         datapoints.append({
@@ -317,6 +510,7 @@ def extract_file_from_zip(zfile: str, file_to_extract: str) -> io.BytesIO:
     Raises:
         FileNotFoundInZipError: Logs an error if the specified file is not found in the zip.
         zipfile.BadZipFile: Logs an error if the zip file is invalid.
+        ZipResourceLimitError: Logs an error if the file is larger than the limits in port.unzipddp allow.
         Exception: Logs any other unexpected errors.
 
     Examples:
@@ -327,13 +521,13 @@ def extract_file_from_zip(zfile: str, file_to_extract: str) -> io.BytesIO:
     file_to_extract_bytes = io.BytesIO()
 
     try:
-        with zipfile.ZipFile(zfile, "r") as zf:
+        with unzipddp.open_zip(zfile) as zf:
             file_found = False
 
-            for f in zf.namelist():
-                logger.debug("Contained in zip: %s", f)
-                if re.match(rf"^.*{re.escape(file_to_extract)}$", f):
-                    file_to_extract_bytes = io.BytesIO(zf.read(f))
+            for container, info in unzipddp.walk_zip(zf):
+                logger.debug("Contained in zip: %s", info.filename)
+                if re.match(rf"^.*{re.escape(file_to_extract)}$", info.filename):
+                    file_to_extract_bytes = unzipddp.read_member(container, info)
                     file_found = True
                     break
 
@@ -342,13 +536,143 @@ def extract_file_from_zip(zfile: str, file_to_extract: str) -> io.BytesIO:
 
     except zipfile.BadZipFile as e:
         logger.error("BadZipFile:  %s", e)
+    except ZipResourceLimitError as e:
+        logger.error("Resource limit exceeded:  %s", e)
     except FileNotFoundInZipError as e:
         logger.error("File not found:  %s: %s", file_to_extract, e)
+    except MemoryError:
+        raise
     except Exception as e:
         logger.error("Exception was caught:  %s", e)
 
-    finally:
-        return file_to_extract_bytes
+    return file_to_extract_bytes
+
+
+def iter_json_array(stream: io.TextIOBase, chunk_size: int = JSON_STREAM_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Parses a JSON document of which the top level is an array, and yields its items one at a time.
+    Only the item that is being parsed is kept in memory, not the whole document.
+
+    Args:
+        stream (io.TextIOBase): Text stream containing the JSON document.
+        chunk_size (int): Number of characters to read at a time.
+
+    Yields:
+        Any: The parsed items of the array.
+
+    Raises:
+        json.JSONDecodeError: If the document is not a JSON array or is malformed.
+
+    Examples:
+        >>> list(iter_json_array(io.StringIO('[{"title": "a"}, {"title": "b"}]')))
+        [{'title': 'a'}, {'title': 'b'}]
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def read(size: int) -> bool:
+        nonlocal buffer, pos, eof
+        data = stream.read(size)
+        if not data:
+            eof = True
+            return False
+        # Drop what has been parsed, so the buffer does not grow with the document
+        buffer = buffer[pos:] + data
+        pos = 0
+        return True
+
+    def skip_whitespace() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\n\r":
+                pos += 1
+            if pos < len(buffer) or not read(chunk_size):
+                return buffer[pos:pos + 1]
+
+    if skip_whitespace() != "[":
+        raise json.JSONDecodeError("Expecting '['", buffer, pos)
+    pos += 1
+
+    if skip_whitespace() == "]":
+        return
+
+    while True:
+        if not buffer[pos:pos + 1]:
+            raise json.JSONDecodeError("Unterminated array", buffer, pos)
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            # A number cut off by the end of the buffer also decodes, the item is only complete when a delimiter follows
+            after = end
+            while after < len(buffer) and buffer[after] in " \t\n\r":
+                after += 1
+            complete = eof or buffer[after:after + 1] in (",", "]")
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+
+        if not complete:
+            # Read at least as much as is buffered, so a large item is not parsed again for every chunk
+            read(max(chunk_size, len(buffer) - pos))
+            continue
+
+        pos = end
+        yield item
+
+        separator = skip_whitespace()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        pos += 1
+        skip_whitespace()
+
+
+def iter_json_array_from_zip(zfile: str, file_to_extract: str) -> Iterator[Any]:
+    """
+    Parses a JSON file in a zipfile of which the top level is an array, and yields its items one at a time.
+    The file is decompressed while it is parsed, so only the item that is being parsed is kept in memory.
+    Use this instead of extract_file_from_zip and read_json_from_bytes for large files, such as conversations.json.
+
+    Args:
+        zfile (str): Path to the zip file.
+        file_to_extract (str): Name or path of the JSON file in the zip.
+
+    Yields:
+        Any: The parsed items of the array. Nothing is yielded after an error, which is logged.
+
+    Examples:
+        >>> for conversation in iter_json_array_from_zip("chatgpt.zip", "conversations.json"):
+        ...     print(conversation["title"])
+    """
+    try:
+        with unzipddp.open_zip(zfile) as zf:
+            for container, info in unzipddp.walk_zip(zf):
+                if re.match(rf"^.*{re.escape(file_to_extract)}$", info.filename):
+                    # zipfile stops reading a file at its declared size, checking that is enough
+                    unzipddp.check_member_limits(info)
+                    with container.open(info, "r") as member:
+                        encoding = unzipddp.sniff_json_encoding(member.peek(4))
+                        yield from iter_json_array(io.TextIOWrapper(member, encoding=encoding))
+                    return
+
+        raise FileNotFoundInZipError("File not found in zip")
+
+    except zipfile.BadZipFile as e:
+        logger.error("BadZipFile:  %s", e)
+    except ZipResourceLimitError as e:
+        logger.error("Resource limit exceeded:  %s", e)
+    except FileNotFoundInZipError as e:
+        logger.error("File not found:  %s: %s", file_to_extract, e)
+    except json.JSONDecodeError as e:
+        logger.error("Cannot decode json: %s", e)
+    except MemoryError:
+        raise
+    except Exception as e:
+        logger.error("Exception was caught:  %s", e)
 
 
 def _json_reader_bytes(json_bytes: bytes, encoding: str) -> Any:
@@ -395,14 +719,16 @@ def _json_reader_file(json_file: str, encoding: str) -> Any:
     return result
 
 
-def _read_json(json_input: Any, json_reader: Callable[[Any, str], Any]) -> dict[Any, Any] | list[Any]:
+def _read_json(json_input: Any, json_reader: Callable[[Any, str], Any], encoding: str) -> dict[Any, Any] | list[Any]:
     """
-    Reads JSON input using the provided json_reader function, trying different encodings.
+    Reads JSON input using the provided json_reader function and encoding.
+    The encoding is sniffed from the first bytes beforehand, so the input is decoded and parsed only once.
     This function should not be used directly.
 
     Args:
         json_input (Any): The JSON input (can be bytes or file path).
         json_reader (Callable[[Any, str], Any]): A function to read the JSON input.
+        encoding (str): The encoding of the JSON input, see port.unzipddp.sniff_json_encoding.
 
     Returns:
         dict[Any, Any] | list[Any]: The parsed JSON data as a dictionary or list.
@@ -414,33 +740,30 @@ def _read_json(json_input: Any, json_reader: Callable[[Any, str], Any]) -> dict[
         Exception: Logs any other unexpected errors.
 
     Examples:
-        >>> data = _read_json(b'{"key": "value"}', _json_reader_bytes)
+        >>> data = _read_json(b'{"key": "value"}', _json_reader_bytes, "utf-8")
         >>> print(data)
         {'key': 'value'}
     """
 
     out: dict[Any, Any] | list[Any] = {}
 
-    encodings = ["utf8", "utf-8-sig"]
-    for encoding in encodings:
-        try:
-            result = json_reader(json_input, encoding)
+    try:
+        result = json_reader(json_input, encoding)
 
-            if not isinstance(result, (dict, list)):
-                raise TypeError("Did not convert bytes to a list or dict, but to another type instead")
+        if not isinstance(result, (dict, list)):
+            raise TypeError("Did not convert bytes to a list or dict, but to another type instead")
 
-            out = result
-            logger.debug("Succesfully converted json bytes with encoding: %s", encoding)
-            break
+        out = result
+        logger.debug("Succesfully converted json bytes with encoding: %s", encoding)
 
-        except json.JSONDecodeError:
-            logger.error("Cannot decode json with encoding: %s", encoding)
-        except TypeError as e:
-            logger.error("%s, could not convert json bytes", e)
-            break
-        except Exception as e:
-            logger.error("%s, could not convert json bytes", e)
-            break
+    except json.JSONDecodeError:
+        logger.error("Cannot decode json with encoding: %s", encoding)
+    except TypeError as e:
+        logger.error("%s, could not convert json bytes", e)
+    except MemoryError:
+        raise
+    except Exception as e:
+        logger.error("%s, could not convert json bytes", e)
 
     return out
 
@@ -465,7 +788,9 @@ def read_json_from_bytes(json_bytes: io.BytesIO) -> dict[Any, Any] | list[Any]:
     out: dict[Any, Any] | list[Any] = {}
     try:
         b = json_bytes.read()
-        out = _read_json(b, _json_reader_bytes)
+        out = _read_json(b, _json_reader_bytes, unzipddp.sniff_json_encoding(b))
+    except MemoryError:
+        raise
     except Exception as e:
         logger.error("%s, could not convert json bytes", e)
 
@@ -488,7 +813,14 @@ def read_json_from_file(json_file: str) -> dict[Any, Any] | list[Any]:
         >>> print(data)
         {'key': 'value'}
     """
-    out = _read_json(json_file, _json_reader_file)
+    try:
+        with open(json_file, "rb") as f:
+            head = f.read(4)
+    except OSError as e:
+        logger.error("Cannot read %s: %s", json_file, e)
+        return {}
+
+    out = _read_json(json_file, _json_reader_file, unzipddp.sniff_json_encoding(head))
     return out
 
 
@@ -518,11 +850,12 @@ def read_csv_from_bytes(json_bytes: io.BytesIO) -> list[dict[Any, Any]]:
             out.append(row)
         logger.debug("succesfully converted csv bytes with encoding utf8")
 
+    except MemoryError:
+        raise
     except Exception as e:
         logger.error("%s, could not convert csv bytes", e)
 
-    finally:
-        return out
+    return out
 
 
 def read_csv_from_bytes_to_df(json_bytes: io.BytesIO) -> pd.DataFrame:
@@ -544,3 +877,29 @@ def read_csv_from_bytes_to_df(json_bytes: io.BytesIO) -> pd.DataFrame:
         1    Bob   25
     """
     return pd.DataFrame(read_csv_from_bytes(json_bytes))
+
+
+def split_dataframe(df: pd.DataFrame, row_count: int) -> list[pd.DataFrame]:
+    """
+    Splits a pandas DataFrame into a list of smaller DataFrames with at most row_count rows.
+    Port has trouble putting large tables in memory, splitting them into smaller tables helps.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to split.
+        row_count (int): The maximum number of rows in each split.
+
+    Returns:
+        list[pd.DataFrame]: A list of DataFrames, each with a reset index.
+
+    Examples:
+        >>> df = pd.DataFrame({"a": range(5)})
+        >>> [len(split) for split in split_dataframe(df, 2)]
+        [2, 2, 1]
+    """
+    # Calculate the number of splits needed.
+    num_splits = int(len(df) / row_count) + (len(df) % row_count > 0)
+
+    # Split the DataFrame into chunks of size row_count.
+    df_splits = [df[i*row_count:(i+1)*row_count].reset_index(drop=True) for i in range(num_splits)]
+
+    return df_splits
@@ -1,7 +1,12 @@
+from typing import Any, Generator
+
 import port.api.props as props
+import port.donation as donation
+from port.api.payloads import Payload
 from port.api.commands import (
     CommandSystemDonate, 
     CommandUIRender,
+    CommandUITablePage,
     CommandSystemExit,
 )
 
@@ -131,7 +136,61 @@ def generate_review_data_prompt(description: props.Translatable, table_list: lis
     )
 
 
-def donate(key: str, json_string: str) -> CommandSystemDonate:
+def serve_consent_form(
+    render_command: CommandUIRender,
+    consent_form: props.PropsUIPromptConsentForm,
+) -> Generator[CommandUIRender | CommandUITablePage, Any, Any]:
+    """
+    Renders a consent form, sends further pages of paged tables when the participant asks for them
+    and maps the rows donated from sampled and paged tables back onto the full tables.
+    Must be used with yield from:
+
+        consent_result = yield from serve_consent_form(render_page(header, consent_form), consent_form)
+
+    The consent form asks for a page by resolving with a PayloadTablePageRequest,
+    with as value the table_id and page. The page is sent with a CommandUITablePage.
+
+    The participant only saw part of a table with a preview_size or page_size, when they donate
+    the returned payload contains all rows of these tables, except for the rows they deleted.
+    A folded deferred table the participant never opened is donated without rows.
+
+    Args:
+        render_command (CommandUIRender): A render command of a page containing consent_form.
+        consent_form (props.PropsUIPromptConsentForm): The consent form in the page.
+
+    Returns:
+        The payload the consent form resolved with.
+    """
+    # Every previewed or paged table, also one that fits in its first page, is mapped back onto all of its rows.
+    # Folded deferred tables are not evaluated until the participant opens them
+    shown = {
+        table.id: set(table.page_rows(0))
+        for table in consent_form.tables + consent_form.meta_tables
+        if (table.preview_size or table.page_size) and table.sends_first_page()
+    }
+
+    result = yield render_command
+    while getattr(result, "__type__", None) == "PayloadTablePageRequest":
+        request = result.value.to_py() if hasattr(result.value, "to_py") else result.value
+        table = consent_form.find_table(request["table_id"])
+        if table is None:
+            raise ValueError(f"Unknown table: {request['table_id']}")
+
+        page = int(request["page"])
+        shown.setdefault(table.id, set()).update(table.page_rows(page))
+        result = yield CommandUITablePage(table, page)
+
+    if getattr(result, "__type__", None) == "PayloadJSON" and shown:
+        partial_tables = {
+            table_id: (consent_form.find_table(table_id), sorted(positions))
+            for table_id, positions in shown.items()
+        }
+        result = Payload("PayloadJSON", donation.expand_partial_tables(result.value, partial_tables))
+
+    return result
+
+
+def donate(key: str, json_string: str, compress: bool = False) -> CommandSystemDonate:
     """
     Initiates a donation process using the provided key and data.
 
@@ -141,10 +200,14 @@ def donate(key: str, json_string: str) -> CommandSystemDonate:
     Args:
         key (str): The key associated with the donation process. The key will be used in the file name.
         json_string (str): A JSON-formatted string containing the donated data.
+        compress (bool): Whether to gzip the data, the storage side should decode the donation 
+            with `port.donation.decompress_json_string`. Defaults to False.
 
     Returns:
         CommandSystemDonate: A system command that initiates the donation process. Must be yielded.
     """
+    if compress:
+        json_string = donation.maybe_compress(json_string)
     return CommandSystemDonate(key, json_string)
 
 
@@ -8,10 +8,13 @@ Which can be used and acted upon
 from dataclasses import dataclass, field
 from pathlib import Path
 from enum import Enum
+from typing import Iterable, Optional
 import zipfile
 
 import logging
 
+import port.unzipddp as unzipddp
+
 logger = logging.getLogger(__name__)
 
 
@@ -45,6 +48,8 @@ class DDPCategory:
         ddp_filetype (DDPFiletype): The file type of the DDP.
         language (Language): The language of the DDP.
         known_files (List[str]): A list of known files associated with this DDP category.
+        weights (Optional[dict[str, float]]): Weight of known files when inferring the category, defaults to 1.
+        required_files (Optional[list[str]]): Files that must be present for the DDP to be of this category.
 
     Examples:
         >>> category = DDPCategory("cat1", DDPFiletype.JSON, Language.EN, ["file1.json", "file2.json"])
@@ -57,6 +62,8 @@ class DDPCategory:
     ddp_filetype: DDPFiletype 
     language: Language 
     known_files: list[str] 
+    weights: Optional[dict[str, float]] = None
+    required_files: Optional[list[str]] = None
 
 
 @dataclass
@@ -79,6 +86,88 @@ class StatusCode:
     description: str
 
 
+@dataclass
+class CategoryIndex:
+    """
+    Inverted index from known file to the DDP categories it belongs to.
+
+    Built once per list of categories, so inferring a category costs a lookup per input file
+    instead of a scan over the known files of every category.
+
+    Args:
+        categories (list[DDPCategory]): The categories to index.
+
+    Examples:
+        >>> index = CategoryIndex(ddp_categories)
+        >>> index.best(["file1.txt", "file2.txt"])
+    """
+    categories: list
+
+    files: dict[str, tuple[tuple[int, float], ...]] = field(init=False)
+    total_weights: list[float] = field(init=False)
+    required_files: list[frozenset[str]] = field(init=False)
+
+    def __post_init__(self) -> None:
+        files: dict[str, list[tuple[int, float]]] = {}
+        self.total_weights = []
+        self.required_files = []
+        for position, category in enumerate(self.categories):
+            weights = getattr(category, "weights", None) or {}
+            known_files = frozenset(category.known_files)
+            for f in known_files:
+                files.setdefault(f, []).append((position, weights.get(f, 1.0)))
+            self.total_weights.append(sum(weights.get(f, 1.0) for f in known_files))
+            self.required_files.append(frozenset(getattr(category, "required_files", None) or ()))
+        self.files = {f: tuple(entries) for f, entries in files.items()}
+
+    def scores(self, file_list_input: Iterable[str]) -> list[float]:
+        """
+        Percentage of the weight of the known files of every category that is present in file_list_input.
+        Categories of which a required file is missing score 0.
+
+        Args:
+            file_list_input (Iterable[str]): Names of the files in the DDP.
+
+        Returns:
+            list[float]: The score of every category, in the order of categories.
+        """
+        present = frozenset(file_list_input)
+        matched = [0.0] * len(self.categories)
+        for f in present:
+            for position, weight in self.files.get(f, ()):
+                matched[position] += weight
+
+        return [
+            matched[position] / total * 100 if total > 0 and required <= present else 0.0
+            for position, (total, required) in enumerate(zip(self.total_weights, self.required_files))
+        ]
+
+    def best(self, file_list_input: Iterable[str], threshold: float = 5) -> Optional["DDPCategory"]:
+        """
+        The category with the highest score, if that score is at least threshold percent.
+        """
+        scores = self.scores(file_list_input)
+        if not scores or max(scores) < threshold:
+            return None
+        return self.categories[scores.index(max(scores))]
+
+
+# Indexes of the category lists of the platforms, these lists are module constants
+_CATEGORY_INDEXES: dict[int, tuple[list, CategoryIndex]] = {}
+
+
+def category_index(categories: list) -> CategoryIndex:
+    """
+    Returns the CategoryIndex of a list of categories, built once per list.
+    The list should not be changed after it has been indexed.
+    """
+    cached = _CATEGORY_INDEXES.get(id(categories))
+    if cached is None or cached[0] is not categories:
+        cached = (categories, CategoryIndex(categories))
+        _CATEGORY_INDEXES[id(categories)] = cached
+    return cached[1]
+
+
 @dataclass
 class ValidateInput:
     """
@@ -92,6 +181,7 @@ class ValidateInput:
 
     Attributes:
         ddp_categories_lookup (Dict[str, DDPCategory]): A lookup dictionary for DDP categories.
+        ddp_categories_index (CategoryIndex): Index of the known files of the DDP categories.
         status_codes_lookup (Dict[int, StatusCode]): A lookup dictionary for status codes.
 
     Examples:
@@ -106,6 +196,7 @@ class ValidateInput:
     current_ddp_category: DDPCategory | None = None
 
     ddp_categories_lookup: dict[str, DDPCategory] = field(init=False)
+    ddp_categories_index: CategoryIndex = field(init=False)
     status_codes_lookup: dict[int, StatusCode] = field(init=False)
 
     def infer_ddp_category(self, file_list_input: list[str]) -> bool:
@@ -122,16 +213,9 @@ class ValidateInput:
         Examples:
             >>> validator.infer_ddp_category(["file1.txt", "file2.txt"])
         """
-        prop_category = {}
-        for id, category in self.ddp_categories_lookup.items():
-            n_files_found = [
-                1 if f in category.known_files else 0 for f in file_list_input
-            ]
-            prop_category[id] = sum(n_files_found) / len(category.known_files) * 100
-
-        if max(prop_category.values()) >= 5:
-            highest = max(prop_category, key=prop_category.get)  # type: ignore
-            self.ddp_category = self.ddp_categories_lookup[highest]
+        category = self.ddp_categories_index.best(file_list_input)
+        if category is not None:
+            self.ddp_category = category
             self.set_current_status_code_by_id(0)
             logger.info("Detected DDP category: %s", self.ddp_category.id)
             return True
@@ -177,6 +261,7 @@ class ValidateInput:
         self.ddp_categories_lookup = {
             category.id: category for category in self.all_ddp_categories
         }
+        self.ddp_categories_index = category_index(self.all_ddp_categories)
         self.status_codes_lookup = {
             status_code.id: status_code for status_code in self.all_status_codes
         }
@@ -219,8 +304,8 @@ def validate_zip(ddp_categories: list[DDPCategory], path_to_zip: str) -> Validat
 
     try:
         paths = []
-        with zipfile.ZipFile(path_to_zip, "r") as zf:
-            for f in zf.namelist():
+        with unzipddp.open_zip(path_to_zip) as zf:
+            for f in unzipddp.member_names(zf):
                 p = Path(f)
                 logger.debug("Found: %s in zip", p.name)
                 paths.append(p.name)
@@ -0,0 +1,173 @@
+"""
+Load test client for port.server
+
+Simulates participants that go through the donation flow with the same file.
+Every participant accepts the first profile, donates everything and fills in
+the questionnaire. The latency of every step is measured and reported per
+command the step ended in.
+
+Usage:
+    python -m port.loadtest /path/to/ddp.zip --sessions 100 --concurrency 20
+"""
+from dataclasses import dataclass, field
+from typing import Any
+import argparse
+import asyncio
+import json
+import math
+import time
+
+import port.donation as donation
+from port.server import DEFAULT_HOST, DEFAULT_PORT, STREAM_LIMIT
+
+
+@dataclass
+class LoadTestResult:
+    """
+    Results of a load test
+
+    Attributes:
+        sessions (int): Number of sessions that completed the flow.
+        failures (int): Number of sessions that ended with an error.
+        wall_time (float): Duration of the load test in seconds.
+        latencies (dict[str, list[float]]): Latencies in seconds per step.
+    """
+    sessions: int = 0
+    failures: int = 0
+    wall_time: float = 0.0
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+
+    def sessions_per_second(self) -> float:
+        return self.sessions / self.wall_time if self.wall_time > 0 else 0.0
+
+    def report(self) -> str:
+        lines = [
+            f"sessions: {self.sessions}, failures: {self.failures}, "
+            f"wall time: {self.wall_time:.2f}s, sessions/s: {self.sessions_per_second():.2f}",
+            f"{'step':<60} {'n':>6} {'mean ms':>10} {'p95 ms':>10}",
+        ]
+        for step, values in sorted(self.latencies.items()):
+            mean = sum(values) / len(values) * 1000
+            lines.append(f"{step:<60} {len(values):>6} {mean:>10.1f} {percentile(values, 95) * 1000:>10.1f}")
+        return "\n".join(lines)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Nearest rank percentile
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def step_name(command: dict[str, Any]) -> str:
+    """
+    Name of the step that ended in command
+    """
+    name = command.get("__type__", "unknown")
+    page = command.get("page")
+    if isinstance(page, dict):
+        body = page.get("body")
+        name = f"{name}:{body.get('__type__') if isinstance(body, dict) else page.get('__type__')}"
+    return name
+
+
+def respond(command: dict[str, Any], path: str) -> dict[str, Any]:
+    """
+    The payload a participant responds with
+    """
+    body = (command.get("page") or {}).get("body") or {}
+    body_type = body.get("__type__")
+
+    if body_type in ("PropsUIPromptFileInput", "PropsUIPromptFileInputMultiple"):
+        return {"__type__": "PayloadString", "value": path}
+    if body_type == "PropsUIPromptRadioInput":
+        return {"__type__": "PayloadString", "value": body["items"][0]["value"]}
+    if body_type == "PropsUIPromptConsentForm":
+        tables = [{table["id"]: table_rows(table)} for table in body["tables"]]
+        tables.append({"user_omissions": donation.js_json_dumps([])})
+        return {"__type__": "PayloadJSON", "value": donation.js_json_dumps(tables)}
+    if body_type == "PropsUIPromptConfirm":
+        return {"__type__": "PayloadFalse", "value": False}
+    if body_type == "PropsUIPromptQuestionnaire":
+        return {"__type__": "PayloadJSON", "value": "{}"}
+    return {"__type__": "PayloadVoid", "value": None}
+
+
+def table_rows(table: dict[str, Any]) -> list[dict[str, str]]:
+    if table.get("columns") is not None:
+        return donation.columns_to_rows(table["columns"])
+    return donation.data_frame_json_to_rows(table["data_frame"])
+
+
+def is_last(command: dict[str, Any]) -> bool:
+    page = command.get("page") or {}
+    return page.get("__type__") in ("PropsUIPageEnd", "PropsUIPageError")
+
+
+async def participant(session_id: str, path: str, host: str, port: int, result: LoadTestResult) -> None:
+    """
+    Goes through the donation flow once
+    """
+    reader, writer = await asyncio.open_connection(host, port, limit=STREAM_LIMIT)
+    try:
+        message: dict[str, Any] = {"sessionId": session_id}
+        while True:
+            start = time.perf_counter()
+            writer.write(json.dumps(message).encode() + b"\n")
+            await writer.drain()
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("Connection closed by host")
+
+            command = json.loads(line)["command"]
+            result.latencies.setdefault(step_name(command), []).append(time.perf_counter() - start)
+
+            if is_last(command):
+                if command["page"]["__type__"] == "PropsUIPageError":
+                    raise RuntimeError(command["page"]["stacktrace"])
+                break
+            message = {"payload": respond(command, path)}
+
+        result.sessions += 1
+    except Exception:
+        result.failures += 1
+    finally:
+        writer.close()
+
+
+async def run(path: str, sessions: int, concurrency: int, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> LoadTestResult:
+    """
+    Runs sessions participants, at most concurrency at the same time
+    """
+    result = LoadTestResult()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(i: int) -> None:
+        async with semaphore:
+            await participant(str(i), path, host, port, result)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(sessions)))
+    result.wall_time = time.perf_counter() - start
+    return result
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test a port.server session host")
+    parser.add_argument("path", help="Path to the DDP, as seen by the host")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args.path, args.sessions, args.concurrency, args.host, args.port))
+    print(result.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,36 @@
 from collections.abc import Generator
 from port.script import process
-from port.api.commands import CommandSystemExit
+from port.api.commands import CommandSystemDonateBatch, CommandSystemExit
+from port.session import Session
 
 
 class ScriptWrapper(Generator):
-    def __init__(self, script):
+    """
+    Wraps the script so the host can drive it with send
+
+    The script is only advanced when the host sends a response, so every command
+    is delivered before any code that follows it runs. To save the host round trips,
+    the script batches donations itself with a CommandSystemDonateBatch.
+    """
+    def __init__(self, script, session):
         self.script = script
+        self.session = session
 
     def send(self, data):
+        # The script only runs inside send, so that is where its session is active
+        with self.session.activate(), self.session.timer("script_seconds"):
+            self.session.add_metric("cycles")
+
+            command = self._next(data)
+            if isinstance(command, CommandSystemDonateBatch):
+                self.session.add_metric("coalesced_donations", len(command.donations) - 1)
+            return command.toDict()
+
+    def _next(self, data):
         try:
-            command = self.script.send(data)
+            return self.script.send(data)
         except StopIteration:
-            return CommandSystemExit(0, "End of script").toDict()
-        else:
-            return command.toDict()
+            return CommandSystemExit(0, "End of script")
 
     def throw(self, type=None, value=None, traceback=None):
         raise StopIteration
@@ -21,4 +38,4 @@ class ScriptWrapper(Generator):
 
 def start(sessionId):
     script = process(sessionId)
-    return ScriptWrapper(script)
+    return ScriptWrapper(script, Session(str(sessionId)))
@@ -0,0 +1,166 @@
+"""
+Contains a memory governor that keeps track of the bytes allocated during extraction
+
+The Pyodide worker runs in a WASM heap with a hard limit. Running out of heap
+memory does not result in a catchable Python exception in all cases, instead the
+worker dies and the participant is shown an error page. The governor keeps
+book of what the extraction allocates and when the budget is approached it
+decides to degrade gracefully instead: read files in chunks, drop optional
+tables or show the participant a sample of the tables.
+
+Every decision the governor makes is logged, so it ends up in the tracking logs.
+"""
+from dataclasses import dataclass, field
+from enum import Enum
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Pyodide 0.24 can grow the WASM heap up to 2 GiB,
+# leave some room for the interpreter, pandas and the bridge
+DEFAULT_BUDGET_BYTES = 1024 * 1024 * 1024
+
+# A csv file parsed into a list of dicts and then into a pd.DataFrame
+# with object columns, takes roughly this many times its size on disk
+CSV_EXPANSION_FACTOR = 6
+
+
+class Degradation(Enum):
+    """
+    Levels of degradation the governor can decide on, in increasing order of severity
+    """
+    NONE = 0
+    CHUNKED = 1
+    DROP_OPTIONAL = 2
+    TRUNCATE_PREVIEW = 3
+
+
+@dataclass
+class MemoryGovernor:
+    """
+    Keeps track of the bytes allocated during extraction and decides how to degrade
+
+    Attributes:
+        budget (int): The number of bytes the extraction is allowed to allocate.
+        chunked_threshold (float): Fraction of the budget after which files are read in chunks.
+        drop_optional_threshold (float): Fraction of the budget after which optional tables are dropped.
+        truncate_threshold (float): Fraction of the budget after which only a sample of the tables is shown.
+        preview_rows (int): Number of rows in the sample.
+    """
+    budget: int = DEFAULT_BUDGET_BYTES
+    chunked_threshold: float = 0.25
+    drop_optional_threshold: float = 0.6
+    truncate_threshold: float = 0.8
+    preview_rows: int = 10000
+
+    allocated: int = field(default=0, init=False)
+    peak: int = field(default=0, init=False)
+    charges: dict[str, int] = field(default_factory=dict, init=False)
+    decisions: list[str] = field(default_factory=list, init=False)
+
+    def charge(self, label: str, nbytes: int) -> None:
+        """
+        Register that nbytes were allocated for label
+        """
+        nbytes = max(int(nbytes), 0)
+        self.charges[label] = self.charges.get(label, 0) + nbytes
+        self.allocated += nbytes
+        self.peak = max(self.peak, self.allocated)
+        logger.debug("Charged %s bytes for %s, allocated: %s", nbytes, label, self.allocated)
+
+    def charge_df(self, label: str, df: pd.DataFrame) -> None:
+        """
+        Register the memory used by a pd.DataFrame
+        """
+        try:
+            nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        except MemoryError:
+            raise
+        except Exception as e:
+            logger.error("Cannot determine memory usage of %s: %s", label, e)
+            nbytes = 0
+        self.charge(label, nbytes)
+
+    def release(self, label: str) -> None:
+        """
+        Register that everything allocated for label is freed
+        """
+        nbytes = self.charges.pop(label, 0)
+        self.allocated -= nbytes
+        logger.debug("Released %s bytes for %s, allocated: %s", nbytes, label, self.allocated)
+
+    def usage(self, expected_bytes: int = 0) -> float:
+        """
+        Fraction of the budget that is used, after allocating expected_bytes
+        """
+        return (self.allocated + max(int(expected_bytes), 0)) / self.budget
+
+    def level(self, expected_bytes: int = 0) -> Degradation:
+        """
+        The degradation level given the current allocation and an expected allocation
+        """
+        usage = self.usage(expected_bytes)
+        if usage >= self.truncate_threshold:
+            return Degradation.TRUNCATE_PREVIEW
+        if usage >= self.drop_optional_threshold:
+            return Degradation.DROP_OPTIONAL
+        if usage >= self.chunked_threshold:
+            return Degradation.CHUNKED
+        return Degradation.NONE
+
+    def use_chunked(self, label: str, expected_bytes: int) -> bool:
+        """
+        Decide whether label should be read in chunks instead of in one go
+        """
+        if self.level(expected_bytes).value >= Degradation.CHUNKED.value:
+            self._decide(
+                "Reading %s in chunks; expected %s bytes, %.0f%% of budget would be used",
+                label, expected_bytes, self.usage(expected_bytes) * 100,
+            )
+            return True
+        return False
+
+    def keep_optional(self, label: str, expected_bytes: int = 0) -> bool:
+        """
+        Decide whether the optional table label can still be extracted
+        """
+        if self.level(expected_bytes).value >= Degradation.DROP_OPTIONAL.value:
+            self._decide(
+                "Dropping optional table %s; %.0f%% of budget would be used",
+                label, self.usage(expected_bytes) * 100,
+            )
+            return False
+        return True
+
+    def limit_preview(self, label: str, n_rows: int, preview_size: int | None = None) -> int | None:
+        """
+        Limit the number of rows of label shown in the consent form if the budget is nearly exhausted
+
+        Only the preview is limited, all n_rows rows are still donated, see
+        props.PropsUIPromptConsentFormTable.preview_size. The consent form tells the participant
+        that it shows a sample and that all rows of the table are shared.
+
+        Returns:
+            int | None: The preview size to use, preview_size if the preview does not need to be limited.
+        """
+        if self.level().value >= Degradation.TRUNCATE_PREVIEW.value and n_rows > self.preview_rows:
+            if preview_size is None or preview_size > self.preview_rows:
+                self._decide(
+                    "Showing %s of %s rows of %s; %.0f%% of budget is used",
+                    self.preview_rows, n_rows, label, self.usage() * 100,
+                )
+                return self.preview_rows
+        return preview_size
+
+    def out_of_memory(self, label: str) -> None:
+        """
+        Register that label could not be extracted because memory ran out
+        """
+        self._decide("Ran out of memory while extracting %s; %s bytes allocated", label, self.allocated)
+
+    def _decide(self, msg: str, *args) -> None:
+        decision = msg % args
+        self.decisions.append(decision)
+        logger.info(decision)
@@ -6,3 +6,10 @@ class FileNotFoundInZipError(Exception):
     """
     The File you are looking for is not present in a zipfile
     """
+
+
+class ZipResourceLimitError(Exception):
+    """
+    A zipfile or one of its files is larger than the limits allow,
+    for example a zip bomb
+    """
@@ -2,65 +2,182 @@
 DDP extract Netflix module
 """
 from pathlib import Path
+from typing import Iterable, Iterator
+import heapq
+import itertools
 import logging
 import zipfile
 import json
+import io
 from collections import Counter
 
 import pandas as pd
 
 import port.api.props as props
 import port.unzipddp as unzipddp
+from port.memory import MemoryGovernor, Degradation, CSV_EXPANSION_FACTOR
+import port.platforms.registry as registry
+from port.my_exceptions import ZipResourceLimitError
 
 from port.validate import (
-    DDPCategory,
-    Language,
-    DDPFiletype,
     ValidateInput,
     StatusCode,
 )
 
 logger = logging.getLogger(__name__)
 
-DDP_CATEGORIES = [
-    DDPCategory(
-        id="csv",
-        ddp_filetype=DDPFiletype.CSV,
-        language=Language.EN,
-        known_files=["MyList.csv", "ViewingActivity.csv", "SearchHistory.csv", "IndicatedPreferences.csv", "PlaybackRelatedEvents.csv", "InteractiveTitles.csv", "Ratings.csv", "GamePlaySession.txt", "IpAddressesLogin.csv", "IpAddressesAccountCreation.txt", "IpAddressesStreaming.csv", "Additional Information.pdf", "MessagesSentByNetflix.csv", "SocialMediaConnections.txt", "AccountDetails.csv", "ProductCancellationSurvey.txt", "CSContact.csv", "ChatTranscripts.csv", "Cover sheet.pdf", "Devices.csv", "ParentalControlsRestrictedTitles.txt", "AvatarHistory.csv", "Profiles.csv", "Clickstream.csv", "BillingHistory.csv"]
-    )
-]
+DDP_CATEGORIES = registry.NETFLIX_CATEGORIES
 
 STATUS_CODES = [
     StatusCode(id=0, description="Valid zip", message="Valid zip"),
     StatusCode(id=1, description="Bad zipfile", message="Bad zipfile"),
+    StatusCode(id=2, description="Unexpected file contents", message="Unexpected file contents"),
+    StatusCode(id=3, description="Zip exceeds resource limits", message="Zip exceeds resource limits"),
+    StatusCode(id=4, description="Several exports in one zip", message="Several exports in one zip"),
 ]
 
+# The files the extraction reads and the columns it needs, checked against the header of the file before extraction
+REQUIRED_COLUMNS = {
+    "ViewingActivity.csv": ["Start Time", "Duration", "Title", "Supplemental Video Type"],
+    "Ratings.csv": ["Title Name", "Thumbs Value", "Event Utc Ts"],
+}
+
 
 def validate_zip(zfile: Path) -> ValidateInput:
     """
     Validates the input of an Instagram zipfile
+    A Netflix csv file that was uploaded without zip is valid as well, see csv_upload_name
     """
 
     validate = ValidateInput(STATUS_CODES, DDP_CATEGORIES)
 
+    if not zipfile.is_zipfile(zfile):
+        file_name = csv_upload_name(str(zfile))
+        if file_name is not None:
+            logger.info("Detected DDP category: csv file %s", file_name)
+            validate.set_status_code(0)
+            validate.ddp_category = validate.ddp_categories_lookup["csv"]
+            return validate
+
     try:
         paths = []
-        with zipfile.ZipFile(zfile, "r") as zf:
-            for f in zf.namelist():
-                p = Path(f)
-                if p.suffix in (".txt", ".csv", ".pdf"):
-                    logger.debug("Found: %s in zip", p.name)
-                    paths.append(p.name)
+        with unzipddp.open_zip(zfile) as zf:
+            # Only the files that are extracted are decompressed
+            unzipddp.check_zip_limits(zf, lambda info: Path(info.filename).name in REQUIRED_COLUMNS)
+            file_names = [Path(f).name for f in unzipddp.member_names(zf)]
+
+        for name in file_names:
+            if Path(name).suffix in (".txt", ".csv", ".pdf"):
+                logger.debug("Found: %s in zip", name)
+                paths.append(name)
 
         validate.set_status_code(0)
-        validate.infer_ddp_category(paths)
+        if not validate.infer_ddp_category(paths):
+            # The upload can contain several exports, only a zip without a Netflix export is attributed to another platform
+            detection = registry.platform_index().detect_files(file_names)
+            if detection is not None and detection.platform.name != "netflix":
+                logger.info("Detected %s DDP instead of a Netflix DDP", detection.platform.name)
+                validate.set_status_code(2)
+        elif not has_expected_headers(zfile, paths):
+            validate.set_status_code(2)
+            validate.ddp_category = None
+        else:
+            find_exports(str(zfile))
     except zipfile.BadZipFile:
         validate.set_status_code(1)
+    except ZipResourceLimitError as e:
+        logger.error("Resource limit exceeded:  %s", e)
+        validate.set_status_code(3)
+        validate.ddp_category = None
+    except ValueError as e:
+        logger.info("Cannot extract the upload:  %s", e)
+        validate.set_status_code(4)
+        validate.ddp_category = None
 
     return validate
 
 
+def find_exports(zfile: str) -> list[str | unzipddp.NestedZip]:
+    """
+    The Netflix exports in an upload, a participant can zip several exports together
+    An upload with one export, or a csv file uploaded on its own, is returned as is.
+    Exports in zips nested in the upload are returned as unzipddp.NestedZip, one for every export.
+
+    Raises ValueError if the upload contains several exports that are not in zips of their own,
+    their files have the same names and cannot be told apart
+    """
+    if not zipfile.is_zipfile(zfile):
+        return [zfile]
+
+    exports = unzipddp.nested_zips_containing(zfile, "ViewingActivity.csv")
+    if len(exports) <= 1:
+        return [zfile]
+
+    for export in exports:
+        # An export next to another export, or around it, would find the files of the other export too
+        if any(other is not export and other.members[:len(export.members)] == export.members for other in exports):
+            raise ValueError(f"{len(exports)} Netflix exports found that are not in zips of their own")
+
+    logger.info("Found %s Netflix exports in nested zips", len(exports))
+    return exports
+
+
+def has_expected_headers(zfile: Path, paths: list[str]) -> bool:
+    """
+    Checks the header of the files in REQUIRED_COLUMNS that are present in the zip
+    Only the first bytes of these files are decompressed
+    """
+    for file_name, columns in REQUIRED_COLUMNS.items():
+        if file_name not in paths:
+            continue
+
+        head = unzipddp.sniff_csv_member(str(zfile), file_name)
+        if head is None:
+            logger.info("%s is not a csv file", file_name)
+            return False
+
+        missing = [column for column in columns if column not in head.columns]
+        if missing:
+            logger.info("%s is missing columns: %s", file_name, missing)
+            return False
+
+    return True
+
+
+def csv_upload_name(path: str) -> str | None:
+    """
+    Recognizes a Netflix csv file that was uploaded on its own by its header, the file name can be anything
+
+    Returns:
+        str | None: The name of the file in the Netflix zip, None if it is not a Netflix csv file.
+    """
+    head = unzipddp.sniff_csv_file(path)
+    if head is None:
+        return None
+
+    for file_name, columns in REQUIRED_COLUMNS.items():
+        if all(column in head.columns for column in columns):
+            return file_name
+    return None
+
+
+def iter_csv_upload_rows(path: str, file_name: str, keep_row) -> Iterator[dict]:
+    """
+    Streams the rows of an uploaded csv file, if it is file_name
+    """
+    if csv_upload_name(path) != file_name:
+        return iter(())
+    head = unzipddp.sniff_csv_file(path) or unzipddp.CsvHead("utf8", ",", [])
+    return unzipddp.iter_csv_rows_from_file(path, keep_row, head.encoding, head.delimiter)
+
+
+def csv_head(netflix_zip: str, file_name: str) -> unzipddp.CsvHead:
+    """
+    Encoding and delimiter to parse file_name with, the defaults if they cannot be determined
+    """
+    return unzipddp.sniff_csv_member(netflix_zip, file_name) or unzipddp.CsvHead("utf8", ",", [])
+
+
 def extract_users_from_df(df: pd.DataFrame) -> list[str]:
     """
     Extracts all users from a netflix csv file 
@@ -88,20 +205,141 @@ def keep_user(df: pd.DataFrame, selected_user: str) -> pd.DataFrame:
 
     return df
 
-    
-def netflix_to_df(netflix_zip: str, file_name: str, selected_user: str) -> pd.DataFrame:
+
+def is_user_row(row: dict, selected_user: str) -> bool:
+    """
+    Checks whether the first column of a csv row is equal to selected_user
+    """
+    return next(iter(row.values()), None) == selected_user
+
+
+def read_members(netflix_zip: str, file_names: list[str], governor: MemoryGovernor | None = None) -> dict[str, io.BytesIO]:
+    """
+    Decompresses the files in file_names that can be read in one go, see unzipddp.extract_files_from_zip
+    Files the governor decides to stream are left out, as are all files of a csv file that was uploaded on its own
+
+    Holding several decompressed files at once only pays off if they are decompressed concurrently,
+    when that is not possible nothing is decompressed up front and every file is read when it is parsed.
+    The buffers are charged to the governor, netflix_to_df releases them after parsing.
+
+    The result can be passed as member to netflix_to_df, ratings_to_df and viewing_activity_to_df
+    """
+    if not unzipddp.PARALLEL_DECOMPRESSION or not zipfile.is_zipfile(netflix_zip):
+        return {}
+
+    if governor is not None:
+        # netflix_to_df logs the decision to stream a file when it streams it
+        file_names = [
+            f for f in file_names
+            if governor.level(unzipddp.member_size(netflix_zip, f) * CSV_EXPANSION_FACTOR) == Degradation.NONE
+        ]
+
+    if len(file_names) < 2:
+        return {}
+
+    members = unzipddp.extract_files_from_zip(netflix_zip, file_names)
+    if governor is not None:
+        for file_name, member in members.items():
+            governor.charge(member_label(file_name), member.getbuffer().nbytes)
+    return members
+
+
+def member_label(file_name: str) -> str:
+    """
+    Label the governor charges the decompressed bytes of file_name to, see read_members
+    """
+    return f"{file_name} (decompressed)"
+
+
+def netflix_to_df(
+    netflix_zip: str,
+    file_name: str,
+    selected_user: str,
+    governor: MemoryGovernor | None = None,
+    member: io.BytesIO | None = None,
+) -> pd.DataFrame:
     """
     netflix csv to df
     returns empty df in case of error
+
+    If a governor is given and the file is expected to be large,
+    the file is streamed and only the rows of selected_user are kept in memory.
+    A csv file that was uploaded on its own is always streamed.
+    If member is given, it should contain the decompressed file, see read_members
     """
-    ratings_bytes = unzipddp.extract_file_from_zip(netflix_zip, file_name)
-    df = unzipddp.read_csv_from_bytes_to_df(ratings_bytes)
+    if not zipfile.is_zipfile(netflix_zip):
+        df = pd.DataFrame(list(iter_csv_upload_rows(netflix_zip, file_name, lambda row: is_user_row(row, selected_user))))
+        if governor is not None:
+            governor.charge_df(file_name, df)
+        return df
+
+    head = csv_head(netflix_zip, file_name)
+    if governor is not None and member is None:
+        expected_bytes = unzipddp.member_size(netflix_zip, file_name) * CSV_EXPANSION_FACTOR
+        if governor.use_chunked(file_name, expected_bytes):
+            rows = unzipddp.iter_csv_rows_from_zip(
+                netflix_zip, file_name, lambda row: is_user_row(row, selected_user), head.encoding, head.delimiter
+            )
+            df = pd.DataFrame(list(rows))
+            governor.charge_df(file_name, df)
+            return df
+
+    if member is not None:
+        member.seek(0)
+        ratings_bytes = member
+    else:
+        ratings_bytes = unzipddp.extract_file_from_zip(netflix_zip, file_name)
+    df = unzipddp.read_csv_from_bytes_to_df(ratings_bytes, head.encoding, head.delimiter)
+    if member is not None:
+        # The parsed rows replace the decompressed bytes
+        member.close()
+        if governor is not None:
+            governor.release(member_label(file_name))
     df = keep_user(df, selected_user)
+    if governor is not None:
+        governor.charge_df(file_name, df)
 
     return df
 
 
-def ratings_to_df(netflix_zip: str, selected_user: str)  -> pd.DataFrame:
+def extract_users(netflix_zip: str, governor: MemoryGovernor | None = None) -> list[str]:
+    """
+    Reads viewing activity and extracts users from the first column
+
+    If a governor is given and the file is expected to be large,
+    the file is streamed and only the user names are kept in memory.
+    For a csv file that was uploaded on its own, the users are read from that file
+    """
+    if not zipfile.is_zipfile(netflix_zip):
+        file_name = csv_upload_name(netflix_zip)
+        if file_name is None:
+            return []
+        users = {next(iter(row.values()), None) for row in iter_csv_upload_rows(netflix_zip, file_name, lambda row: True)}
+        users.discard(None)
+        return sorted(users)
+
+    file_name = "ViewingActivity.csv"
+    head = csv_head(netflix_zip, file_name)
+    if governor is not None:
+        expected_bytes = unzipddp.member_size(netflix_zip, file_name) * CSV_EXPANSION_FACTOR
+        if governor.use_chunked(file_name, expected_bytes):
+            users = set()
+            for row in unzipddp.iter_csv_rows_from_zip(netflix_zip, file_name, lambda row: True, head.encoding, head.delimiter):
+                users.add(next(iter(row.values()), None))
+            users.discard(None)
+            return sorted(users)
+
+    b = unzipddp.extract_file_from_zip(netflix_zip, file_name)
+    df = unzipddp.read_csv_from_bytes_to_df(b, head.encoding, head.delimiter)
+    return extract_users_from_df(df)
+
+
+def ratings_to_df(
+    netflix_zip: str,
+    selected_user: str,
+    governor: MemoryGovernor | None = None,
+    member: io.BytesIO | None = None,
+) -> pd.DataFrame:
     """
     Extract ratings from netflix zip to df
     Only keep the selected user
@@ -114,13 +352,15 @@ def ratings_to_df(netflix_zip: str, selected_user: str)  -> pd.DataFrame:
         "Thumbs Value": "Aantal duimpjes omhoog"
     }
 
-    df = netflix_to_df(netflix_zip, "Ratings.csv", selected_user)
+    df = netflix_to_df(netflix_zip, "Ratings.csv", selected_user, governor, member)
 
     # Extraction logic here
     try:
         if not df.empty:
             df = df[columns_to_keep]
             df = df.rename(columns=columns_to_rename)
+    except MemoryError:
+        raise
     except Exception as e:
         logger.error("Data extraction error: %s", e)
         
@@ -128,6 +368,56 @@ def ratings_to_df(netflix_zip: str, selected_user: str)  -> pd.DataFrame:
 
 
 
+def merge_sorted_dfs(dfs: Iterable[pd.DataFrame], by: str) -> pd.DataFrame:
+    """
+    Merges DataFrames with the same columns that are each sorted ascending on column by,
+    with a k-way merge instead of concatenating them and sorting again
+
+    A row that is present in more than one DataFrame, for example a profile in two exports of the same account,
+    is kept as often as it occurs in the DataFrame that contains it most often. Rows are never dropped
+    because of a duplicate in the same DataFrame, so merging a single DataFrame returns the same rows.
+    The columns are those of the first DataFrame that contains by, DataFrames that miss one of them are left out
+    """
+    dfs = [df for df in dfs if not df.empty]
+    reference = next((df for df in dfs if by in df.columns), None)
+    if reference is None:
+        return pd.DataFrame()
+
+    columns = list(reference.columns)
+    aligned = []
+    for df in dfs:
+        missing = [column for column in columns if column not in df.columns]
+        if missing:
+            logger.error("Cannot merge table with %s rows, it is missing columns: %s", len(df), missing)
+            continue
+        aligned.append(df[columns])
+
+    position = columns.index(by)
+    rows = heapq.merge(
+        *(zip(df.itertuples(index=False, name=None), itertools.repeat(source)) for source, df in enumerate(aligned)),
+        key=lambda item: item[0][position],
+    )
+
+    out = []
+    # Duplicates have the same value for by, so they are next to each other
+    # Per row: how often each DataFrame contained it so far, and how often it was kept
+    occurrences: dict[tuple[tuple, int], int] = {}
+    kept: dict[tuple, int] = {}
+    current = None
+    for row, source in rows:
+        if row[position] != current:
+            current = row[position]
+            occurrences.clear()
+            kept.clear()
+        count = occurrences[row, source] = occurrences.get((row, source), 0) + 1
+        if count > kept.get(row, 0):
+            kept[row] = count
+            out.append(row)
+
+    logger.debug("Merged %s tables into %s rows", len(aligned), len(out))
+    return pd.DataFrame(out, columns=columns)
+
+
 def time_string_to_hours(time_str):
     try:
         # Split the time string into hours, minutes, and seconds
@@ -145,7 +435,12 @@ def time_string_to_hours(time_str):
     return round(total_hours, 3)
 
 
-def viewing_activity_to_df(netflix_zip: str, selected_user: str)  -> pd.DataFrame:
+def viewing_activity_to_df(
+    netflix_zip: str,
+    selected_user: str,
+    governor: MemoryGovernor | None = None,
+    member: io.BytesIO | None = None,
+) -> pd.DataFrame:
     """
     Extract ViewingActivity from netflix zip to df
     Only keep the selected user
@@ -159,7 +454,7 @@ def viewing_activity_to_df(netflix_zip: str, selected_user: str)  -> pd.DataFram
         "Duration": "Aantal uur gekeken"
     }
 
-    df = netflix_to_df(netflix_zip, "ViewingActivity.csv", selected_user)
+    df = netflix_to_df(netflix_zip, "ViewingActivity.csv", selected_user, governor, member)
     remove_values = ["TEASER_TRAILER", "HOOK", "TRAILER", "CINEMAGRAPH"]
 
     # Extraction logic here
@@ -171,6 +466,8 @@ def viewing_activity_to_df(netflix_zip: str, selected_user: str)  -> pd.DataFram
 
         df['Aantal uur gekeken'] = df['Aantal uur gekeken'].apply(time_string_to_hours)
         df = df.sort_values(by='Start tijd', ascending=True).reset_index(drop=True)
+    except MemoryError:
+        raise
     except Exception as e:
         logger.error("Data extraction error: %s", e)
         
@@ -11,34 +11,16 @@ import port.api.props as props
 import port.helpers.extraction_helpers as eh
 import port.helpers.port_helpers as ph
 import port.helpers.validate as validate
-
-from port.helpers.validate import (
-    DDPCategory,
-    DDPFiletype,
-    Language,
-)
+import port.platforms.registry as registry
 
 logger = logging.getLogger(__name__)
 
-DDP_CATEGORIES = [
-    DDPCategory(
-        id="json",
-        ddp_filetype=DDPFiletype.JSON,
-        language=Language.EN,
-        known_files=[
-            "chat.html", 
-            "conversations.json",
-            "message_feedback.json",
-            "model_comparisons.json",
-            "user.json"
-        ]
-    )
-]
+DDP_CATEGORIES = registry.CHATGPT_CATEGORIES
 
 
 def conversations_to_df(chatgpt_zip: str)  -> pd.DataFrame:
-    b = eh.extract_file_from_zip(chatgpt_zip, "conversations.json")
-    conversations = eh.read_json_from_bytes(b)
+    # conversations.json can be hundreds of MB, it is parsed one conversation at a time
+    conversations = eh.iter_json_array_from_zip(chatgpt_zip, "conversations.json")
 
     datapoints = []
     out = pd.DataFrame()
@@ -48,7 +30,8 @@ def conversations_to_df(chatgpt_zip: str)  -> pd.DataFrame:
             title = conversation["title"]
             for _, turn in conversation["mapping"].items():
 
-                denested_d = eh.dict_denester(turn)
+                # Indexed once, the turn is queried several times
+                denested_d = eh.DenestedIndex(turn)
                 is_hidden = eh.find_item(denested_d, "is_visually_hidden_from_conversation")
                 if is_hidden != "True":
                     role = eh.find_item(denested_d, "role")
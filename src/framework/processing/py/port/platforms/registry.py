@@ -0,0 +1,171 @@
+"""
+Registry of the platforms a DDP can come from
+
+The known files of all platforms are combined in a single index, so the platform
+of an uploaded zip is detected from one read of its central directory. Platform
+modules are only imported once a DDP of that platform is detected:
+
+    detection = registry.detect(path_to_zip)
+    if detection is not None:
+        module = detection.platform.load()
+
+The DDP categories of the platforms are declared here, the platform modules use
+these lists as their DDP_CATEGORIES.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Iterable
+import importlib
+import logging
+import zipfile
+
+import port.unzipddp as unzipddp
+import port.validate as validate
+import port.helpers.validate as helpers_validate
+from port.my_exceptions import ZipResourceLimitError
+
+logger = logging.getLogger(__name__)
+
+NETFLIX_CATEGORIES = [
+    validate.DDPCategory(
+        id="csv",
+        ddp_filetype=validate.DDPFiletype.CSV,
+        language=validate.Language.EN,
+        known_files=["MyList.csv", "ViewingActivity.csv", "SearchHistory.csv", "IndicatedPreferences.csv", "PlaybackRelatedEvents.csv", "InteractiveTitles.csv", "Ratings.csv", "GamePlaySession.txt", "IpAddressesLogin.csv", "IpAddressesAccountCreation.txt", "IpAddressesStreaming.csv", "Additional Information.pdf", "MessagesSentByNetflix.csv", "SocialMediaConnections.txt", "AccountDetails.csv", "ProductCancellationSurvey.txt", "CSContact.csv", "ChatTranscripts.csv", "Cover sheet.pdf", "Devices.csv", "ParentalControlsRestrictedTitles.txt", "AvatarHistory.csv", "Profiles.csv", "Clickstream.csv", "BillingHistory.csv"]
+    )
+]
+
+CHATGPT_CATEGORIES = [
+    helpers_validate.DDPCategory(
+        id="json",
+        ddp_filetype=helpers_validate.DDPFiletype.JSON,
+        language=helpers_validate.Language.EN,
+        known_files=[
+            "chat.html",
+            "conversations.json",
+            "message_feedback.json",
+            "model_comparisons.json",
+            "user.json"
+        ]
+    )
+]
+
+
+@dataclass
+class Platform:
+    """
+    A platform DDPs can be donated from
+
+    Attributes:
+        name (str): Name of the platform.
+        module (str): Module containing the extraction of the platform, imported on first use.
+        categories (list[DDPCategory]): The DDP categories of the platform.
+    """
+    name: str
+    module: str
+    categories: list
+
+    def load(self) -> ModuleType:
+        """
+        Imports the module of the platform
+        """
+        return importlib.import_module(self.module)
+
+
+@dataclass
+class Detection:
+    """
+    The platform and DDP category a DDP was detected as
+
+    Attributes:
+        platform (Platform): The detected platform.
+        category (DDPCategory): The detected DDP category of that platform.
+        score (float): Percentage of the weight of the known files of the category that was found.
+    """
+    platform: Platform
+    category: Any
+    score: float
+
+
+PLATFORMS = [
+    Platform("netflix", "port.netflix", NETFLIX_CATEGORIES),
+    Platform("chatgpt", "port.platforms.chatgpt", CHATGPT_CATEGORIES),
+]
+
+
+@dataclass
+class PlatformIndex:
+    """
+    Index of the known files of the DDP categories of all platforms
+    """
+    platforms: list[Platform]
+
+    index: helpers_validate.CategoryIndex = field(init=False)
+    owners: list[Platform] = field(init=False)
+
+    def __post_init__(self) -> None:
+        categories = []
+        self.owners = []
+        for platform in self.platforms:
+            categories.extend(platform.categories)
+            self.owners.extend([platform] * len(platform.categories))
+        self.index = helpers_validate.CategoryIndex(categories)
+
+    def detect_files(self, file_names: Iterable[str], threshold: float = 5) -> Detection | None:
+        """
+        Detects the platform and DDP category from the names of the files in a DDP
+        """
+        scores = self.index.scores(file_names)
+        if not scores or max(scores) < threshold:
+            return None
+
+        best = scores.index(max(scores))
+        return Detection(self.owners[best], self.index.categories[best], scores[best])
+
+
+_PLATFORM_INDEX: PlatformIndex | None = None
+
+
+def platform_index() -> PlatformIndex:
+    """
+    Returns the index of all registered platforms, built on first use
+    """
+    global _PLATFORM_INDEX
+    if _PLATFORM_INDEX is None:
+        _PLATFORM_INDEX = PlatformIndex(PLATFORMS)
+    return _PLATFORM_INDEX
+
+
+def find_platform(name: str) -> Platform | None:
+    for platform in PLATFORMS:
+        if platform.name == name:
+            return platform
+    return None
+
+
+def detect(path_to_zip: str) -> Detection | None:
+    """
+    Detects the platform of a DDP, reading only the central directory of the zip
+
+    Returns:
+        Detection | None: The detected platform and category, None if the zip is not a known DDP, a bad zipfile or exceeds the resource limits.
+    """
+    try:
+        with unzipddp.open_zip(path_to_zip) as zf:
+            # The platform module checks the sizes of the files it reads, here nothing is read
+            unzipddp.check_zip_limits(zf, lambda info: False)
+            file_names = [Path(name).name for name in unzipddp.member_names(zf)]
+    except (zipfile.BadZipFile, OSError) as e:
+        logger.info("Could not read zip: %s", e)
+        return None
+    except ZipResourceLimitError as e:
+        logger.error("Resource limit exceeded:  %s", e)
+        return None
+
+    detection = platform_index().detect_files(file_names)
+    if detection is None:
+        logger.info("Not a DDP of a known platform")
+    else:
+        logger.info("Detected %s DDP, category: %s", detection.platform.name, detection.category.id)
+    return detection
@@ -1,26 +1,47 @@
+import dataclasses
 import logging
 import json
-import io
 
 import pandas as pd
 
-from port.api.commands import (CommandSystemDonate, CommandSystemExit, CommandUIRender)
+from port.api.commands import (CommandSystemDonate, CommandSystemDonateBatch, CommandSystemExit, CommandUIRender)
 import port.api.props as props
 import port.unzipddp as unzipddp
 import port.netflix as netflix
+import port.session as session
+import port.donation as donation
+import port.helpers.port_helpers as ph
+from port.memory import MemoryGovernor, CSV_EXPANSION_FACTOR
 
 
-LOG_STREAM = io.StringIO()
-
-logging.basicConfig(
-    stream=LOG_STREAM,
-    level=logging.INFO,
-    format="%(asctime)s --- %(name)s --- %(levelname)s --- %(message)s",
-    datefmt="%Y-%m-%dT%H:%M:%S%z",
-)
+# Log records are written to the log buffer of the active session
+session.install_log_handler()
 
 LOGGER = logging.getLogger("script")
 
+# Compress the donated data, the storage side should decode it with port.donation.decompress_json_string
+COMPRESS_DONATIONS = False
+
+# Donations larger than this are donated in chunks followed by a manifest, None donates them in one piece.
+# The storage side should reassemble chunks with port.donation.join_chunks, e.g. donation.DEFAULT_CHUNK_SIZE
+# Chunks the host does not acknowledge are resent. Chunking bounds the size of every message to the host,
+# the donation the consent form resolves with is still held in memory as a whole.
+DONATION_CHUNK_SIZE = None
+
+# Number of sampled rows shown per table in the consent form, None shows all rows. All rows are donated.
+# The visualizations in the consent form are computed on the sample
+TABLE_PREVIEW_SIZE = None
+
+# Number of shown rows per table the consent form receives at once, the participant can load further pages.
+# None sends all shown rows at once. All rows are donated, also the ones on pages that were never loaded
+TABLE_PAGE_SIZE = None
+
+# Accept several Netflix exports in one upload, for example of the accounts in one household
+MULTIPLE_FILES = False
+
+# "columnar" hands the tables to the consent form as typed arrays instead of json strings
+TABLE_TRANSPORT = "json"
+
 TABLE_TITLES = {
     "netflix_ratings": props.Translatable(
         {
@@ -91,6 +112,10 @@ RETRY_HEADER = props.Translatable({
 
 
 def process(session_id):
+    if MULTIPLE_FILES:
+        yield from process_multiple(session_id)
+        return
+
     LOGGER.info("Starting the donation flow")
     yield donate_logs(f"{session_id}-tracking")
 
@@ -106,7 +131,10 @@ def process(session_id):
         selected_user = ""
 
         if file_result.__type__ == "PayloadString":
-            validation = netflix.validate_zip(file_result.value)
+            upload = upload_cache(file_result.value)
+            if "validation" not in upload:
+                upload["validation"] = netflix.validate_zip(file_result.value)
+            validation = upload["validation"]
 
             # Flow logic
             # Happy flow: Valid DDP, user was set selected
@@ -119,17 +147,23 @@ def process(session_id):
                 yield donate_logs(f"{session_id}-tracking")
 
                 # Extract the user
-                users = extract_users(file_result.value)
+                governor = MemoryGovernor()
+                if "exports" not in upload:
+                    upload["exports"] = netflix.find_exports(file_result.value)
+                exports = upload["exports"]
+                if "users" not in upload:
+                    upload["users"] = extract_users_of_exports(exports, governor)
+                users = upload["users"]
 
                 if len(users) == 1:
                     selected_user = users[0]
-                    extraction_result = extract_netflix(file_result.value, selected_user)
+                    extraction_result = extract_exports(exports, selected_user, governor)
                     table_list = extraction_result
                 elif len(users) > 1:
                     selection = yield prompt_radio_menu_select_username(users)
                     if selection.__type__ == "PayloadString":
                         selected_user = selection.value
-                        extraction_result = extract_netflix(file_result.value, selected_user)
+                        extraction_result = extract_exports(exports, selected_user, governor)
                         table_list = extraction_result
                     else:
                         LOGGER.info("User skipped during user selection")
@@ -148,8 +182,10 @@ def process(session_id):
                     continue
                 else:
                     LOGGER.info("Skipped during retry ending flow")
-                    yield donate_logs(f"{session_id}-tracking")
-                    yield donate_status(f"{session_id}-SKIP-RETRY-FLOW", "SKIP_RETRY_FLOW")
+                    yield donate_batch(
+                        donate_logs(f"{session_id}-tracking"),
+                        donate_status(f"{session_id}-SKIP-RETRY-FLOW", "SKIP_RETRY_FLOW"),
+                    )
                     break
 
             # Enter retry flow, reason: valid DDP but no users could be extracted
@@ -162,60 +198,178 @@ def process(session_id):
                     continue
                 else:
                     LOGGER.info("Skipped during retry ending flow")
-                    yield donate_logs(f"{session_id}-tracking")
-                    yield donate_status(f"{session_id}-SKIP-RETRY-FLOW", "SKIP_RETRY_FLOW")
+                    yield donate_batch(
+                        donate_logs(f"{session_id}-tracking"),
+                        donate_status(f"{session_id}-SKIP-RETRY-FLOW", "SKIP_RETRY_FLOW"),
+                    )
                     break
 
         else:
             LOGGER.info("Skipped at file selection ending flow")
-            yield donate_logs(f"{session_id}-tracking")
-            yield donate_status(f"{session_id}-SKIP-FILE-SELECTION", "SKIP_FILE_SELECTION")
+            yield donate_batch(
+                donate_logs(f"{session_id}-tracking"),
+                donate_status(f"{session_id}-SKIP-FILE-SELECTION", "SKIP_FILE_SELECTION"),
+            )
             break
 
 
         if table_list is not None:
-            LOGGER.info("Prompt consent; %s", platform_name)
-            yield donate_logs(f"{session_id}-tracking")
-            prompt = create_consent_form(table_list)
-            consent_result = yield render_page(REVIEW_DATA_HEADER, prompt)
+            yield from review_and_donate(session_id, platform_name, table_list)
+            break
 
-            # Data was donated
-            if consent_result.__type__ == "PayloadJSON":
-                LOGGER.info("Data donated; %s", platform_name)
-                yield donate(f"{session_id}-{platform_name}", consent_result.value)
-                yield donate_logs(f"{session_id}-tracking")
-                yield donate_status(f"{session_id}-DONATED", "DONATED")
+    yield exit(0, "Success")
+    yield render_end_page()
 
-                # render happy questionnaire
-                render_questionnaire_results = yield render_questionnaire()
 
-                if render_questionnaire_results.__type__ == "PayloadJSON":
-                    yield donate(f"{session_id}-questionnaire-donation", render_questionnaire_results.value)
-                else:
-                    LOGGER.info("Skipped questionnaire: %s", platform_name)
-                    yield donate_logs(f"{session_id}-tracking")
+def process_multiple(session_id):
+    """
+    Variant of process that accepts several Netflix exports at once
+    The tables of the selected profile are merged over all exports, see extract_netflix_multiple
+    """
+    LOGGER.info("Starting the donation flow for multiple files")
+    yield donate_logs(f"{session_id}-tracking")
 
-            # Data was not donated
-            else:
-                LOGGER.info("Skipped ater reviewing consent: %s", platform_name)
-                yield donate_logs(f"{session_id}-tracking")
-                yield donate_status(f"{session_id}-SKIP-REVIEW-CONSENT", "SKIP_REVIEW_CONSENT")
+    platform_name = "Netflix"
+    table_list = None
 
+    while True:
+        LOGGER.info("Prompt for files for %s", platform_name)
+        yield donate_logs(f"{session_id}-tracking")
 
-                # render sad questionnaire
-                render_questionnaire_results = yield render_questionnaire_no_donation()
-                if render_questionnaire_results.__type__ == "PayloadJSON":
-                    yield donate(f"{session_id}-questionnaire-no-donation", render_questionnaire_results.value)
-                else:
-                    LOGGER.info("Skipped questionnaire: %s", platform_name)
-                    yield donate_logs(f"{session_id}-tracking")
+        promptFile = prompt_file_multiple("application/zip, text/plain", platform_name)
+        file_result = yield render_page(SUBMIT_FILE_HEADER, promptFile)
+        selected_user = ""
 
+        if file_result.__type__ != "PayloadStringArray":
+            LOGGER.info("Skipped at file selection ending flow")
+            yield donate_batch(
+                donate_logs(f"{session_id}-tracking"),
+                donate_status(f"{session_id}-SKIP-FILE-SELECTION", "SKIP_FILE_SELECTION"),
+            )
             break
 
+        paths = file_result.value.to_py() if hasattr(file_result.value, "to_py") else list(file_result.value)
+        netflix_zips = []
+        uploads = []
+        fingerprints = set()
+        for path in paths:
+            upload = upload_cache(path)
+            fingerprint = upload.get("fingerprint")
+            if fingerprint is not None and fingerprint in fingerprints:
+                LOGGER.info("Same file was selected twice, skipping it")
+                continue
+            fingerprints.add(fingerprint)
+
+            if "validation" not in upload:
+                upload["validation"] = netflix.validate_zip(path)
+            if upload["validation"].ddp_category is not None:
+                if "exports" not in upload:
+                    upload["exports"] = netflix.find_exports(path)
+                netflix_zips.extend(upload["exports"])
+                uploads.append(upload)
+
+        LOGGER.info("%s of %s files are valid %s files, containing %s exports", len(uploads), len(paths), platform_name, len(netflix_zips))
+        yield donate_logs(f"{session_id}-tracking")
+
+        if netflix_zips:
+            # Every profile is listed once, also when it is present in more than one export
+            governor = MemoryGovernor()
+            for upload in uploads:
+                if "users" not in upload:
+                    upload["users"] = extract_users_of_exports(upload["exports"], governor)
+            users = sorted({user for upload in uploads for user in upload["users"]})
+
+            if len(users) == 1:
+                selected_user = users[0]
+            elif len(users) > 1:
+                selection = yield prompt_radio_menu_select_username(users)
+                if selection.__type__ == "PayloadString":
+                    selected_user = selection.value
+                else:
+                    LOGGER.info("User skipped during user selection")
+            else:
+                LOGGER.info("No users could be found in DDPs")
+
+            if selected_user != "":
+                table_list = extract_netflix_multiple(netflix_zips, selected_user, governor)
+
+        # Enter retry flow, reason: no valid Netflix DDP was found or no user could be selected
+        if table_list is None:
+            LOGGER.info("No valid %s zip or no user selected; prompt retry_confirmation", platform_name)
+            yield donate_logs(f"{session_id}-tracking")
+            retry_result = yield render_page(RETRY_HEADER, retry_confirmation(platform_name))
+
+            if retry_result.__type__ == "PayloadTrue":
+                continue
+            else:
+                LOGGER.info("Skipped during retry ending flow")
+                yield donate_batch(
+                    donate_logs(f"{session_id}-tracking"),
+                    donate_status(f"{session_id}-SKIP-RETRY-FLOW", "SKIP_RETRY_FLOW"),
+                )
+                break
+
+        yield from review_and_donate(session_id, platform_name, table_list)
+        break
+
     yield exit(0, "Success")
     yield render_end_page()
 
 
+def review_and_donate(session_id: str, platform_name: str, table_list: list[props.PropsUIPromptConsentFormTable]):
+    """
+    Shows the extracted tables in a consent form, donates what the participant consents to
+    and asks the questionnaire that belongs to their choice
+    """
+    LOGGER.info("Prompt consent; %s", platform_name)
+    yield donate_logs(f"{session_id}-tracking")
+    prompt = create_consent_form(table_list)
+    consent_result = yield from ph.serve_consent_form(render_page(REVIEW_DATA_HEADER, prompt), prompt)
+
+    # Data was donated
+    if consent_result.__type__ == "PayloadJSON":
+        LOGGER.info("Data donated; %s", platform_name)
+        if DONATION_CHUNK_SIZE is None:
+            yield donate(f"{session_id}-{platform_name}", consent_result.value, compress=COMPRESS_DONATIONS)
+        else:
+            yield from donation.donate_chunked(
+                f"{session_id}-{platform_name}",
+                consent_result.value,
+                chunk_size=DONATION_CHUNK_SIZE,
+                compress=COMPRESS_DONATIONS,
+            )
+        yield donate_batch(
+            donate_logs(f"{session_id}-tracking"),
+            donate_status(f"{session_id}-DONATED", "DONATED"),
+        )
+
+        # render happy questionnaire
+        render_questionnaire_results = yield render_questionnaire()
+
+        if render_questionnaire_results.__type__ == "PayloadJSON":
+            yield donate(f"{session_id}-questionnaire-donation", render_questionnaire_results.value)
+        else:
+            LOGGER.info("Skipped questionnaire: %s", platform_name)
+            yield donate_logs(f"{session_id}-tracking")
+
+    # Data was not donated
+    else:
+        LOGGER.info("Skipped ater reviewing consent: %s", platform_name)
+        yield donate_batch(
+            donate_logs(f"{session_id}-tracking"),
+            donate_status(f"{session_id}-SKIP-REVIEW-CONSENT", "SKIP_REVIEW_CONSENT"),
+        )
+
+
+        # render sad questionnaire
+        render_questionnaire_results = yield render_questionnaire_no_donation()
+        if render_questionnaire_results.__type__ == "PayloadJSON":
+            yield donate(f"{session_id}-questionnaire-no-donation", render_questionnaire_results.value)
+        else:
+            LOGGER.info("Skipped questionnaire: %s", platform_name)
+            yield donate_logs(f"{session_id}-tracking")
+
+
 ##################################################################
 
 def create_consent_form(table_list: list[props.PropsUIPromptConsentFormTable]) -> props.PropsUIPromptConsentForm:
@@ -223,8 +377,8 @@ def create_consent_form(table_list: list[props.PropsUIPromptConsentFormTable]) -
     Assembles all donated data in consent form to be displayed
     """
     desc = props.Translatable({
-        "en": "Determine whether you want to share the data below. Review the data carefully and adjust if necessary. Only the data that is visualized will be shared. Your contribution will help the previously described research. Thank you in advance.",
-        "nl": "Bepaal of u de onderstaande gegevens wilt delen. Bekijk de gegevens zorgvuldig en pas zo nodig aan. Alleen de gegevens die zijn gevisualiseerd, worden gedeeld. Met uw bijdrage helpt u het eerder beschreven onderzoek. Alvast hartelijk dank.",
+        "en": "Determine whether you want to share the data below. Review the data carefully and adjust if necessary. Large tables may only show a part of their rows, all rows of a table will be shared except the rows you delete. Your contribution will help the previously described research. Thank you in advance.",
+        "nl": "Bepaal of u de onderstaande gegevens wilt delen. Bekijk de gegevens zorgvuldig en pas zo nodig aan. Van grote tabellen wordt mogelijk maar een deel van de rijen getoond, alle rijen van een tabel worden gedeeld behalve de rijen die u verwijdert. Met uw bijdrage helpt u het eerder beschreven onderzoek. Alvast hartelijk dank.",
     })
     return props.PropsUIPromptConsentForm(table_list, description=desc, meta_tables=[])
 
@@ -238,13 +392,27 @@ def return_empty_result_set():
     return result
 
 
-def donate_logs(key):
-    log_string = LOG_STREAM.getvalue()  # read the log stream
-    if log_string:
-        log_data = log_string.split("\n")
-    else:
-        log_data = ["no logs"]
+def upload_cache(path: str) -> dict:
+    """
+    Results computed for an uploaded file, shared by identical uploads during this session
+    The upload is identified by its fingerprint, which is logged so it ends up in the tracking logs
+    and duplicate donations can be detected across sessions
+    """
+    fingerprint = unzipddp.fingerprint(path)
+    LOGGER.info("Upload fingerprint: %s", fingerprint)
+    if fingerprint is None:
+        return {}
+
+    current = session.current()
+    uploads = current.cache.setdefault("uploads", {})
+    if fingerprint in uploads:
+        LOGGER.info("Same file was uploaded before during this session, reusing results")
+        current.add_metric("duplicate_uploads")
+    return uploads.setdefault(fingerprint, {"fingerprint": fingerprint})
 
+
+def donate_logs(key):
+    log_data = session.current().log_lines()
     return donate(key, json.dumps(log_data))
 
 
@@ -252,6 +420,13 @@ def donate_status(filename: str, message: str):
     return donate(filename, json.dumps({"status": message}))
 
 
+def donate_batch(*donations):
+    """
+    Sends donations to the host at once, saving a round trip per donation
+    """
+    return CommandSystemDonateBatch(list(donations))
+
+
 def prompt_radio_menu_select_username(users):
     """
     Prompt selection menu to select which user you are
@@ -274,18 +449,63 @@ def prompt_radio_menu_select_username(users):
 # Extraction function
 
 # The A conditional group gets the visualizations 
-def extract_netflix(netflix_zip: str, selected_user: str) -> list[props.PropsUIPromptConsentFormTable]:
+def extract_netflix(netflix_zip: str, selected_user: str, governor: MemoryGovernor | None = None) -> list[props.PropsUIPromptConsentFormTable]:
     """
     Main data extraction function
     Assemble all extraction logic here, results are stored in a dict
+
+    The governor keeps track of the memory used during extraction,
+    when the budget is approached the ratings table is dropped
+    and the consent form shows a sample of the tables instead of crashing the worker
     """
+    if governor is None:
+        governor = MemoryGovernor()
 
-    tables_to_render = []
-    
-    # Extract the ratings
+    ratings_df, viewings_df = extract_netflix_dfs(netflix_zip, selected_user, governor)
+    return create_netflix_tables(ratings_df, viewings_df, governor)
+
+
+def extract_netflix_dfs(netflix_zip: str, selected_user: str, governor: MemoryGovernor) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Extracts the ratings and the viewing activity of selected_user, empty if they could not be extracted
+    """
+    # Extract the ratings, these are optional
     ###################################################################
 
-    df = netflix.ratings_to_df(netflix_zip, selected_user)
+    ratings_df = pd.DataFrame()
+    expected_bytes = unzipddp.member_size(netflix_zip, "Ratings.csv") * CSV_EXPANSION_FACTOR
+    keep_ratings = governor.keep_optional("netflix_rating", expected_bytes)
+
+    # On native CPython the files are decompressed up front and concurrently, see netflix.read_members
+    members = netflix.read_members(netflix_zip, (["Ratings.csv"] if keep_ratings else []) + ["ViewingActivity.csv"], governor)
+
+    if keep_ratings:
+        try:
+            ratings_df = netflix.ratings_to_df(netflix_zip, selected_user, governor, members.pop("Ratings.csv", None))
+        except MemoryError:
+            governor.out_of_memory("netflix_rating")
+            governor.release("Ratings.csv")
+            governor.release(netflix.member_label("Ratings.csv"))
+            ratings_df = pd.DataFrame()
+
+    try:
+        viewings_df = netflix.viewing_activity_to_df(netflix_zip, selected_user, governor, members.pop("ViewingActivity.csv", None))
+    except MemoryError:
+        governor.out_of_memory("netflix_viewings")
+        governor.release("ViewingActivity.csv")
+        governor.release(netflix.member_label("ViewingActivity.csv"))
+        viewings_df = pd.DataFrame()
+
+    return ratings_df, viewings_df
+
+
+def create_netflix_tables(ratings_df: pd.DataFrame, viewings_df: pd.DataFrame, governor: MemoryGovernor) -> list[props.PropsUIPromptConsentFormTable]:
+    """
+    Creates the consent form tables of the extracted ratings and viewing activity, empty tables are left out
+    """
+    tables_to_render = []
+
+    df = ratings_df
     if not df.empty:
         wordcloud = {
             "title": {"en": "Titles rated by thumbs value", "nl": "Gekeken titles, grootte is gebasseerd op het aantal duimpjes omhoog"},
@@ -298,11 +518,12 @@ def extract_netflix(netflix_zip: str, selected_user: str) -> list[props.PropsUIP
             "en": "Click 'Show Table' to view these ratings per row.", 
             "nl": "Klik op ‘Tabel tonen’ om deze beoordelingen per rij te bekijken."
         })
-        table = props.PropsUIPromptConsentFormTable("netflix_rating", table_title, df, table_description, [wordcloud])
+        preview_size = governor.limit_preview("netflix_rating", len(df), TABLE_PREVIEW_SIZE)
+        table = props.PropsUIPromptConsentFormTable("netflix_rating", table_title, df, table_description, [wordcloud], transport=TABLE_TRANSPORT, preview_size=preview_size, page_size=TABLE_PAGE_SIZE)
         tables_to_render.append(table)
 
 
-    df = netflix.viewing_activity_to_df(netflix_zip, selected_user)
+    df = viewings_df
     if not df.empty:
 
         hours_logged_in = {
@@ -338,22 +559,76 @@ def extract_netflix(netflix_zip: str, selected_user: str) -> list[props.PropsUIP
             "en": "This table shows what titles you watched when and for how long.", 
             "nl": "Klik op ‘Tabel tonen’ om voor elke keer dat u iets op Netflix heeft gekeken te zien welke serie of film dit was, wanneer u dit heeft gekeken, hoe lang u het heeft gekeken."
         })
-        table = props.PropsUIPromptConsentFormTable("netflix_viewings", table_title, df, table_description, [hours_logged_in, at_what_time])
+        preview_size = governor.limit_preview("netflix_viewings", len(df), TABLE_PREVIEW_SIZE)
+        table = props.PropsUIPromptConsentFormTable("netflix_viewings", table_title, df, table_description, [hours_logged_in, at_what_time], transport=TABLE_TRANSPORT, preview_size=preview_size, page_size=TABLE_PAGE_SIZE)
         tables_to_render.append(table)
 
+    LOGGER.info("Extraction used at most %s bytes of %s", governor.peak, governor.budget)
+    current = session.current()
+    current.metrics["peak_extraction_bytes"] = max(current.metrics.get("peak_extraction_bytes", 0), governor.peak)
     return tables_to_render
 
 
 
 
-def extract_users(netflix_zip):
+def extract_netflix_multiple(netflix_zips: list[str | unzipddp.NestedZip], selected_user: str, governor: MemoryGovernor | None = None) -> list[props.PropsUIPromptConsentFormTable]:
+    """
+    Extracts the tables of selected_user from every export and merges them on their timestamps
+    The exports are processed one after another, only the extracted rows of an export are kept after it is processed
+
+    Every export is extracted with a fresh governor with the settings of governor,
+    so an export is not degraded because of the exports before it
+    """
+    if governor is None:
+        governor = MemoryGovernor()
+
+    all_ratings = []
+    all_viewings = []
+    for netflix_zip in netflix_zips:
+        export_governor = dataclasses.replace(governor)
+        ratings_df, viewings_df = extract_netflix_dfs(netflix_zip, selected_user, export_governor)
+        governor.peak = max(governor.peak, export_governor.peak)
+        # Ratings are not sorted by extract_netflix_dfs, viewings are
+        if not ratings_df.empty:
+            ratings_df = ratings_df.sort_values(by="Datum en tijd", kind="stable").reset_index(drop=True)
+        all_ratings.append(ratings_df)
+        all_viewings.append(viewings_df)
+
+    ratings_df = netflix.merge_sorted_dfs(all_ratings, "Datum en tijd")
+    viewings_df = netflix.merge_sorted_dfs(all_viewings, "Start tijd")
+    return create_netflix_tables(ratings_df, viewings_df, governor)
+
+
+def extract_exports(exports: list[str | unzipddp.NestedZip], selected_user: str, governor: MemoryGovernor | None = None) -> list[props.PropsUIPromptConsentFormTable]:
+    """
+    Extracts the tables of selected_user from the exports in an upload, see netflix.find_exports
+    The tables of an upload with several exports are merged like those of several uploads
+    """
+    if len(exports) == 1:
+        return extract_netflix(exports[0], selected_user, governor)
+    return extract_netflix_multiple(exports, selected_user, governor)
+
+
+def extract_users_of_exports(exports: list[str | unzipddp.NestedZip], governor: MemoryGovernor | None = None) -> list[str]:
+    """
+    Extracts the users of every export, a profile that is present in several exports is listed once
+    """
+    if len(exports) == 1:
+        return extract_users(exports[0], governor)
+    return sorted({user for export in exports for user in extract_users(export, governor)})
+
+
+def extract_users(netflix_zip, governor: MemoryGovernor | None = None):
     """
     Reads viewing activity and extracts users from the first column
     returns list[str]
     """
-    b = unzipddp.extract_file_from_zip(netflix_zip, "ViewingActivity.csv")
-    df = unzipddp.read_csv_from_bytes_to_df(b)
-    users = netflix.extract_users_from_df(df)
+    try:
+        users = netflix.extract_users(netflix_zip, governor)
+    except MemoryError:
+        if governor is not None:
+            governor.out_of_memory("users")
+        users = []
     return users
 
 
@@ -427,7 +702,19 @@ def prompt_file(extensions, platform):
     return props.PropsUIPromptFileInput(description, extensions)
 
 
-def donate(key, json_string):
+def prompt_file_multiple(extensions, platform):
+    description = props.Translatable(
+        {
+            "en": f"Please follow the download instructions and choose the files that you stored on your device. You can choose more than one file.",
+            "nl": f"Volg de download instructies en kies de bestanden die u opgeslagen heeft op uw apparaat. U kunt meer dan één bestand kiezen."
+        }
+    )
+    return props.PropsUIPromptFileInputMultiple(description, extensions)
+
+
+def donate(key, json_string, compress=False):
+    if compress:
+        json_string = donation.maybe_compress(json_string)
     return CommandSystemDonate(key, json_string)
 
 def exit(code, info):
@@ -0,0 +1,308 @@
+"""
+Server side session host
+
+Runs the donation flow outside of the browser, as a local stand-in for the
+processing worker in py_worker.js. ScriptWrapper.send is the whole protocol
+between the script and its host, so the host only has to move command and
+payload dicts back and forth.
+
+Every connection is one participant. Messages are json objects, one per line:
+
+    client: {"sessionId": "123"}                                   starts port.start("123")
+    server: {"command": {"__type__": "CommandSystemDonate", ...}}
+    client: {"payload": {"__type__": "PayloadVoid", "value": null}}
+    server: {"command": {"__type__": "CommandUIRender", ...}}
+    ...
+
+A PayloadString carrying a path refers to a file on the machine the host runs on,
+in the browser this is the path the uploaded file is mounted on.
+
+Sessions live in worker processes, so the extraction of one participant's big file
+does not block the event loop or the other sessions. A worker hosts one session at a
+time, from its start until the connection closes, because the script is a generator
+that cannot move between processes. When all workers are busy, new participants wait
+at the host until a worker is free.
+
+This limits the capacity of the host: at most --workers participants are served at
+the same time, also while they are only reading a page. Set --workers to the number
+of participants that should be able to donate at the same time, not to the number of
+cores; most of the time the workers wait for their participant.
+
+A worker that dies, for example because it ran out of memory on a big file, ends its
+session with an error page and is replaced by a new worker.
+
+Usage:
+    python -m port.server --host 127.0.0.1 --port 8765 --workers 4 --max-sessions 100
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import traceback
+import uuid
+
+from port.api.payloads import Payload
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_SESSIONS = 100
+
+# Commands can contain complete tables, allow for large lines
+STREAM_LIMIT = 1024 * 1024 * 1024
+
+
+def generate_error_message(stacktrace: str) -> dict[str, Any]:
+    """
+    Same as generateErrorMessage in py_worker.js
+    """
+    return {
+        "__type__": "CommandUIRender",
+        "page": {
+            "__type__": "PropsUIPageError",
+            "stacktrace": stacktrace,
+        },
+    }
+
+
+def _worker_main(conn: Connection) -> None:
+    """
+    Main loop of a worker process, hosts the session assigned to this worker
+    """
+    import port
+
+    session = None
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+
+        action, key, data = message
+        try:
+            if action == "start":
+                session = port.start(data)
+                result = session.send(None)
+            elif action == "send":
+                result = session.send(Payload.from_dict(data))
+            elif action == "close":
+                session = None
+                result = None
+            else:
+                raise ValueError(f"Unknown action: {action}")
+            conn.send(("ok", result))
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+
+def _to_json(obj: Any) -> Any:
+    """
+    Columnar tables contain arrays, these are sent as lists with null for missing values
+    """
+    if hasattr(obj, "tolist"):
+        return [None if isinstance(value, float) and math.isnan(value) else value for value in obj.tolist()]
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class WorkerDiedError(Exception):
+    """
+    The worker process hosting a session exited
+    """
+
+
+@dataclass
+class _Worker:
+    """
+    A worker process and the connection to it, only the session on the worker uses the connection
+    """
+    process: multiprocessing.Process
+    conn: Connection
+    died: bool = False
+
+    @staticmethod
+    def spawn() -> "_Worker":
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        process.start()
+        # Only the worker holds the other end, so recv raises EOFError when the worker dies
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def is_alive(self) -> bool:
+        return not self.died and self.process.is_alive()
+
+    def roundtrip(self, message: tuple[str, str, Any]) -> tuple[str, Any]:
+        try:
+            self.conn.send(message)
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.died = True
+            raise WorkerDiedError(f"Worker process exited with code {self.process.exitcode}") from e
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SessionHost:
+    """
+    Manages a pool of worker processes, each hosting one port.main.start session at a time
+
+    Attributes:
+        workers (int): Number of worker processes, the number of sessions that run at the same time.
+        max_sessions (int): Maximum number of sessions that are running or waiting for a worker.
+    """
+    def __init__(self, workers: int | None = None, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_sessions = max_sessions
+        self._pool: list[_Worker] = []
+        self._idle: asyncio.Queue[_Worker] = asyncio.Queue()
+        self._sessions: dict[str, _Worker] = {}
+        self._n_sessions = 0
+        # Waiting for a worker blocks, do that on threads instead of on the event loop
+        self._io = ThreadPoolExecutor(max_workers=self.workers)
+
+    def start(self) -> None:
+        for _ in range(self.workers):
+            worker = _Worker.spawn()
+            self._pool.append(worker)
+            self._idle.put_nowait(worker)
+        logger.info("Started %s workers", self.workers)
+
+    def stop(self) -> None:
+        for worker in self._pool:
+            try:
+                worker.conn.send(None)
+                worker.process.join(timeout=5)
+            except OSError:
+                pass
+            if worker.process.is_alive():
+                worker.kill()
+        self._pool = []
+        self._io.shutdown(wait=False)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        """
+        Replaces a worker that died by a new one
+        """
+        logger.error("Worker process exited with code %s, starting a new one", worker.process.exitcode)
+        worker.kill()
+        replacement = _Worker.spawn()
+        self._pool[self._pool.index(worker)] = replacement
+        return replacement
+
+    async def _call(self, worker: _Worker, message: tuple[str, str, Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        status, result = await loop.run_in_executor(self._io, worker.roundtrip, message)
+        if status == "error":
+            logger.error("Session %s failed: %s", message[1], result)
+            return generate_error_message(result)
+        return result
+
+    async def open_session(self, session_id: str) -> tuple[str, dict[str, Any]]:
+        """
+        Waits for a free worker, starts a session on it and returns its key and first command
+        """
+        if self._n_sessions >= self.max_sessions:
+            raise RuntimeError("Maximum number of sessions reached")
+
+        self._n_sessions += 1
+        try:
+            worker = await self._idle.get()
+        except BaseException:
+            self._n_sessions -= 1
+            raise
+        if not worker.is_alive():
+            worker = self._replace(worker)
+
+        key = uuid.uuid4().hex
+        self._sessions[key] = worker
+        try:
+            command = await self._call(worker, ("start", key, session_id))
+        except BaseException:
+            await self.close_session(key)
+            raise
+        return key, command
+
+    async def send(self, key: str, payload: dict[str, Any] | None) -> dict[str, Any]:
+        """
+        Sends a payload to a session and returns the next command
+        """
+        return await self._call(self._sessions[key], ("send", key, payload))
+
+    async def close_session(self, key: str) -> None:
+        worker = self._sessions.pop(key, None)
+        if worker is not None:
+            try:
+                if worker.is_alive():
+                    await self._call(worker, ("close", key, None))
+            except WorkerDiedError:
+                pass
+            finally:
+                self._n_sessions -= 1
+                if not worker.is_alive():
+                    worker = self._replace(worker)
+                self._idle.put_nowait(worker)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Exchanges commands and payloads with a single participant
+        """
+        key = None
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                if key is None:
+                    key, command = await self.open_session(str(message.get("sessionId", "")))
+                else:
+                    command = await self.send(key, message.get("payload"))
+
+                writer.write(json.dumps({"command": command}, default=_to_json).encode() + b"\n")
+                await writer.drain()
+        except Exception as e:
+            logger.error("Connection failed: %s", e)
+            writer.write(json.dumps({"command": generate_error_message(str(e))}).encode() + b"\n")
+        finally:
+            if key is not None:
+                await self.close_session(key)
+            writer.close()
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int | None = None, max_sessions: int = DEFAULT_MAX_SESSIONS) -> None:
+    session_host = SessionHost(workers, max_sessions)
+    session_host.start()
+    try:
+        server = await asyncio.start_server(session_host.handle_connection, host, port, limit=STREAM_LIMIT)
+        logger.info("Listening on %s:%s", host, port)
+        async with server:
+            await server.serve_forever()
+    finally:
+        session_host.stop()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Host donation flow sessions")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Number of worker processes, defaults to the number of cores. A worker serves one participant for their whole "
+        "session, so this is the maximum number of participants served at the same time, others wait for a free worker",
+    )
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s --- %(name)s --- %(levelname)s --- %(message)s", force=True)
+    asyncio.run(serve(args.host, args.port, args.workers, args.max_sessions))
+
+
+if __name__ == "__main__":
+    main()
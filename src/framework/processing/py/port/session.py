@@ -0,0 +1,120 @@
+"""
+Contains the state that belongs to a single donation flow session
+
+A session owns its log buffer, a cache and metrics. The session that is active
+is tracked with a context variable, this allows many donation flows to run in
+the same interpreter without their logs and tracking donations getting mixed up.
+
+The script should not keep state in module globals, but ask for the active session:
+
+    session = current()
+    session.cache["key"] = value
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+import contextlib
+import io
+import logging
+import time
+
+LOG_FORMAT = "%(asctime)s --- %(name)s --- %(levelname)s --- %(message)s"
+LOG_DATEFMT = "%Y-%m-%dT%H:%M:%S%z"
+
+
+@dataclass
+class Session:
+    """
+    State of a single donation flow session
+
+    Attributes:
+        session_id (str): The id of the session as passed to port.start.
+        log_stream (io.StringIO): Buffer containing the formatted log records of this session.
+        cache (dict[str, Any]): Values that should be reused during this session.
+        metrics (dict[str, float]): Counters and timings collected during this session.
+    """
+    session_id: str
+    log_stream: io.StringIO = field(default_factory=io.StringIO)
+    cache: dict[str, Any] = field(default_factory=dict)
+    metrics: dict[str, float] = field(default_factory=dict)
+
+    @contextlib.contextmanager
+    def activate(self) -> Iterator["Session"]:
+        """
+        Makes this session the active session for the duration of the with block
+        """
+        token = _CURRENT_SESSION.set(self)
+        try:
+            yield self
+        finally:
+            _CURRENT_SESSION.reset(token)
+
+    @contextlib.contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """
+        Adds the time spent in the with block to metric name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_metric(name, time.perf_counter() - start)
+
+    def add_metric(self, name: str, value: float = 1) -> None:
+        """
+        Adds value to metric name
+        """
+        self.metrics[name] = self.metrics.get(name, 0) + value
+
+    def log_lines(self) -> list[str]:
+        """
+        Returns the log records of this session as a list of lines
+        """
+        log_string = self.log_stream.getvalue()
+        if log_string:
+            return log_string.split("\n")
+        return ["no logs"]
+
+
+# Used by code that runs outside of an active session, for example in port.batch
+_DEFAULT_SESSION = Session(session_id="default")
+_CURRENT_SESSION: ContextVar[Session | None] = ContextVar("port_session", default=None)
+
+
+def current() -> Session:
+    """
+    Returns the active session, or the default session if no session is active
+    """
+    return _CURRENT_SESSION.get() or _DEFAULT_SESSION
+
+
+class SessionLogHandler(logging.Handler):
+    """
+    Writes log records to the log buffer of the active session
+
+    Records emitted outside of an active session are dropped, no session would ever
+    clear them. Hosts that want to see those records, like port.batch and port.server,
+    configure their own handler next to this one.
+    """
+    def emit(self, record: logging.LogRecord) -> None:
+        active = _CURRENT_SESSION.get()
+        if active is None:
+            return
+        try:
+            msg = self.format(record)
+            active.log_stream.write(msg + "\n")
+        except Exception:
+            self.handleError(record)
+
+
+def install_log_handler(level: int = logging.INFO) -> None:
+    """
+    Routes log records to the active session, next to the handlers that are already installed
+    Can be called multiple times, the handler is only installed once
+    """
+    root = logging.getLogger()
+    if not any(isinstance(handler, SessionLogHandler) for handler in root.handlers):
+        handler = SessionLogHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT))
+        root.addHandler(handler)
+    root.setLevel(level)
@@ -2,9 +2,20 @@
 Contains functions to deal with zipfiles
 """
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any, Callable, Iterator
+import codecs
+import contextlib
+import contextvars
+import hashlib
 import logging
+import os
+import sys
+import threading
+import weakref
 import zipfile
 import json
 import csv
@@ -12,10 +23,328 @@ import io
 
 import pandas as pd
 
-from port.my_exceptions import FileNotFoundInZipError
+import port.blockcache as blockcache
+from port.my_exceptions import FileNotFoundInZipError, ZipResourceLimitError
 
 logger = logging.getLogger(__name__)
 
+# Limits protecting the worker heap against zip bombs and corrupt zipfiles
+MAX_MEMBER_SIZE = 512 * 1024 * 1024
+MAX_TOTAL_SIZE = 4 * 1024 * 1024 * 1024
+MAX_MEMBERS = 100_000
+MAX_COMPRESSION_RATIO = 200
+# Small files can legitimately compress extremely well, the ratio is only checked above this size
+RATIO_CHECK_MIN_SIZE = 1024 * 1024
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Zips inside the uploaded zip are opened as streams up to this depth,
+# for example when a participant zipped their Netflix export together with other exports
+MAX_NESTING_DEPTH = 2
+
+# zlib releases the GIL while inflating, so on CPython files in a zipfile can be decompressed concurrently.
+# Pyodide has no threads, there files are decompressed one after another
+PARALLEL_DECOMPRESSION = sys.platform != "emscripten"
+MAX_DECOMPRESSION_WORKERS = min(os.cpu_count() or 1, 8)
+
+# Number of uploads that stay open between reads, see open_zip
+MAX_OPEN_UPLOADS = 2
+
+
+class _OpenUpload:
+    """
+    An uploaded zipfile that stays open between reads, together with the zipfiles nested in it
+
+    Finding the central directory of a nested zipfile decompresses it up to its end,
+    keeping the nested zipfile open does that once per upload instead of once per lookup
+    """
+    def __init__(self, path: str, stat: tuple[int, int]):
+        self.stat = stat
+        self._lock = threading.Lock()
+        self._nested: dict[tuple[int, str], zipfile.ZipFile | None] = {}
+        self._closables: list[Any] = []
+
+        f = blockcache.open_upload(path)
+        try:
+            self.zf = zipfile.ZipFile(f, "r")
+        except BaseException:
+            f.close()
+            raise
+        self._closables.extend([f, self.zf])
+        _upload_of[self.zf] = self
+
+    def open_nested(self, container: zipfile.ZipFile, info: zipfile.ZipInfo) -> zipfile.ZipFile | None:
+        """
+        The nested zipfile info in container, opened as a stream on first use, None if it is not a zipfile
+        """
+        key = (id(container), info.filename)
+        with self._lock:
+            if key in self._nested:
+                return self._nested[key]
+
+            # zipfile seeks back and forth in the nested zipfile, the cache saves decompressing it again for every seek
+            stream = blockcache.BlockCacheFile(container.open(info, "r"))
+            try:
+                nested = zipfile.ZipFile(stream, "r")
+            except zipfile.BadZipFile as e:
+                logger.info("Skipping %s: %s", info.filename, e)
+                stream.close()
+                nested = None
+            else:
+                logger.debug("Opened nested zip: %s", info.filename)
+                self._closables.extend([stream, nested])
+                _upload_of[nested] = self
+
+            self._nested[key] = nested
+            return nested
+
+    def close(self) -> None:
+        for closable in reversed(self._closables):
+            closable.close()
+        self._closables = []
+        self._nested = {}
+
+
+_open_uploads: OrderedDict[str, _OpenUpload] = OrderedDict()
+_open_uploads_lock = threading.Lock()
+# The upload a zipfile, or a zipfile nested in it, belongs to
+_upload_of: weakref.WeakKeyDictionary[zipfile.ZipFile, _OpenUpload] = weakref.WeakKeyDictionary()
+
+
+def _open_upload(path: str) -> _OpenUpload:
+    """
+    Returns the open upload at path, the upload is opened again if the file changed
+    """
+    st = os.stat(path)
+    stat = (st.st_size, st.st_mtime_ns)
+    with _open_uploads_lock:
+        upload = _open_uploads.get(path)
+        if upload is not None and upload.stat == stat:
+            _open_uploads.move_to_end(path)
+            return upload
+
+        if upload is not None:
+            _open_uploads.pop(path).close()
+
+        upload = _OpenUpload(path, stat)
+        _open_uploads[path] = upload
+        while len(_open_uploads) > MAX_OPEN_UPLOADS:
+            _, evicted = _open_uploads.popitem(last=False)
+            evicted.close()
+        return upload
+
+
+@dataclass(frozen=True)
+class NestedZip(os.PathLike):
+    """
+    A zipfile nested in an uploaded zipfile, it can be passed everywhere the path of a zipfile can, see open_zip
+
+    Lookups by file name in the upload find the first file with that name, also when the upload contains several exports.
+    Lookups in a NestedZip only find the files in that zipfile and in the zipfiles nested in it.
+    The fspath is that of the upload, so zipfile.is_zipfile and os.stat look at the upload
+
+    Attributes:
+        path (str): Path of the upload.
+        members (tuple[str, ...]): File names of the nested zipfiles leading to this one, outermost first.
+    """
+    path: str
+    members: tuple[str, ...]
+
+    def __fspath__(self) -> str:
+        return self.path
+
+
+@contextlib.contextmanager
+def open_zip(zfile: Any) -> Iterator[zipfile.ZipFile]:
+    """
+    Opens a zipfile for reading
+    A path is read through a BlockCacheFile, so the many small reads zipfile makes are served from memory.
+    The last MAX_OPEN_UPLOADS paths stay open, together with the zipfiles nested in them,
+    so the many lookups in the same upload do not open and decompress them again
+    """
+    if isinstance(zfile, NestedZip):
+        upload = _open_upload(zfile.path)
+        zf = upload.zf
+        for name in zfile.members:
+            info = zf.getinfo(name)
+            check_member_limits(info)
+            nested = upload.open_nested(zf, info)
+            if nested is None:
+                raise zipfile.BadZipFile(f"{name} is not a zipfile")
+            zf = nested
+        yield zf
+    elif isinstance(zfile, (str, os.PathLike)):
+        yield _open_upload(os.fspath(zfile)).zf
+    else:
+        with zipfile.ZipFile(zfile, "r") as zf:
+            yield zf
+
+
+def is_nested_zip(info: zipfile.ZipInfo) -> bool:
+    """
+    Whether a file in a zipfile is a zipfile itself, judging by its name
+    """
+    return not info.is_dir() and info.filename.lower().endswith(".zip")
+
+
+def walk_zip(zf: zipfile.ZipFile, max_depth: int = MAX_NESTING_DEPTH) -> Iterator[tuple[zipfile.ZipFile, zipfile.ZipInfo]]:
+    """
+    Yields every file in zf and in the zipfiles nested in it, together with the ZipFile that contains the file
+    Files are yielded in the order they are stored, a nested zipfile is followed by its own files
+
+    A nested zipfile is not extracted, it is opened as a stream that is decompressed while it is read
+    and it stays open while its files are yielded. Read a file before advancing to the next one.
+    In an upload opened with open_zip, nested zipfiles stay open as long as the upload, see _OpenUpload.
+    The files of a nested file that is not a zipfile or that exceeds the limits are skipped
+    """
+    for info in sorted(zf.infolist(), key=lambda info: info.header_offset):
+        yield zf, info
+
+        if max_depth <= 0 or not is_nested_zip(info):
+            continue
+
+        try:
+            check_member_limits(info)
+        except ZipResourceLimitError as e:
+            logger.info("Skipping %s: %s", info.filename, e)
+            continue
+
+        upload = _upload_of.get(zf)
+        if upload is not None:
+            nested = upload.open_nested(zf, info)
+            if nested is not None:
+                yield from walk_zip(nested, max_depth - 1)
+            continue
+
+        # zipfile seeks back and forth in the nested zipfile, the cache saves decompressing it again for every seek
+        with blockcache.BlockCacheFile(zf.open(info, "r")) as stream:
+            try:
+                nested = zipfile.ZipFile(stream, "r")
+            except zipfile.BadZipFile as e:
+                logger.info("Skipping %s: %s", info.filename, e)
+                continue
+
+            logger.debug("Opened nested zip: %s", info.filename)
+            with nested:
+                yield from walk_zip(nested, max_depth - 1)
+
+
+def member_names(zf: zipfile.ZipFile) -> list[str]:
+    """
+    Names of all files in zf and in the zipfiles nested in it, see walk_zip
+    """
+    return [info.filename for _, info in walk_zip(zf)]
+
+
+def nested_zips_containing(zfile: str, file_name: str) -> list[NestedZip]:
+    """
+    The innermost zipfile of every file with file name file_name, in the order the files are stored
+    A zipfile is listed once for every such file in it, the upload itself is NestedZip(zfile, ())
+    """
+    chains: dict[int, tuple[str, ...]] = {}
+    found: list[NestedZip] = []
+    with open_zip(zfile) as zf:
+        upload = _upload_of[zf]
+        chains[id(zf)] = ()
+        for container, info in walk_zip(zf):
+            chain = chains[id(container)]
+            if Path(info.filename).name == file_name:
+                found.append(NestedZip(os.fspath(zfile), chain))
+            elif is_nested_zip(info) and len(chain) < MAX_NESTING_DEPTH:
+                try:
+                    check_member_limits(info)
+                except ZipResourceLimitError:
+                    # walk_zip skips it as well
+                    continue
+                # Returns the zipfile walk_zip is about to open, so its files can be traced back to this chain
+                nested_zf = upload.open_nested(container, info)
+                if nested_zf is not None:
+                    chains[id(nested_zf)] = chain + (info.filename,)
+    return found
+
+
+def fingerprint(zfile: Any) -> str | None:
+    """
+    Identifies a zipfile by the names, sizes and CRC-32 checksums in its central directory, nothing is decompressed
+    Uploading the same export twice results in the same fingerprint, also when the zipfile was renamed
+
+    Returns:
+        str | None: Hex digest of the central directory, None if zfile is not a zipfile.
+    """
+    try:
+        with open_zip(zfile) as zf:
+            digest = hashlib.sha256()
+            for info in sorted(zf.infolist(), key=lambda info: info.filename):
+                digest.update(f"{info.filename}\0{info.file_size}\0{info.CRC:08x}\n".encode("utf8", "replace"))
+            return digest.hexdigest()
+    except (zipfile.BadZipFile, OSError) as e:
+        logger.info("Cannot fingerprint upload: %s", e)
+
+    return None
+
+
+def check_member_limits(info: zipfile.ZipInfo, max_size: int = MAX_MEMBER_SIZE) -> None:
+    """
+    Checks the sizes a file in a zipfile declares, before decompressing it
+    Raises ZipResourceLimitError if a limit is exceeded
+    """
+    if info.file_size > max_size:
+        raise ZipResourceLimitError(f"{info.filename} is {info.file_size} bytes, the limit is {max_size}")
+
+    if info.file_size > RATIO_CHECK_MIN_SIZE:
+        ratio = info.file_size / max(info.compress_size, 1)
+        if ratio > MAX_COMPRESSION_RATIO:
+            raise ZipResourceLimitError(f"{info.filename} has compression ratio {ratio:.0f}, the limit is {MAX_COMPRESSION_RATIO}")
+
+
+def check_zip_limits(zf: zipfile.ZipFile, include: Callable[[zipfile.ZipInfo], bool] | None = None) -> None:
+    """
+    Checks the sizes the files in a zipfile declare, including the files in nested zipfiles
+    Only nested zipfiles are decompressed, as a stream
+    Raises ZipResourceLimitError if a limit is exceeded
+
+    Args:
+        zf (zipfile.ZipFile): The zipfile to check.
+        include (Callable[[zipfile.ZipInfo], bool] | None): Selects the files that will be read, only their sizes are checked.
+            Files that are never read cannot exhaust memory, a large file next to them should not reject the zipfile.
+            All files are checked if None. The number of files is always checked.
+    """
+    count = 0
+    total_size = 0
+    for _, info in walk_zip(zf):
+        count += 1
+        if count > MAX_MEMBERS:
+            raise ZipResourceLimitError(f"Zip contains more than {MAX_MEMBERS} files")
+
+        if include is not None and not include(info):
+            continue
+        check_member_limits(info)
+        total_size += info.file_size
+        if total_size > MAX_TOTAL_SIZE:
+            raise ZipResourceLimitError(f"Zip contains more than {MAX_TOTAL_SIZE} bytes")
+
+
+def read_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo, max_size: int = MAX_MEMBER_SIZE) -> io.BytesIO:
+    """
+    Decompresses a file in a zipfile, stops as soon as more bytes come out than it declared or max_size allows
+    Raises ZipResourceLimitError if a limit is exceeded
+
+    The buffer the file is decompressed into is returned as is, positioned at the start,
+    the decompressed file is never held twice
+    """
+    check_member_limits(info, max_size)
+    limit = min(info.file_size, max_size)
+
+    buffer = io.BytesIO()
+    with zf.open(info, "r") as member:
+        while chunk := member.read(READ_CHUNK_SIZE):
+            if buffer.tell() + len(chunk) > limit:
+                raise ZipResourceLimitError(f"{info.filename} decompresses to more than {limit} bytes")
+            buffer.write(chunk)
+
+    buffer.seek(0)
+    return buffer
+
+
 def extract_file_from_zip(zfile: str, file_to_extract: str) -> io.BytesIO:
     """
     Extracts a specific file from a zipfile buffer
@@ -24,15 +353,15 @@ def extract_file_from_zip(zfile: str, file_to_extract: str) -> io.BytesIO:
     file_to_extract_bytes = io.BytesIO()
 
     try:
-        with zipfile.ZipFile(zfile, "r") as zf:
+        with open_zip(zfile) as zf:
             file_found = False
 
-            for f in zf.namelist():
-                logger.debug("Contained in zip: %s", f)
-                if Path(f).name == file_to_extract:
+            for container, info in walk_zip(zf):
+                logger.debug("Contained in zip: %s", info.filename)
+                if Path(info.filename).name == file_to_extract:
                     #print('extract_file_from_zip found a message json', f)
 
-                    file_to_extract_bytes = io.BytesIO(zf.read(f))
+                    file_to_extract_bytes = read_member(container, info)
                     file_found = True
                     break
 
@@ -41,19 +370,260 @@ def extract_file_from_zip(zfile: str, file_to_extract: str) -> io.BytesIO:
 
     except zipfile.BadZipFile as e:
         logger.error("BadZipFile:  %s", e)
+    except ZipResourceLimitError as e:
+        logger.error("Resource limit exceeded:  %s", e)
     except FileNotFoundInZipError as e:
         logger.error("File not found:  %s: %s", file_to_extract, e)
+    except MemoryError:
+        raise
     except Exception as e:
         logger.error("Exception was caught:  %s", e)
 
+    return file_to_extract_bytes
+
+
+def extract_files_from_zip(
+    zfile: str,
+    files_to_extract: list[str],
+    max_workers: int | None = None,
+) -> dict[str, io.BytesIO]:
+    """
+    Extracts several files from a zipfile, see extract_file_from_zip
+
+    On CPython the files are decompressed concurrently from the open upload, see open_zip.
+    zipfile serializes the reads of compressed data, zlib inflates the files in parallel.
+    Every thread runs in a copy of the context of the caller, so its log records end up in the active session.
+    Under Pyodide they are decompressed one after another, the result is the same.
+
+    Returns:
+        dict[str, io.BytesIO]: A buffer for every file in files_to_extract, empty if the file could not be extracted.
+    """
+    files_to_extract = list(dict.fromkeys(files_to_extract))
+    workers = min(max_workers or MAX_DECOMPRESSION_WORKERS, len(files_to_extract))
+
+    if not PARALLEL_DECOMPRESSION or workers < 2 or not isinstance(zfile, (str, os.PathLike)):
+        return {f: extract_file_from_zip(zfile, f) for f in files_to_extract}
+
+    logger.debug("Decompressing %s files with %s threads", len(files_to_extract), workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # A context can only be entered by one thread at a time, every task gets its own copy
+        futures = [
+            executor.submit(contextvars.copy_context().run, extract_file_from_zip, zfile, f)
+            for f in files_to_extract
+        ]
+        return {f: future.result() for f, future in zip(files_to_extract, futures)}
+
+
+@contextlib.contextmanager
+def _find_member(zf: zipfile.ZipFile, file_to_extract: str) -> Iterator[tuple[zipfile.ZipFile, zipfile.ZipInfo]]:
+    """
+    Yields the first member with file name file_to_extract, in zf or in a zipfile nested in it,
+    together with the ZipFile to open it with, see walk_zip
+    """
+    members = walk_zip(zf)
+    try:
+        for container, info in members:
+            if Path(info.filename).name == file_to_extract:
+                yield container, info
+                return
     finally:
-        return file_to_extract_bytes
+        members.close()
+
+    raise FileNotFoundInZipError("File not found in zip")
+
+
+def member_size(zfile: str, file_to_extract: str) -> int:
+    """
+    Returns the uncompressed size of a file in a zipfile
+    without decompressing it, returns 0 in case of error
+    """
+    try:
+        with open_zip(zfile) as zf, _find_member(zf, file_to_extract) as (_, info):
+            return info.file_size
+    except Exception as e:
+        logger.error("Cannot determine size of %s: %s", file_to_extract, e)
+
+    return 0
+
+
+# Enough to contain the header and the first rows of a csv file
+HEAD_SIZE = 4096
+
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+@dataclass
+class CsvHead:
+    """
+    What the first bytes of a csv file tell about how to parse it
+
+    Attributes:
+        encoding (str): Encoding to read the file with, "utf-8-sig" or "utf-16" if the file starts with a BOM.
+        delimiter (str): Delimiter of the fields.
+        columns (list[str]): Column names in the header.
+    """
+    encoding: str
+    delimiter: str
+    columns: list[str]
+
+
+def read_member_head(zfile: str, file_to_extract: str, size: int = HEAD_SIZE) -> bytes:
+    """
+    Reads the first size bytes of a file in a zipfile
+    Only the start of the file is decompressed, returns b"" in case of error
+    """
+    try:
+        with open_zip(zfile) as zf, _find_member(zf, file_to_extract) as (container, info):
+            check_member_limits(info)
+            with container.open(info, "r") as member:
+                return member.read(size)
+    except zipfile.BadZipFile as e:
+        logger.error("BadZipFile:  %s", e)
+    except ZipResourceLimitError as e:
+        logger.error("Resource limit exceeded:  %s", e)
+    except FileNotFoundInZipError as e:
+        logger.error("File not found:  %s: %s", file_to_extract, e)
+    except MemoryError:
+        raise
+    except Exception as e:
+        logger.error("Exception was caught:  %s", e)
+
+    return b""
+
+
+def sniff_csv_head(head: bytes) -> CsvHead | None:
+    """
+    Determines encoding, delimiter and columns of a csv file from its first bytes
+    Returns None if head does not look like the start of a csv file
+    """
+    encoding = "utf8"
+    for bom, bom_encoding in BOMS:
+        if head.startswith(bom):
+            encoding = bom_encoding
+            break
+
+    try:
+        # head can end halfway a character, an incremental decoder leaves that out
+        text = codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+    except UnicodeDecodeError as e:
+        logger.error("Cannot decode csv header with encoding %s: %s", encoding, e)
+        return None
+
+    lines = text.splitlines()
+    if len(lines) > 1 and not text.endswith(("\n", "\r")):
+        # Leave out the last line, it is cut off
+        lines = lines[:-1]
+    if not lines or not lines[0].strip():
+        return None
+
+    try:
+        delimiter = csv.Sniffer().sniff("\n".join(lines[:5]), delimiters=",;\t").delimiter
+    except csv.Error:
+        delimiter = ","
+
+    columns = next(csv.reader(lines[:1], delimiter=delimiter))
+    return CsvHead(encoding, delimiter, columns)
+
+
+def sniff_csv_member(zfile: str, file_to_extract: str) -> CsvHead | None:
+    """
+    Determines encoding, delimiter and columns of a csv file in a zipfile, see sniff_csv_head
+    """
+    head = read_member_head(zfile, file_to_extract)
+    return sniff_csv_head(head) if head else None
+
+
+def sniff_csv_file(csv_file: str) -> CsvHead | None:
+    """
+    Determines encoding, delimiter and columns of a csv file, see sniff_csv_head
+    """
+    try:
+        with open(csv_file, "rb") as f:
+            head = f.read(HEAD_SIZE)
+    except OSError as e:
+        logger.error("Cannot read %s: %s", csv_file, e)
+        return None
+
+    return sniff_csv_head(head) if head else None
+
+
+def _iter_csv_rows(
+    binary_stream: Any,
+    keep_row: Callable[[dict[Any, Any]], bool],
+    encoding: str,
+    delimiter: str,
+) -> Iterator[dict[Any, Any]]:
+    stream = io.TextIOWrapper(binary_stream, encoding=encoding, newline="")
+    reader = csv.DictReader(stream, delimiter=delimiter)
+    for row in reader:
+        if keep_row(row):
+            yield row
+
+
+def iter_csv_rows_from_file(
+    csv_file: str,
+    keep_row: Callable[[dict[Any, Any]], bool],
+    encoding: str = "utf8",
+    delimiter: str = ",",
+) -> Iterator[dict[Any, Any]]:
+    """
+    Streams a csv file row by row, same as iter_csv_rows_from_zip for a csv file that is not zipped
+    """
+    try:
+        with open(csv_file, "rb") as f:
+            yield from _iter_csv_rows(f, keep_row, encoding, delimiter)
+    except MemoryError:
+        raise
+    except Exception as e:
+        logger.error("Exception was caught:  %s", e)
+
+
+def iter_csv_rows_from_zip(
+    zfile: str,
+    file_to_extract: str,
+    keep_row: Callable[[dict[Any, Any]], bool],
+    encoding: str = "utf8",
+    delimiter: str = ",",
+) -> Iterator[dict[Any, Any]]:
+    """
+    Streams a csv file from a zipfile row by row
+    Only rows for which keep_row returns True are yielded,
+    the file is never fully present in memory
+    """
+    try:
+        with open_zip(zfile) as zf, _find_member(zf, file_to_extract) as (container, info):
+            # zipfile stops reading a file at its declared size, checking that is enough
+            check_member_limits(info)
+            with container.open(info, "r") as member:
+                yield from _iter_csv_rows(member, keep_row, encoding, delimiter)
+
+    except zipfile.BadZipFile as e:
+        logger.error("BadZipFile:  %s", e)
+    except ZipResourceLimitError as e:
+        logger.error("Resource limit exceeded:  %s", e)
+    except FileNotFoundInZipError as e:
+        logger.error("File not found:  %s: %s", file_to_extract, e)
+    except MemoryError:
+        raise
+    except Exception as e:
+        logger.error("Exception was caught:  %s", e)
+
+
+def sniff_json_encoding(head: bytes) -> str:
+    """
+    Determines the encoding of a json document from its first 4 bytes,
+    by its BOM or by the pattern of null bytes UTF-16 and UTF-32 text starts with (RFC 4627)
+    """
+    return json.detect_encoding(head[:4])
 
 
 def _json_reader_bytes(json_bytes: bytes, encoding: str) -> Any:
-    json_bytes_stream = io.BytesIO(json_bytes)
-    stream = io.TextIOWrapper(json_bytes_stream, encoding=encoding)
-    result = json.load(stream)
+    # Decoded in a single pass, without copying the bytes into a TextIOWrapper
+    result = json.loads(json_bytes.decode(encoding))
     return result
 
 
@@ -63,34 +633,32 @@ def _json_reader_file(json_file: str, encoding: str) -> Any:
     return result
 
 
-def _read_json(json_input: Any, json_reader: Callable[[Any, str], Any]) -> dict[Any, Any] | list[Any]:
+def _read_json(json_input: Any, json_reader: Callable[[Any, str], Any], encoding: str) -> dict[Any, Any] | list[Any]:
     """
     Dunder function that read json_input and applies json_reader
-    Performs several checks (see code) and tries different encodings
+    Performs several checks (see code), encoding should be sniffed from the first bytes with sniff_json_encoding
+    so the document is decoded and parsed only once
     """
 
     out: dict[Any, Any] | list[Any] = {}
 
-    encodings = ["utf8", "utf-8-sig"]
-    for encoding in encodings:
-        try:
-            result = json_reader(json_input, encoding)
+    try:
+        result = json_reader(json_input, encoding)
 
-            if not isinstance(result, (dict, list)):
-                raise TypeError("Did not convert bytes to a list or dict, but to another type instead")
+        if not isinstance(result, (dict, list)):
+            raise TypeError("Did not convert bytes to a list or dict, but to another type instead")
 
-            out = result
-            logger.debug("Succesfully converted json bytes with encoding: %s", encoding)
-            break
+        out = result
+        logger.debug("Succesfully converted json bytes with encoding: %s", encoding)
 
-        except json.JSONDecodeError:
-            logger.error("Cannot decode json with encoding: %s", encoding)
-        except TypeError as e:
-            logger.error("%s, could not convert json bytes", e)
-            break
-        except Exception as e:
-            logger.error("%s, could not convert json bytes", e)
-            break
+    except json.JSONDecodeError:
+        logger.error("Cannot decode json with encoding: %s", encoding)
+    except TypeError as e:
+        logger.error("%s, could not convert json bytes", e)
+    except MemoryError:
+        raise
+    except Exception as e:
+        logger.error("%s, could not convert json bytes", e)
 
     return out
 
@@ -106,7 +674,9 @@ def read_json_from_bytes(json_bytes: io.BytesIO) -> dict[Any, Any] | list[Any]:
     out: dict[Any, Any] | list[Any] = {}
     try:
         b = json_bytes.read()
-        out = _read_json(b, _json_reader_bytes)
+        out = _read_json(b, _json_reader_bytes, sniff_json_encoding(b))
+    except MemoryError:
+        raise
     except Exception as e:
         logger.error("%s, could not convert json bytes", e)
 
@@ -120,11 +690,18 @@ def read_json_from_file(json_file: str) -> dict[Any, Any] | list[Any]:
 
     Function returns {} in case of failure
     """
-    out = _read_json(json_file, _json_reader_file)
+    try:
+        with open(json_file, "rb") as f:
+            head = f.read(4)
+    except OSError as e:
+        logger.error("Cannot read %s: %s", json_file, e)
+        return {}
+
+    out = _read_json(json_file, _json_reader_file, sniff_json_encoding(head))
     return out
 
 
-def read_csv_from_bytes(json_bytes: io.BytesIO) -> list[dict[Any, Any]]:
+def read_csv_from_bytes(json_bytes: io.BytesIO, encoding: str = "utf8", delimiter: str = ",") -> list[dict[Any, Any]]:
     """
     Reads csv from io.Bytes()
     Expects input from extract_file_from_zip
@@ -134,24 +711,25 @@ def read_csv_from_bytes(json_bytes: io.BytesIO) -> list[dict[Any, Any]]:
     b = json_bytes.read()
 
     try:
-        stream = io.TextIOWrapper(io.BytesIO(b), encoding="utf8")
-        reader = csv.DictReader(stream)
+        stream = io.TextIOWrapper(io.BytesIO(b), encoding=encoding)
+        reader = csv.DictReader(stream, delimiter=delimiter)
         for row in reader:
             out.append(row)
-        logger.debug("succesfully converted csv bytes with encoding utf8")
+        logger.debug("succesfully converted csv bytes with encoding %s", encoding)
 
+    except MemoryError:
+        raise
     except Exception as e:
         logger.error("%s, could not convert csv bytes", e)
 
-    finally:
-        return out
+    return out
 
 
-def read_csv_from_bytes_to_df(json_bytes: io.BytesIO) -> pd.DataFrame:
+def read_csv_from_bytes_to_df(json_bytes: io.BytesIO, encoding: str = "utf8", delimiter: str = ",") -> pd.DataFrame:
     """
     csv to pd.DataFrame
     expects io.BytesIO as input (from extract_file_from_zip)
     """
-    return pd.DataFrame(read_csv_from_bytes(json_bytes))
+    return pd.DataFrame(read_csv_from_bytes(json_bytes, encoding, delimiter))
 
 
@@ -6,6 +6,8 @@ from enum import Enum
 
 import logging
 
+from port.helpers.validate import CategoryIndex, category_index
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,11 +28,14 @@ class DDPFiletype(Enum):
 class DDPCategory:
     """
     Characteristics that characterize a DDP
+    Known files can be weighted, files in required_files must be present
     """
     id: str
     ddp_filetype: DDPFiletype
     language: Language
     known_files: list[str]
+    weights: dict[str, float] | None = None
+    required_files: list[str] | None = None
 
 
 @dataclass
@@ -55,24 +60,18 @@ class ValidateInput:
     ddp_category: DDPCategory | None = None
 
     ddp_categories_lookup: dict[str, DDPCategory] = field(init=False)
+    ddp_categories_index: CategoryIndex = field(init=False)
     status_codes_lookup: dict[int, StatusCode] = field(init=False)
 
     def infer_ddp_category(self, file_list_input: list[str]) -> bool:
         """
         Compares a list of files to a list of known files.
         From that comparison infer the DDP Category
-        Note: at least 5% percent of known files should match
+        Note: at least 5% percent of known files should match, see CategoryIndex
         """
-        prop_category = {}
-        for identifier, category in self.ddp_categories_lookup.items():
-            n_files_found = [
-                1 if f in category.known_files else 0 for f in file_list_input
-            ]
-            prop_category[identifier] = sum(n_files_found) / len(category.known_files) * 100
-
-        if max(prop_category.values()) >= 5:
-            highest = max(prop_category, key=prop_category.get)  # type: ignore
-            self.ddp_category = self.ddp_categories_lookup[highest]
+        category = self.ddp_categories_index.best(file_list_input)
+        if category is not None:
+            self.ddp_category = category
             logger.info("Detected DDP category: %s", self.ddp_category.id)
             return True
 
@@ -93,6 +92,7 @@ class ValidateInput:
         self.ddp_categories_lookup = {
             category.id: category for category in self.ddp_categories
         }
+        self.ddp_categories_index = category_index(self.ddp_categories)
         self.status_codes_lookup = {
             status_code.id: status_code for status_code in self.status_codes
         }
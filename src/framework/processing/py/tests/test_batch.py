@@ -0,0 +1,67 @@
+import json
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+import port.batch as batch
+
+# The fake platform is inherited by the workers when they are forked
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="workers are not forked")
+
+
+def fake_platform(path: str, key: str) -> tuple[str, list[dict[str, str]]]:
+    if key == "slow":
+        time.sleep(60)
+    elif key == "crash":
+        os._exit(3)
+    elif key == "error":
+        raise ValueError("broken")
+    return "DONATED", [{"key": key, "json_string": "[]"}]
+
+
+def write_zips(directory: Path, names: list[str]) -> str:
+    directory.mkdir()
+    for name in names:
+        (directory / f"{name}.zip").write_bytes(b"")
+    return str(directory)
+
+
+@pytest.fixture(autouse=True)
+def fake_platforms(monkeypatch):
+    monkeypatch.setitem(batch.PLATFORMS, "netflix", fake_platform)
+
+
+def test_run_writes_a_result_per_zip(tmp_path):
+    input_dir = write_zips(tmp_path / "in", ["a", "b", "error"])
+
+    results = batch.run(input_dir, str(tmp_path / "out"), workers=2)
+
+    statuses = {result.file: result.status for result in results}
+    assert statuses == {"a.zip": "DONATED", "b.zip": "DONATED", "error.zip": "ERROR"}
+    written = json.loads((tmp_path / "out" / "a.json").read_text())
+    assert written["donations"] == [{"key": "a", "json_string": "[]"}]
+
+
+def test_run_kills_workers_that_take_too_long(tmp_path):
+    input_dir = write_zips(tmp_path / "in", ["slow", "a", "b"])
+
+    start = time.perf_counter()
+    results = batch.run(input_dir, str(tmp_path / "out"), workers=1, timeout=0.5)
+
+    assert time.perf_counter() - start < 30
+    statuses = {result.file: result.status for result in results}
+    assert statuses == {"slow.zip": "TIMEOUT", "a.zip": "DONATED", "b.zip": "DONATED"}
+
+
+def test_run_replaces_workers_that_die(tmp_path):
+    input_dir = write_zips(tmp_path / "in", ["a", "crash", "b"])
+
+    results = batch.run(input_dir, str(tmp_path / "out"), workers=1)
+
+    by_file = {result.file: result for result in results}
+    assert by_file["crash.zip"].status == "ERROR"
+    assert "exited with code 3" in by_file["crash.zip"].error
+    assert by_file["a.zip"].status == by_file["b.zip"].status == "DONATED"
@@ -0,0 +1,219 @@
+import json
+
+import pandas as pd
+import pytest
+
+import port.api.props as props
+import port.donation as donation
+import port.helpers.port_helpers as ph
+from port.api.commands import CommandSystemDonateChunk, CommandUITablePage
+from port.api.payloads import Payload
+
+
+def run_donation(generator, responses=None):
+    """
+    Drives a donate_chunked generator like a host does, returns the donations by key
+    """
+    responses = list(responses or [])
+    donations = {}
+    command = next(generator)
+    try:
+        while True:
+            donations[command.key] = command.json_string
+            response = responses.pop(0) if responses and isinstance(command, CommandSystemDonateChunk) else None
+            command = generator.send(response)
+    except StopIteration:
+        pass
+    return donations
+
+
+def json_string(n_rows: int) -> str:
+    return json.dumps([{"row": i, "text": f"ünïcode {i}"} for i in range(n_rows)])
+
+
+@pytest.mark.parametrize("compress", [False, True])
+@pytest.mark.parametrize("codec", ["gzip", "zlib"])
+def test_donate_chunked_roundtrip(compress, codec):
+    original = json_string(2000)
+
+    donations = run_donation(donation.donate_chunked("key", original, chunk_size=1000, compress=compress, codec=codec))
+
+    manifest = donations.pop("key-manifest")
+    assert len(donations) > 1
+    assert donation.join_chunks(manifest, donations) == original
+
+
+def test_donate_chunked_roundtrip_from_parts():
+    original = json_string(2000)
+    parts = [original[i:i + 7] for i in range(0, len(original), 7)]
+
+    donations = run_donation(donation.donate_chunked("key", iter(parts), chunk_size=1000))
+
+    assert donation.join_chunks(donations.pop("key-manifest"), donations) == original
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_donate_chunked_single_chunk(compress):
+    original = json_string(3)
+
+    donations = run_donation(donation.donate_chunked("key", original, compress=compress))
+
+    assert list(donations) == ["key"]
+    if compress:
+        assert donation.decompress_json_string(donations["key"]) == original
+    else:
+        assert donations["key"] == original
+
+
+def test_donate_chunked_resends_unacknowledged_chunks():
+    original = json_string(500)
+    generator = donation.donate_chunked("key", original, chunk_size=1000)
+
+    sent = []
+    command = next(generator)
+    while not command.key.endswith("manifest"):
+        sent.append(command.key)
+        # The first attempt of every chunk fails
+        command = generator.send(Payload("PayloadFalse", False) if sent.count(command.key) == 1 else Payload("PayloadTrue", True))
+
+    manifest = json.loads(command.json_string)
+    assert len(sent) == 2 * len(manifest["chunks"])
+    assert all(chunk["acknowledged"] for chunk in manifest["chunks"])
+
+
+def test_donate_chunked_gives_up_on_chunks_that_are_never_acknowledged():
+    generator = donation.donate_chunked("key", json_string(500), chunk_size=1000, max_retries=2)
+
+    attempts = 0
+    command = next(generator)
+    while not command.key.endswith("manifest"):
+        attempts += 1
+        command = generator.send(Payload("PayloadFalse", False))
+
+    manifest = json.loads(command.json_string)
+    assert attempts == 3 * len(manifest["chunks"])
+    assert not any(chunk["acknowledged"] for chunk in manifest["chunks"])
+
+
+def test_join_chunks_detects_corruption():
+    original = json_string(500)
+    donations = run_donation(donation.donate_chunked("key", original, chunk_size=1000))
+    manifest = donations.pop("key-manifest")
+
+    first = sorted(donations)[0]
+    with pytest.raises(ValueError, match="Checksum"):
+        donation.join_chunks(manifest, {**donations, first: donations[first] + " "})
+    with pytest.raises(ValueError, match="Missing"):
+        donation.join_chunks(manifest, {key: value for key, value in donations.items() if key != first})
+
+
+def test_consent_form_json_string_parts_are_equal_to_the_whole():
+    table = props.PropsUIPromptConsentFormTable("t", props.Translatable({"en": "", "nl": ""}), pd.DataFrame({"a": [1, 2], "b": ["x", None]}))
+
+    assert "".join(donation.iter_consent_form_json([table])) == donation.consent_form_to_json_string([table])
+
+
+def test_serve_consent_form_sends_pages_and_donates_the_rows_that_were_not_loaded():
+    translatable = props.Translatable({"en": "", "nl": ""})
+    table = props.PropsUIPromptConsentFormTable("t", translatable, pd.DataFrame({"a": [str(i) for i in range(10)]}), page_size=3)
+    form = props.PropsUIPromptConsentForm([table], [])
+    render = ph.render_page(translatable, form)
+
+    flow = ph.serve_consent_form(render, form)
+    assert next(flow) is render
+    page = flow.send(Payload("PayloadTablePageRequest", {"table_id": "t", "page": 1}))
+    assert isinstance(page, CommandUITablePage) and page.page == 1
+
+    # The participant deleted row 4 from the second page and never loaded the others
+    donated = [{"t": [{"a": a} for a in ["0", "1", "2", "3", "5"]]}]
+    with pytest.raises(StopIteration) as stop:
+        flow.send(Payload("PayloadJSON", json.dumps(donated)))
+
+    result = json.loads(stop.value.value.value)
+    assert result[0]["t"] == [{"a": str(i)} for i in range(10) if i != 4]
+
+
+def test_serve_consent_form_evaluates_a_folded_deferred_table_when_it_is_opened():
+    translatable = props.Translatable({"en": "", "nl": ""})
+
+    def produce():
+        return pd.DataFrame({"a": [str(i) for i in range(5)]})
+
+    opened = props.PropsUIPromptConsentFormTable("opened", translatable, produce, folded=True, page_size=2)
+    closed = props.PropsUIPromptConsentFormTable("closed", translatable, produce, folded=True, page_size=2)
+    form = props.PropsUIPromptConsentForm([opened, closed], [])
+    render = ph.render_page(translatable, form)
+
+    flow = ph.serve_consent_form(render, form)
+    next(flow)
+    page = flow.send(Payload("PayloadTablePageRequest", {"table_id": "opened", "page": 0}))
+    assert page.toDict()["page_count"] == 3
+
+    donated = [{"opened": [{"a": "1"}]}, {"closed": []}]
+    with pytest.raises(StopIteration) as stop:
+        flow.send(Payload("PayloadJSON", json.dumps(donated)))
+
+    result = json.loads(stop.value.value.value)
+    assert result[0]["opened"] == [{"a": str(i)} for i in range(1, 5)]
+    assert result[1]["closed"] == []
+    assert not closed.is_materialized()
+
+
+def test_merge_shown_rows():
+    full = [{"a": str(i)} for i in range(6)]
+    shown = [1, 3, 4]
+    donated = [full[1], full[4]]
+
+    assert donation.merge_shown_rows(full, shown, donated) == [full[0], full[1], full[2], full[4], full[5]]
+
+
+def test_merge_shown_rows_never_donates_rows_that_were_not_shown():
+    full = [{"a": str(i)} for i in range(3)]
+
+    assert donation.merge_shown_rows(full, [0], [{"a": "unknown"}]) == [{"a": "unknown"}]
+
+
+@pytest.mark.parametrize("transport", ["json", "columnar"])
+def test_expand_partial_tables_encodes_rows_like_the_transport(transport):
+    df = pd.DataFrame({
+        "s": ["a \"quoted\"", None, "é\n", "a \"quoted\""] * 5,
+        "f": [1 / 3, float("nan"), 996.71335425975, 1e-7] * 5,
+        "b": [True, False, True, False] * 5,
+        "d": pd.to_datetime(["2023-01-01 10:00:00", None, "2024-02-29 23:59:59.123", "2023-01-02"] * 5, format="ISO8601"),
+    })
+    table = props.PropsUIPromptConsentFormTable("t", props.Translatable({"en": "", "nl": ""}), df, transport=transport, preview_size=6)
+    out = table.toDict()
+    shown_rows = donation.columns_to_rows(out["columns"]) if transport == "columnar" else donation.data_frame_json_to_rows(out["data_frame"])
+    full_rows = donation.columns_to_rows(props.to_columns(df)) if transport == "columnar" else donation.table_to_rows(table)
+    shown = table.preview_rows()
+
+    donated = json.dumps([{"t": shown_rows[1:]}, {"user_omissions": "[]"}])
+    result = donation.expand_partial_tables(donated, {"t": (table, shown)})
+
+    expected = [{"t": donation.merge_shown_rows(full_rows, shown, shown_rows[1:])}, {"user_omissions": "[]"}]
+    assert result == donation.js_json_dumps(expected)
+    assert len(json.loads(result)[0]["t"]) == 19
+
+
+def test_serve_consent_form_expands_every_previewed_table():
+    translatable = props.Translatable({"en": "", "nl": ""})
+    big = props.PropsUIPromptConsentFormTable("big", translatable, pd.DataFrame({"a": [str(i) for i in range(20)]}), preview_size=5)
+    small = props.PropsUIPromptConsentFormTable("small", translatable, pd.DataFrame({"a": ["1", "2", "3"]}), preview_size=5)
+    form = props.PropsUIPromptConsentForm([big, small], [])
+    render = ph.render_page(translatable, form)
+
+    flow = ph.serve_consent_form(render, form)
+    assert next(flow) is render
+
+    shown = big.preview_rows()
+    deleted = big.data_frame["a"].iloc[shown[0]]
+    donated = [
+        {"big": [{"a": big.data_frame["a"].iloc[p]} for p in shown[1:]]},
+        {"small": [{"a": "1"}, {"a": "3"}]},
+    ]
+    with pytest.raises(StopIteration) as stop:
+        flow.send(Payload("PayloadJSON", json.dumps(donated)))
+
+    result = json.loads(stop.value.value.value)
+    assert result[0]["big"] == [{"a": str(i)} for i in range(20) if str(i) != deleted]
+    assert result[1]["small"] == [{"a": "1"}, {"a": "3"}]
@@ -0,0 +1,89 @@
+import io
+import json
+import random
+
+import pytest
+
+from port.helpers.extraction_helpers import (
+    DenestedIndex,
+    dict_denester,
+    find_item,
+    find_items,
+    iter_json_array,
+)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1024 * 1024])
+def test_iter_json_array_matches_json_loads(chunk_size):
+    document = json.dumps([
+        {"title": "a", "messages": [{"text": "hi, [there]"}, {"text": "\"quoted\""}]},
+        12345678901234567890,
+        -1.5e-7,
+        "a string with ] and ,",
+        None,
+        True,
+        [],
+        {},
+    ], indent=2)
+
+    items = list(iter_json_array(io.StringIO(document), chunk_size=chunk_size))
+
+    assert items == json.loads(document)
+
+
+@pytest.mark.parametrize("document", ["[]", "  [ ]  ", "\n[\n]\n"])
+def test_iter_json_array_empty(document):
+    assert list(iter_json_array(io.StringIO(document), chunk_size=1)) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5])
+def test_iter_json_array_number_cut_at_chunk_boundary(chunk_size):
+    assert list(iter_json_array(io.StringIO("[1234, 56789]"), chunk_size=chunk_size)) == [1234, 56789]
+
+
+@pytest.mark.parametrize("document", ['{"a": 1}', "[1, 2", "[1 2]", "[1,]", ""])
+def test_iter_json_array_rejects_malformed_documents(document):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(io.StringIO(document), chunk_size=2))
+
+
+def random_document(rng: random.Random, depth: int = 0):
+    if depth > 3 or rng.random() < 0.3:
+        return rng.choice([rng.randint(0, 9), "value", None, rng.random()])
+    if rng.random() < 0.5:
+        return [random_document(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+    keys = ["id", "title", "text", "author", "create_time", "a-b", "content", "parts", "0"]
+    return {rng.choice(keys): random_document(rng, depth + 1) for _ in range(rng.randint(0, 4))}
+
+
+QUERIES = ["id", "title", "text", "author", "content-parts", "a-b", "0", "parts-0", "tit", "-", "title|text", "^id", ".*", "missing"]
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_denested_index_matches_dict_denester(seed):
+    document = random_document(random.Random(seed))
+    denested = dict_denester(document)
+    index = DenestedIndex(document)
+
+    assert index.values == denested
+    assert list(index.values) == list(denested)
+    for query in QUERIES:
+        assert find_item(index, query) == find_item(denested, query), query
+        assert find_items(index, query) == find_items(denested, query), query
+
+
+def test_denested_index_duplicate_key_keeps_first_position_and_last_value():
+    # "a-b" is both a key and a path, dict_denester keeps the position of the first and the last value
+    document = {"a-b": 1, "a": {"b": 2}, "c": 3}
+    index = DenestedIndex(document)
+
+    assert index.values == dict_denester(document)
+    assert list(index.values) == list(dict_denester(document))
+    assert find_items(index, "b") == find_items(dict_denester(document), "b") == ["2"]
+
+
+def test_find_item_returns_least_nested_match():
+    document = {"x": {"y": {"title": "deep"}}, "title": "shallow"}
+
+    assert find_item(DenestedIndex(document), "title") == "shallow"
+    assert find_item(dict_denester(document), "title") == "shallow"
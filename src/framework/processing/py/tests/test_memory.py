@@ -0,0 +1,111 @@
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+import port.helpers.extraction_helpers as eh
+import port.unzipddp as unzipddp
+from port.memory import Degradation, MemoryGovernor
+
+
+def test_levels_follow_the_thresholds():
+    governor = MemoryGovernor(budget=100)
+
+    assert governor.level() == Degradation.NONE
+    assert governor.level(25) == Degradation.CHUNKED
+    assert governor.level(60) == Degradation.DROP_OPTIONAL
+    assert governor.level(80) == Degradation.TRUNCATE_PREVIEW
+
+
+def test_charge_and_release():
+    governor = MemoryGovernor(budget=100)
+
+    governor.charge("a", 30)
+    governor.charge("a", 10)
+    governor.charge("b", 20)
+    governor.release("a")
+
+    assert governor.allocated == 20
+    assert governor.peak == 60
+
+
+def test_limit_preview_only_limits_the_preview():
+    governor = MemoryGovernor(budget=100, preview_rows=10)
+    governor.charge("table", 90)
+
+    assert governor.limit_preview("table", 1000) == 10
+    assert governor.limit_preview("table", 1000, 5) == 5
+    assert governor.limit_preview("table", 1000, 50) == 10
+    assert governor.limit_preview("table", 8) is None
+    assert any("Showing 10 of 1000 rows of table" in decision for decision in governor.decisions)
+
+
+def test_limit_preview_within_budget():
+    governor = MemoryGovernor(budget=100, preview_rows=10)
+
+    assert governor.limit_preview("table", 1000) is None
+    assert governor.limit_preview("table", 1000, 50) == 50
+    assert governor.decisions == []
+
+
+def test_charge_df_does_not_swallow_memory_error(monkeypatch):
+    df = pd.DataFrame({"a": [1, 2, 3]})
+
+    def out_of_memory(*args, **kwargs):
+        raise MemoryError()
+
+    monkeypatch.setattr(pd.DataFrame, "memory_usage", out_of_memory)
+
+    with pytest.raises(MemoryError):
+        MemoryGovernor().charge_df("df", df)
+
+
+def test_streaming_csv_rows_does_not_swallow_memory_error(tmp_path):
+    path = tmp_path / "export.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("a.csv", "a\n1\n2\n")
+
+    def out_of_memory(row):
+        raise MemoryError()
+
+    with pytest.raises(MemoryError):
+        list(unzipddp.iter_csv_rows_from_zip(str(path), "a.csv", out_of_memory))
+
+    # Other errors are still logged and end the stream
+    assert list(unzipddp.iter_csv_rows_from_zip(str(path), "a.csv", lambda row: 1 / 0)) == []
+    assert list(unzipddp.iter_csv_rows_from_zip(str(path), "a.csv", lambda row: True)) == [{"a": "1"}, {"a": "2"}]
+
+
+def test_extract_file_from_zip_does_not_swallow_memory_error(monkeypatch):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr("a.csv", "a\n1\n")
+
+    def out_of_memory(*args, **kwargs):
+        raise MemoryError()
+
+    monkeypatch.setattr(unzipddp, "read_member", out_of_memory)
+
+    with pytest.raises(MemoryError):
+        unzipddp.extract_file_from_zip(buffer, "a.csv")
+
+
+def test_extraction_helpers_do_not_swallow_memory_error(monkeypatch, tmp_path):
+    path = tmp_path / "export.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("a.csv", "a\n1\n")
+
+    def out_of_memory(*args, **kwargs):
+        raise MemoryError()
+
+    monkeypatch.setattr(unzipddp, "read_member", out_of_memory)
+    monkeypatch.setattr(eh.csv, "DictReader", out_of_memory)
+    monkeypatch.setattr(eh, "_json_reader_bytes", out_of_memory)
+
+    with pytest.raises(MemoryError):
+        eh.extract_file_from_zip(str(path), "a.csv")
+    with pytest.raises(MemoryError):
+        eh.read_csv_from_bytes(io.BytesIO(b"a\n1\n"))
+    with pytest.raises(MemoryError):
+        eh.read_json_from_bytes(io.BytesIO(b"{}"))
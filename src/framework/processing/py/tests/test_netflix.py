@@ -0,0 +1,165 @@
+import io
+import zipfile
+
+import pandas as pd
+
+import port.netflix as netflix
+
+VIEWING_ACTIVITY = (
+    "Profile Name,Start Time,Duration,Attributes,Title,Supplemental Video Type,Device Type,Bookmark,Latest Bookmark,Country\n"
+    "alice,2023-01-01 10:00:00,00:30:00,,Show: Episode 1,,TV,00:30:00,00:30:00,NL\n"
+    "bob,2023-01-02 11:00:00,01:00:00,,Movie,,TV,01:00:00,01:00:00,NL\n"
+    "alice,2023-01-03 12:00:00,00:01:00,,Trailer,TRAILER,TV,00:01:00,00:01:00,NL\n"
+)
+RATINGS = (
+    "Profile Name,Title Name,Thumbs Value,Device Model,Event Utc Ts,Region View Date\n"
+    "alice,Movie,2,TV,2023-01-01 10:00:00,2023-01-01\n"
+)
+
+
+def netflix_export(viewing_activity: str = VIEWING_ACTIVITY) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("netflix-report/CONTENT_INTERACTION/ViewingActivity.csv", viewing_activity)
+        zf.writestr("netflix-report/CONTENT_INTERACTION/Ratings.csv", RATINGS)
+        zf.writestr("netflix-report/PROFILES/Profiles.csv", "Profile Name\nalice\nbob\n")
+        zf.writestr("netflix-report/Cover sheet.pdf", "pdf")
+    return buffer.getvalue()
+
+
+def profile_export(profile: str) -> bytes:
+    """
+    An export with the viewing activity of profile only
+    """
+    header, *rows = VIEWING_ACTIVITY.splitlines(keepends=True)
+    return netflix_export(header + "".join(row.replace("alice,", f"{profile},") for row in rows if row.startswith("alice,")))
+
+
+def chatgpt_export() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name in ["conversations.json", "user.json", "message_feedback.json", "chat.html"]:
+            zf.writestr(name, "[]")
+    return buffer.getvalue()
+
+
+def df(rows, columns=("t", "v")):
+    return pd.DataFrame(rows, columns=list(columns))
+
+
+def test_merge_sorted_dfs_merges_in_order():
+    merged = netflix.merge_sorted_dfs([df([(1, "a"), (3, "c")]), df([(2, "b"), (4, "d")])], "t")
+
+    assert merged.values.tolist() == [[1, "a"], [2, "b"], [3, "c"], [4, "d"]]
+
+
+def test_merge_sorted_dfs_single_df_keeps_duplicate_rows():
+    single = df([(1, "a"), (1, "a"), (2, "b")])
+
+    merged = netflix.merge_sorted_dfs([single], "t")
+
+    pd.testing.assert_frame_equal(merged, single)
+
+
+def test_merge_sorted_dfs_deduplicates_across_exports():
+    # The same row in two exports of the same account is kept as often as in the export containing it most often
+    first = df([(1, "a"), (1, "a"), (2, "b")])
+    second = df([(1, "a"), (2, "b"), (2, "c")])
+
+    merged = netflix.merge_sorted_dfs([first, second], "t")
+
+    assert merged.values.tolist() == [[1, "a"], [1, "a"], [2, "b"], [2, "c"]]
+
+
+def test_merge_sorted_dfs_aligns_columns():
+    first = df([(1, "a")], columns=("t", "v"))
+    reordered = df([("b", 2)], columns=("v", "t"))
+    missing = df([(3,)], columns=("t",))
+
+    merged = netflix.merge_sorted_dfs([first, reordered, missing], "t")
+
+    assert list(merged.columns) == ["t", "v"]
+    assert merged.values.tolist() == [[1, "a"], [2, "b"]]
+
+
+def test_merge_sorted_dfs_without_data():
+    assert netflix.merge_sorted_dfs([], "t").empty
+    assert netflix.merge_sorted_dfs([pd.DataFrame()], "t").empty
+    assert netflix.merge_sorted_dfs([df([(1, "a")], columns=("x", "v"))], "t").empty
+
+
+def test_validate_zip_accepts_an_export(tmp_path):
+    path = tmp_path / "netflix.zip"
+    path.write_bytes(netflix_export())
+
+    validation = netflix.validate_zip(path)
+
+    assert validation.status_code.id == 0
+    assert validation.ddp_category.id == "csv"
+
+
+def test_validate_zip_accepts_an_export_nested_next_to_another_platform(tmp_path):
+    path = tmp_path / "exports.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("exports/netflix.zip", netflix_export())
+        zf.writestr("exports/chatgpt.zip", chatgpt_export())
+
+    validation = netflix.validate_zip(path)
+
+    assert validation.status_code.id == 0
+    assert validation.ddp_category.id == "csv"
+
+
+def test_validate_zip_rejects_another_platform(tmp_path):
+    path = tmp_path / "chatgpt.zip"
+    path.write_bytes(chatgpt_export())
+
+    validation = netflix.validate_zip(path)
+
+    assert validation.status_code.id == 2
+    assert validation.ddp_category is None
+
+
+def test_viewing_activity_of_a_nested_export(tmp_path):
+    path = tmp_path / "exports.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("exports/netflix.zip", netflix_export())
+
+    viewings = netflix.viewing_activity_to_df(str(path), "alice")
+
+    assert viewings["Titel"].tolist() == ["Show: Episode 1"]
+
+
+def test_find_exports_lists_every_nested_export(tmp_path):
+    path = tmp_path / "exports.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("acc1.zip", profile_export("alice"))
+        zf.writestr("acc2.zip", profile_export("bob"))
+
+    exports = netflix.find_exports(str(path))
+
+    assert [export.members for export in exports] == [("acc1.zip",), ("acc2.zip",)]
+    assert [netflix.extract_users(export) for export in exports] == [["alice"], ["bob"]]
+    assert netflix.viewing_activity_to_df(exports[1], "bob")["Titel"].tolist() == ["Show: Episode 1"]
+
+
+def test_find_exports_returns_an_upload_with_one_export_as_is(tmp_path):
+    path = tmp_path / "exports.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("exports/netflix.zip", netflix_export())
+        zf.writestr("exports/chatgpt.zip", chatgpt_export())
+
+    assert netflix.find_exports(str(path)) == [str(path)]
+
+
+def test_validate_zip_rejects_exports_that_are_not_in_zips_of_their_own(tmp_path):
+    path = tmp_path / "exports.zip"
+    with zipfile.ZipFile(path, "w") as zf, zipfile.ZipFile(io.BytesIO(netflix_export())) as export:
+        for folder in ["acc1", "acc2"]:
+            for name in export.namelist():
+                zf.writestr(f"{folder}/{name}", export.read(name))
+
+    validation = netflix.validate_zip(path)
+
+    assert validation.status_code.id == 4
+    assert validation.ddp_category is None
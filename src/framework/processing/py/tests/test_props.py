@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import port.api.props as props
+import port.donation as donation
+from port.api.commands import CommandUITablePage
+
+
+def title() -> props.Translatable:
+    return props.Translatable({"en": "Title", "nl": "Titel"})
+
+
+TABLES = {
+    "strings": pd.DataFrame({"a": ["x", None, "x", "y"]}),
+    "numbers": pd.DataFrame({"i": [1, 2, 3], "f": [0.1, np.nan, 1 / 3]}),
+    "bools": pd.DataFrame({"b": [True, False, True]}),
+    "datetimes": pd.DataFrame({"d": pd.to_datetime(["2023-01-01 10:00:00", None, "2024-02-29 23:59:59.123"], format="ISO8601")}),
+    "tz_aware": pd.DataFrame({"d": pd.to_datetime(["2023-01-01 10:00:00", "2023-07-01 10:00:00"]).tz_localize("Europe/Amsterdam")}),
+    "mixed": pd.DataFrame({"s": ["a", "b"], "n": [1.5, 2], "t": pd.to_datetime(["2023-01-01", "2023-01-02"], utc=True)}),
+    "empty": pd.DataFrame({"a": pd.Series([], dtype=object)}),
+}
+
+
+@pytest.mark.parametrize("name", TABLES)
+def test_to_columns_decodes_to_the_rows_of_to_json(name):
+    df = TABLES[name]
+
+    from_columns = donation.columns_to_rows(props.to_columns(df))
+    from_json = donation.data_frame_json_to_rows(df.to_json())
+
+    assert from_columns == from_json
+
+
+def test_to_columns_tz_aware_is_utc():
+    df = TABLES["tz_aware"]
+
+    (column,) = props.to_columns(df)
+
+    expected = (df["d"].dt.tz_convert("UTC") - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1)
+    assert column["kind"] == "datetime"
+    assert column["values"].tolist() == expected.astype(float).tolist()
+
+
+def test_paged_table_sends_the_first_page():
+    df = pd.DataFrame({"n": range(25)})
+    table = props.PropsUIPromptConsentFormTable("t", title(), df, page_size=10)
+
+    out = table.toDict()
+
+    assert out["page_size"] == 10
+    assert out["page_count"] == 3
+    assert donation.data_frame_json_to_rows(out["data_frame"]) == [{"n": str(i)} for i in range(10)]
+    assert out["aggregates"]["total_rows"] == 25
+
+
+def test_table_page_command_carries_the_rows_of_the_page():
+    df = pd.DataFrame({"n": range(25)})
+    table = props.PropsUIPromptConsentFormTable("t", title(), df, page_size=10, transport="columnar")
+
+    out = CommandUITablePage(table, 2).toDict()
+
+    assert (out["__type__"], out["table_id"], out["page"], out["page_count"]) == ("CommandUITablePage", "t", 2, 3)
+    assert donation.columns_to_rows(out["columns"]) == [{"n": str(i)} for i in range(20, 25)]
+
+
+def test_pages_divide_the_sample():
+    df = pd.DataFrame({"n": range(100)})
+    table = props.PropsUIPromptConsentFormTable("t", title(), df, preview_size=10, page_size=4)
+
+    pages = [table.page_rows(page) for page in range(table.page_count())]
+
+    assert [len(rows) for rows in pages] == [4, 4, 2]
+    assert sum(pages, []) == table.preview_rows()
+
+
+def test_deferred_table_is_evaluated_once():
+    calls = []
+
+    def produce():
+        calls.append(1)
+        return pd.DataFrame({"n": range(5)})
+
+    table = props.PropsUIPromptConsentFormTable("t", title(), produce)
+
+    assert not table.is_materialized()
+    assert len(donation.data_frame_json_to_rows(table.toDict()["data_frame"])) == 5
+    assert len(table.materialize()) == 5
+    assert calls == [1]
+
+
+def test_deferred_table_from_batches():
+    batches = (pd.DataFrame({"n": [i, i + 1]}) for i in range(0, 6, 2))
+    table = props.PropsUIPromptConsentFormTable("t", title(), batches)
+
+    assert table.materialize()["n"].tolist() == list(range(6))
+
+
+def test_folded_deferred_paged_table_is_evaluated_when_opened():
+    def produce():
+        raise AssertionError("evaluated before the table was opened")
+
+    table = props.PropsUIPromptConsentFormTable("t", title(), produce, folded=True, page_size=10)
+
+    out = table.toDict()
+
+    assert out["page_count"] is None and out["aggregates"] is None
+    assert donation.data_frame_json_to_rows(out["data_frame"]) == []
+    assert not table.is_materialized()
+
+
+def test_preview_samples_rows_and_aggregates_all_rows():
+    df = pd.DataFrame({"n": range(100)})
+    table = props.PropsUIPromptConsentFormTable("t", title(), df, preview_size=10)
+
+    rows = table.preview_rows()
+    out = table.toDict()
+
+    assert table.is_sampled()
+    assert len(rows) == 10 and rows == sorted(rows)
+    assert len(donation.data_frame_json_to_rows(out["data_frame"])) == 10
+    assert out["aggregates"]["total_rows"] == 100
+    assert out["aggregates"]["columns"]["n"]["sum"] == sum(range(100))
+
+
+def test_preview_strata_represents_every_value():
+    df = pd.DataFrame({"group": ["big"] * 95 + ["small"] * 5, "n": range(100)})
+    table = props.PropsUIPromptConsentFormTable("t", title(), df, preview_size=10, preview_strata="group")
+
+    sample = table.preview()
+
+    assert len(sample) == 10
+    assert set(sample["group"]) == {"big", "small"}
+
+
+def test_small_table_is_not_sampled():
+    df = pd.DataFrame({"n": range(5)})
+    table = props.PropsUIPromptConsentFormTable("t", title(), df, preview_size=10)
+
+    assert not table.is_sampled()
+    assert table.preview_rows() == list(range(5))
+
+
+def test_first_table_page_carries_the_aggregates():
+    table = props.PropsUIPromptConsentFormTable("t", title(), pd.DataFrame({"n": range(25)}), page_size=10)
+
+    assert CommandUITablePage(table, 0).toDict()["aggregates"]["total_rows"] == 25
+    assert "aggregates" not in CommandUITablePage(table, 1).toDict()
@@ -0,0 +1,36 @@
+import zipfile
+
+import port.platforms.registry as registry
+import port.unzipddp as unzipddp
+
+
+def write_zip(path, names: list[str]) -> str:
+    with zipfile.ZipFile(path, "w") as zf:
+        for name in names:
+            zf.writestr(name, "[]")
+    return str(path)
+
+
+def test_detect_platforms(tmp_path):
+    netflix = write_zip(tmp_path / "netflix.zip", ["netflix-report/ViewingActivity.csv", "netflix-report/Ratings.csv", "netflix-report/Profiles.csv"])
+    chatgpt = write_zip(tmp_path / "chatgpt.zip", ["conversations.json", "user.json", "chat.html"])
+
+    assert registry.detect(netflix).platform.name == "netflix"
+    assert registry.detect(chatgpt).platform.name == "chatgpt"
+
+
+def test_detect_unknown_and_bad_zips(tmp_path):
+    unknown = write_zip(tmp_path / "unknown.zip", ["holiday.jpg"])
+    bad = tmp_path / "bad.zip"
+    bad.write_bytes(b"not a zip")
+
+    assert registry.detect(unknown) is None
+    assert registry.detect(str(bad)) is None
+    assert registry.detect(str(tmp_path / "missing.zip")) is None
+
+
+def test_detect_returns_none_when_limits_are_exceeded(tmp_path, monkeypatch):
+    monkeypatch.setattr(unzipddp, "MAX_MEMBERS", 2)
+    path = write_zip(tmp_path / "netflix.zip", ["ViewingActivity.csv", "Ratings.csv", "Profiles.csv"])
+
+    assert registry.detect(path) is None
@@ -0,0 +1,67 @@
+import json
+import zipfile
+
+import port
+import port.donation as donation
+from port.api.payloads import Payload
+
+from test_netflix import netflix_export, profile_export
+
+
+def run_flow(path: str, selected_user: str) -> tuple[list[str], dict[str, str]]:
+    """
+    Runs the donation flow like the host does, the participant donates without deleting rows
+    """
+    script = port.start("test")
+    command = script.send(None)
+    pages = []
+    donations = {}
+    while command["__type__"] != "CommandSystemExit":
+        payload = Payload("PayloadVoid", None)
+        if command["__type__"] == "CommandSystemDonate":
+            donations[command["key"]] = command["json_string"]
+        elif command["__type__"] == "CommandSystemDonateBatch":
+            donations.update({d["key"]: d["json_string"] for d in command["donations"]})
+        elif command["__type__"] == "CommandUIRender":
+            body = command["page"].get("body") or {}
+            pages.append(body.get("__type__", command["page"]["__type__"]))
+            if body.get("__type__") == "PropsUIPromptFileInput":
+                payload = Payload("PayloadString", path)
+            elif body.get("__type__") == "PropsUIPromptRadioInput":
+                pages[-1] += ":" + ",".join(item["value"] for item in body["items"])
+                payload = Payload("PayloadString", selected_user)
+            elif body.get("__type__") == "PropsUIPromptConsentForm":
+                payload = Payload("PayloadJSON", json.dumps([
+                    {table["id"]: donation.data_frame_json_to_rows(table["data_frame"])} for table in body["tables"]
+                ]))
+            elif body.get("__type__") == "PropsUIPromptQuestionnaire":
+                payload = Payload("PayloadJSON", "{}")
+        command = script.send(payload)
+    return pages, donations
+
+
+def test_donation_flow(tmp_path):
+    path = tmp_path / "netflix.zip"
+    path.write_bytes(netflix_export())
+
+    pages, donations = run_flow(str(path), "alice")
+
+    assert pages == ["PropsUIPromptFileInput", "PropsUIPromptRadioInput:alice,bob", "PropsUIPromptConsentForm", "PropsUIPromptQuestionnaire"]
+    assert {"test-tracking", "test-Netflix", "test-questionnaire-donation"} <= set(donations)
+    donated = {table_id: rows for item in json.loads(donations["test-Netflix"]) for table_id, rows in item.items()}
+    assert [row["Titel"] for row in donated["netflix_viewings"]] == ["Show: Episode 1"]
+    assert [row["Titel"] for row in donated["netflix_rating"]] == ["Movie"]
+
+
+def test_donation_flow_of_an_upload_with_several_exports(tmp_path):
+    path = tmp_path / "exports.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("acc1.zip", profile_export("alice"))
+        zf.writestr("acc2.zip", profile_export("bob"))
+
+    pages, donations = run_flow(str(path), "bob")
+
+    assert pages[1] == "PropsUIPromptRadioInput:alice,bob"
+    donated = {table_id: rows for item in json.loads(donations["test-Netflix"]) for table_id, rows in item.items()}
+    assert [row["Titel"] for row in donated["netflix_viewings"]] == ["Show: Episode 1"]
+    assert "netflix_rating" not in donated
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import signal
+
+import pytest
+
+import port.server as server
+
+
+def test_sessions_wait_for_a_free_worker():
+    async def scenario():
+        host = server.SessionHost(workers=1)
+        host.start()
+        try:
+            first, command = await host.open_session("first")
+            assert command["__type__"] != "CommandUIRender" or command["page"]["__type__"] != "PropsUIPageError"
+
+            second = asyncio.create_task(host.open_session("second"))
+            await asyncio.sleep(0.2)
+            assert not second.done()
+
+            await host.close_session(first)
+            key, _ = await asyncio.wait_for(second, 30)
+            await host.close_session(key)
+        finally:
+            host.stop()
+
+    asyncio.run(scenario())
+
+
+def test_a_worker_that_dies_is_replaced():
+    async def scenario():
+        host = server.SessionHost(workers=1)
+        host.start()
+        try:
+            key, _ = await host.open_session("first")
+            worker = host._sessions[key]
+            # Same as the kernel does when the worker runs out of memory
+            os.kill(worker.process.pid, signal.SIGKILL)
+            worker.process.join()
+
+            with pytest.raises(server.WorkerDiedError):
+                await host.send(key, {"__type__": "PayloadVoid", "value": None})
+            await host.close_session(key)
+
+            key, command = await asyncio.wait_for(host.open_session("second"), 30)
+            assert host._sessions[key] is not worker
+            assert host._sessions[key].is_alive()
+            assert command["__type__"] != "CommandUIRender" or command["page"]["__type__"] != "PropsUIPageError"
+            await host.close_session(key)
+        finally:
+            host.stop()
+
+    asyncio.run(scenario())
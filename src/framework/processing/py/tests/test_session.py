@@ -0,0 +1,63 @@
+import logging
+import zipfile
+
+import port.session as session
+import port.unzipddp as unzipddp
+
+
+def test_sessions_keep_their_own_logs():
+    session.install_log_handler()
+    logger = logging.getLogger("tests.session")
+    first = session.Session("first")
+    second = session.Session("second")
+
+    with first.activate():
+        logger.info("message of first")
+        with second.activate():
+            logger.info("message of second")
+
+    assert "message of first" in first.log_stream.getvalue()
+    assert "message of second" not in first.log_stream.getvalue()
+    assert "message of second" in second.log_stream.getvalue()
+    assert session.current() is not first
+
+
+def test_logs_outside_of_a_session_are_not_buffered():
+    session.install_log_handler()
+    logger = logging.getLogger("tests.session")
+
+    logger.info("message outside of a session")
+
+    assert "message outside of a session" not in session.current().log_stream.getvalue()
+
+
+def test_install_log_handler_keeps_the_handlers_of_the_host():
+    records = []
+    console = logging.Handler()
+    console.emit = records.append
+    root = logging.getLogger()
+    root.addHandler(console)
+    try:
+        session.install_log_handler()
+        session.install_log_handler()
+        logging.getLogger("tests.session").info("message for the host")
+    finally:
+        root.removeHandler(console)
+
+    assert [record.getMessage() for record in records] == ["message for the host"]
+    assert sum(isinstance(handler, session.SessionLogHandler) for handler in root.handlers) == 1
+
+
+def test_logs_of_decompression_threads_end_up_in_the_active_session(tmp_path, monkeypatch):
+    monkeypatch.setattr(unzipddp, "PARALLEL_DECOMPRESSION", True)
+    session.install_log_handler()
+    path = tmp_path / "export.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("a.csv", "a\n")
+
+    active = session.Session("active")
+    with active.activate():
+        unzipddp.extract_files_from_zip(str(path), ["Missing1.csv", "Missing2.csv"], max_workers=2)
+
+    logs = active.log_stream.getvalue()
+    assert "Missing1.csv" in logs and "Missing2.csv" in logs
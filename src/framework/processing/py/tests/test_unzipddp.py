@@ -0,0 +1,172 @@
+import io
+import zipfile
+
+import pytest
+
+import port.blockcache as blockcache
+import port.unzipddp as unzipddp
+from port.my_exceptions import ZipResourceLimitError
+
+# Compresses to a few KB, far beyond MAX_COMPRESSION_RATIO
+RATIO_BOMB = b"\0" * (unzipddp.RATIO_CHECK_MIN_SIZE * 2)
+
+
+def make_zip(files: dict[str, bytes], compression: int = zipfile.ZIP_DEFLATED) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def write_zip(path, files: dict[str, bytes], compression: int = zipfile.ZIP_DEFLATED) -> str:
+    path.write_bytes(make_zip(files, compression))
+    return str(path)
+
+
+def test_check_zip_limits_accepts_a_normal_zip(tmp_path):
+    path = write_zip(tmp_path / "ok.zip", {"a.csv": b"a,b\n1,2\n"})
+
+    with unzipddp.open_zip(path) as zf:
+        unzipddp.check_zip_limits(zf)
+
+
+def test_check_zip_limits_rejects_a_compression_ratio_bomb(tmp_path):
+    path = write_zip(tmp_path / "bomb.zip", {"a.csv": b"a\n", "Clickstream.csv": RATIO_BOMB})
+
+    with unzipddp.open_zip(path) as zf, pytest.raises(ZipResourceLimitError):
+        unzipddp.check_zip_limits(zf)
+
+
+def test_check_zip_limits_only_checks_included_files(tmp_path):
+    path = write_zip(tmp_path / "bomb.zip", {"a.csv": b"a\n", "Clickstream.csv": RATIO_BOMB})
+
+    with unzipddp.open_zip(path) as zf:
+        unzipddp.check_zip_limits(zf, lambda info: info.filename == "a.csv")
+        with pytest.raises(ZipResourceLimitError):
+            unzipddp.check_zip_limits(zf, lambda info: info.filename == "Clickstream.csv")
+
+
+def test_check_zip_limits_checks_the_number_of_files_of_excluded_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(unzipddp, "MAX_MEMBERS", 2)
+    path = write_zip(tmp_path / "many.zip", {f"{i}.csv": b"a\n" for i in range(3)})
+
+    with unzipddp.open_zip(path) as zf, pytest.raises(ZipResourceLimitError, match="more than 2 files"):
+        unzipddp.check_zip_limits(zf, lambda info: False)
+
+
+def test_read_member_stops_at_the_declared_size(tmp_path):
+    path = write_zip(tmp_path / "ok.zip", {"a.csv": b"x" * 100})
+
+    with unzipddp.open_zip(path) as zf:
+        info = zf.getinfo("a.csv")
+        assert unzipddp.read_member(zf, info).getvalue() == b"x" * 100
+        with pytest.raises(ZipResourceLimitError):
+            unzipddp.read_member(zf, info, max_size=10)
+
+
+def test_open_zip_reopens_a_changed_upload(tmp_path):
+    path = write_zip(tmp_path / "upload.zip", {"a.csv": b"a\n"})
+    with unzipddp.open_zip(path) as zf:
+        assert zf.namelist() == ["a.csv"]
+
+    write_zip(tmp_path / "upload.zip", {"b.csv": b"b\n", "c.csv": b"c\n"})
+    with unzipddp.open_zip(path) as zf:
+        assert zf.namelist() == ["b.csv", "c.csv"]
+
+
+def test_open_zip_closes_evicted_uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(unzipddp, "MAX_OPEN_UPLOADS", 1)
+    first_path = write_zip(tmp_path / "first.zip", {"a.csv": b"a\n"})
+    second_path = write_zip(tmp_path / "second.zip", {"b.csv": b"b\n"})
+
+    with unzipddp.open_zip(first_path) as first:
+        pass
+    with unzipddp.open_zip(second_path):
+        pass
+
+    assert first.fp is None
+    assert first_path not in unzipddp._open_uploads
+
+
+def test_open_zip_raises_on_a_bad_zipfile(tmp_path):
+    path = tmp_path / "bad.zip"
+    path.write_bytes(b"not a zip")
+
+    with pytest.raises(zipfile.BadZipFile):
+        with unzipddp.open_zip(str(path)):
+            pass
+
+
+def test_extract_files_from_zip_concurrently_from_nested_zips(tmp_path, monkeypatch):
+    monkeypatch.setattr(unzipddp, "PARALLEL_DECOMPRESSION", True)
+    files = {f"{i}.csv": f"column\n{i}\n".encode() * 1000 for i in range(8)}
+    inner = make_zip(files)
+    path = write_zip(tmp_path / "outer.zip", {"first.zip": inner, "second.zip": make_zip({"x.csv": b"x\n"})})
+
+    extracted = unzipddp.extract_files_from_zip(path, list(files) + ["x.csv", "missing.csv"], max_workers=4)
+
+    assert {name: buffer.getvalue() for name, buffer in extracted.items()} == {**files, "x.csv": b"x\n", "missing.csv": b""}
+
+
+def test_check_zip_limits_checks_files_in_nested_zips(tmp_path):
+    inner = make_zip({"Clickstream.csv": RATIO_BOMB})
+    path = write_zip(tmp_path / "outer.zip", {"export.zip": inner}, zipfile.ZIP_STORED)
+
+    with unzipddp.open_zip(path) as zf:
+        assert unzipddp.member_names(zf) == ["export.zip", "Clickstream.csv"]
+        with pytest.raises(ZipResourceLimitError):
+            unzipddp.check_zip_limits(zf)
+
+
+def test_walk_zip_skips_nested_files_that_are_not_zips(tmp_path):
+    path = write_zip(tmp_path / "outer.zip", {"junk.zip": b"not a zip", "export.zip": make_zip({"a.csv": b"a\n"})})
+
+    with unzipddp.open_zip(path) as zf:
+        assert unzipddp.member_names(zf) == ["junk.zip", "export.zip", "a.csv"]
+
+
+def test_extract_file_from_nested_zip(tmp_path):
+    inner = make_zip({"dir/a.csv": b"a,b\n1,2\n"})
+    path = write_zip(tmp_path / "outer.zip", {"exports/export.zip": inner})
+
+    assert unzipddp.extract_file_from_zip(path, "a.csv").getvalue() == b"a,b\n1,2\n"
+    assert unzipddp.member_size(path, "a.csv") == 8
+
+
+def test_open_zip_keeps_an_upload_and_its_nested_zips_open(tmp_path, monkeypatch):
+    inner = make_zip({"a.csv": b"a\n1\n", "b.csv": b"b\n2\n"})
+    path = write_zip(tmp_path / "outer.zip", {"export.zip": inner})
+
+    opened = []
+    block_cache_file = blockcache.BlockCacheFile
+
+    def spy(raw, *args, **kwargs):
+        opened.append(raw)
+        return block_cache_file(raw, *args, **kwargs)
+
+    monkeypatch.setattr(blockcache, "BlockCacheFile", spy)
+
+    with unzipddp.open_zip(path) as first:
+        pass
+    with unzipddp.open_zip(path) as second:
+        pass
+    assert first is second
+
+    assert unzipddp.extract_file_from_zip(path, "a.csv").getvalue() == b"a\n1\n"
+    assert unzipddp.extract_file_from_zip(path, "b.csv").getvalue() == b"b\n2\n"
+    assert unzipddp.member_size(path, "b.csv") == 4
+    nested_opens = [raw for raw in opened if isinstance(raw, zipfile.ZipExtFile)]
+    assert len(nested_opens) == 1
+
+
+def test_open_zip_opens_a_nested_zip(tmp_path):
+    inner = make_zip({"a.csv": b"inner\n"})
+    path = write_zip(tmp_path / "outer.zip", {"a.csv": b"outer\n", "exports/export.zip": inner})
+
+    nested = unzipddp.NestedZip(path, ("exports/export.zip",))
+
+    assert unzipddp.nested_zips_containing(path, "a.csv") == [unzipddp.NestedZip(path, ()), nested]
+    assert unzipddp.extract_file_from_zip(path, "a.csv").getvalue() == b"outer\n"
+    assert unzipddp.extract_file_from_zip(nested, "a.csv").getvalue() == b"inner\n"
+    assert zipfile.is_zipfile(nested)
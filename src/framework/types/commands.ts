@@ -1,5 +1,6 @@
 import { isInstanceOf } from '../helpers'
 import { isPropsUIPage, PropsUIPage } from './pages'
+import { TableAggregates, TableColumn } from './prompts'
 
 export interface Table {
   __type__: 'Table'
@@ -44,7 +45,8 @@ export type PayloadResolved =
   PayloadString |
   PayloadFile |
   PayloadFileArray |
-  PayloadJSON
+  PayloadJSON |
+  PayloadTablePageRequest
 
 export interface PayloadVoid {
   __type__: 'PayloadVoid'
@@ -79,6 +81,18 @@ export function isPayloadJSON (arg: any): arg is PayloadJSON {
   return isInstanceOf<PayloadJSON>(arg, 'PayloadJSON', ['value'])
 }
 
+// The consent form asks the script for a page of a paged table, the script responds with a CommandUITablePage
+export interface PayloadTablePageRequest {
+  __type__: 'PayloadTablePageRequest'
+  value: {
+    table_id: string
+    page: number
+  }
+}
+export function isPayloadTablePageRequest (arg: any): arg is PayloadTablePageRequest {
+  return isInstanceOf<PayloadTablePageRequest>(arg, 'PayloadTablePageRequest', ['value'])
+}
+
 export type Command =
   CommandUI |
   CommandSystem
@@ -89,11 +103,12 @@ export function isCommand (arg: any): arg is Command {
 
 export type CommandSystem =
   CommandSystemDonate |
+  CommandSystemDonateBatch |
   CommandSystemEvent |
   CommandSystemExit
 
 export function isCommandSystem (arg: any): arg is CommandSystem {
-  return isCommandSystemDonate(arg) || isCommandSystemEvent(arg) || isCommandSystemExit(arg)
+  return isCommandSystemDonate(arg) || isCommandSystemDonateBatch(arg) || isCommandSystemEvent(arg) || isCommandSystemExit(arg)
 }
 
 export interface CommandSystemEvent {
@@ -114,21 +129,39 @@ export function isCommandSystemExit (arg: any): arg is CommandSystemExit {
 }
 
 export type CommandUI =
-  CommandUIRender
+  CommandUIRender |
+  CommandUITablePage
 
 export function isCommandUI (arg: any): arg is CommandUI {
-  return isCommandUIRender(arg)
+  return isCommandUIRender(arg) || isCommandUITablePage(arg)
 }
 
 export interface CommandSystemDonate {
   __type__: 'CommandSystemDonate'
   key: string
   json_string: string
+  chunk?: DonationChunk
+}
+
+// Present when the donation is part of a chunked donation, the router responds with PayloadTrue when the
+// bridge delivered it and with PayloadFalse to have it resent, see Bridge.sendChunk
+export interface DonationChunk {
+  index: number
+  sha256: string
 }
 export function isCommandSystemDonate (arg: any): arg is CommandSystemDonate {
   return isInstanceOf<CommandSystemDonate>(arg, 'CommandSystemDonate', ['key', 'json_string'])
 }
 
+export interface CommandSystemDonateBatch {
+  __type__: 'CommandSystemDonateBatch'
+  donations: CommandSystemDonate[]
+}
+export function isCommandSystemDonateBatch (arg: any): arg is CommandSystemDonateBatch {
+  return isInstanceOf<CommandSystemDonateBatch>(arg, 'CommandSystemDonateBatch', ['donations']) &&
+    Array.isArray(arg.donations) && arg.donations.every(isCommandSystemDonate)
+}
+
 export interface CommandUIRender {
   __type__: 'CommandUIRender'
   page: PropsUIPage
@@ -136,3 +169,18 @@ export interface CommandUIRender {
 export function isCommandUIRender (arg: any): arg is CommandUIRender {
   return isInstanceOf<CommandUIRender>(arg, 'CommandUIRender', ['page']) && isPropsUIPage(arg.page)
 }
+
+// Rows of a page of a paged consent form table, encoded like the rows of PropsUIPromptConsentFormTable
+export interface CommandUITablePage {
+  __type__: 'CommandUITablePage'
+  table_id: string
+  page: number
+  page_count: number
+  data_frame: string | null
+  columns?: TableColumn[]
+  // Sent with the first page, a deferred table only knows them once it is evaluated
+  aggregates?: TableAggregates
+}
+export function isCommandUITablePage (arg: any): arg is CommandUITablePage {
+  return isInstanceOf<CommandUITablePage>(arg, 'CommandUITablePage', ['table_id', 'page', 'page_count'])
+}
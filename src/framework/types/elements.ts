@@ -1,7 +1,7 @@
 import { isInstanceOf, isLike } from "../helpers"
 import {} from "./commands"
 import { isPropsUIPage, PropsUIPage } from "./pages"
-import { isPropsUIPrompt, PropsUIPrompt } from "./prompts"
+import { isPropsUIPrompt, PropsUIPrompt, TableAggregates } from "./prompts"
 
 export type PropsUI =
   | PropsUIText
@@ -392,6 +392,14 @@ export interface TableContext {
   visualizations?: any[]
   folded: boolean
   deleteOption: boolean
+  // Paged tables receive further pages on request, see CommandUITablePage
+  // A deferred table has no pages loaded and an unknown page count until it is opened
+  pageSize?: number
+  pageCount?: number
+  loadedPages?: number
+  // Sampled and paged tables show part of their rows, the aggregates are computed over all rows
+  previewSize?: number
+  aggregates?: TableAggregates
 }
 
 export type TableWithContext = TableContext & PropsUITable
@@ -1,4 +1,4 @@
-import { Command, Response, CommandSystem, CommandUI } from './commands'
+import { Command, Response, CommandSystem, CommandSystemDonate, CommandUIRender, CommandUITablePage } from './commands'
 
 export interface ProcessingEngine {
   start: () => void
@@ -8,12 +8,17 @@ export interface ProcessingEngine {
 
 export interface VisualisationEngine {
   start: (rootElement: HTMLElement, locale: string) => void
-  render: (command: CommandUI) => Promise<Response>
+  render: (command: CommandUIRender) => Promise<Response>
+  // Hands a page of a paged table to the consent form that asked for it, resolves with its next payload
+  renderTablePage: (command: CommandUITablePage) => Promise<Response>
   terminate: () => void
 }
 
 export interface Bridge {
   send: (command: CommandSystem) => void
+  // Sends a chunk of a chunked donation, resolves with whether the host received it
+  // Bridges without it get their chunks through send, these chunks are never resent
+  sendChunk?: (command: CommandSystemDonate) => Promise<boolean>
 }
 
 export interface CommandHandler {
@@ -88,6 +88,26 @@ export interface PropsUIPromptConsentFormTable {
   visualizations: any
   folded: boolean
   delete_option: boolean
+  preview_size?: number
+  page_size?: number
+  // Missing for a folded paged table that is deferred, its rows are only produced when it is opened
+  page_count?: number | null
+  aggregates?: TableAggregates | null
+  columns?: TableColumn[]
+}
+
+// Sent instead of data_frame by tables with the columnar transport, values arrive as typed arrays
+export interface TableColumn {
+  name: string
+  kind: "number" | "bool" | "datetime" | "dictionary"
+  values: ArrayLike<number | null>
+  dictionary?: any[]
+}
+
+// Sent with sampled and paged tables, computed over all rows of the table
+export interface TableAggregates {
+  total_rows: number
+  columns: { [column: string]: { sum: number, mean: number | null, min: number | null, max: number | null } }
 }
 export function isPropsUIPromptConsentFormTable(arg: any): arg is PropsUIPromptConsentFormTable {
   return isInstanceOf<PropsUIPromptConsentFormTable>(arg, "PropsUIPromptConsentFormTable", [
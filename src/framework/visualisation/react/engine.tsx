@@ -1,8 +1,8 @@
 import * as ReactDOM from 'react-dom/client'
 import { VisualisationEngine } from '../../types/modules'
-import { Response, Payload, CommandUIRender } from '../../types/commands'
+import { Response, Payload, CommandUIRender, CommandUITablePage } from '../../types/commands'
 import { PropsUIPage } from '../../types/pages'
-import VisualisationFactory from './factory'
+import VisualisationFactory, { TablePageHandler } from './factory'
 import { Main } from './main'
 
 export default class ReactEngine implements VisualisationEngine {
@@ -11,6 +11,10 @@ export default class ReactEngine implements VisualisationEngine {
   locale!: string
   root!: ReactDOM.Root
 
+  // Resolves the command the current page responds to, after a table page this is the CommandUITablePage
+  pending?: (payload: Payload) => void
+  tablePageHandler?: TablePageHandler
+
   constructor (factory: VisualisationFactory) {
     this.factory = factory
   }
@@ -32,14 +36,37 @@ export default class ReactEngine implements VisualisationEngine {
     })
   }
 
+  async renderTablePage (command: CommandUITablePage): Promise<Response> {
+    return await new Promise<Response>((resolve) => {
+      // The page stays rendered, its next payload is the response to the table page
+      this.pending = (payload: Payload) => {
+        resolve({ __type__: 'Response', command, payload })
+      }
+      this.tablePageHandler?.(command)
+    })
+  }
+
   async renderPage (props: PropsUIPage): Promise<any> {
     return await new Promise<any>((resolve) => {
-      const context = { locale: this.locale, resolve }
+      this.pending = resolve
+      this.tablePageHandler = undefined
+      const context = {
+        locale: this.locale,
+        resolve: (payload: Payload) => this.resolvePending(payload),
+        onTablePage: (handler: TablePageHandler) => { this.tablePageHandler = handler }
+      }
       const page = this.factory.createPage(props, context)
       this.renderElements([page])
     })
   }
 
+  resolvePending (payload: Payload): void {
+    // Only the first payload is the response, the page waits for the next command before it can respond again
+    const pending = this.pending
+    this.pending = undefined
+    pending?.(payload)
+  }
+
   terminate (): void {
     console.log('[ReactEngine] stopped')
     this.root.unmount()
@@ -7,14 +7,18 @@ import {
   PropsUIPage
 } from '../../types/pages'
 import { DonationPage } from './ui/pages/donation_page'
-import { Payload } from '../../types/commands'
+import { CommandUITablePage, Payload } from '../../types/commands'
 import { ErrorPage } from './ui/pages/error_page'
 
 export interface ReactFactoryContext {
   locale: string
   resolve?: (payload: Payload) => void
+  // Registers the handler of the pages of paged tables the page asked for with a PayloadTablePageRequest
+  onTablePage?: (handler: TablePageHandler) => void
 }
 
+export type TablePageHandler = (command: CommandUITablePage) => void
+
 export default class ReactFactory {
   createPage (page: PropsUIPage, context: ReactFactoryContext): JSX.Element {
     if (isPropsUIPageEnd(page)) {
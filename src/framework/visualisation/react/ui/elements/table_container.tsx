@@ -7,15 +7,25 @@ import { Title4 } from "./text"
 import TextBundle from "../../../../text_bundle"
 import { Translator } from "../../../../translator"
 import { Table } from "./table"
+import { PrimaryButton } from "./button"
 
 interface TableContainerProps {
   id: string
   table: TableWithContext
   updateTable: (tableId: string, table: TableWithContext) => void
   locale: string
+  onLoadMore?: () => void
+  loadingMore?: boolean
 }
 
-export const TableContainer = ({ id, table, updateTable, locale }: TableContainerProps): JSX.Element => {
+export const TableContainer = ({
+  id,
+  table,
+  updateTable,
+  locale,
+  onLoadMore,
+  loadingMore = false,
+}: TableContainerProps): JSX.Element => {
   const tableVisualizations = table.visualizations != null ? table.visualizations : []
   const [searchFilterIds, setSearchFilterIds] = useState<Set<string>>()
   const [search, setSearch] = useState<string>("")
@@ -71,6 +81,23 @@ export const TableContainer = ({ id, table, updateTable, locale }: TableContaine
   }, [id, table])
 
   const unfilteredRows = table.body.rows.length
+  const loadedPages = table.loadedPages ?? 1
+  const deferred = loadedPages === 0
+  const morePages = deferred || (table.pageCount !== undefined && loadedPages < table.pageCount)
+
+  const totalRows = table.aggregates?.total_rows
+  const sampled = table.previewSize !== undefined && totalRows !== undefined && totalRows > table.previewSize
+  const aggregateColumns = Object.entries(table.aggregates?.columns ?? {})
+
+  function formatNumber(value: number | null): string {
+    return value === null ? "-" : value.toLocaleString(locale, { maximumFractionDigits: 2 })
+  }
+
+  function toggleShow(): void {
+    // The rows of a deferred table are produced when the participant opens it
+    if (!show && deferred && !loadingMore) onLoadMore?.()
+    setShow(!show)
+  }
 
   return (
     <div
@@ -88,13 +115,33 @@ export const TableContainer = ({ id, table, updateTable, locale }: TableContaine
         <div key="Description" className="flex flex-col w-full mb-2 text-base md:text-lg font-body max-w-2xl">
           <p>{table.description}</p>
         </div>
+        <div
+          key="Aggregates"
+          className={`flex flex-col w-full mb-2 text-base md:text-lg font-body max-w-2xl ${
+            totalRows !== undefined ? "" : "hidden"
+          }`}
+        >
+          <p className={sampled ? "font-bold" : "hidden"}>
+            {`${text.showingSample} ${formatNumber(table.previewSize ?? 0)} / ${formatNumber(totalRows ?? 0)} ${text.rows}. ${text.allRowsShared}`}
+          </p>
+          <p className={aggregateColumns.length > 0 ? "" : "hidden"}>
+            {`${text.computedOver} ${formatNumber(totalRows ?? 0)} ${text.rows}:`}
+          </p>
+          <ul className="list-disc ml-6">
+            {aggregateColumns.map(([column, { sum, mean, min, max }]) => (
+              <li key={column}>
+                {`${column}: ${text.sum} ${formatNumber(sum)}, ${text.mean} ${formatNumber(mean)}, ${text.min} ${formatNumber(min)}, ${text.max} ${formatNumber(max)}`}
+              </li>
+            ))}
+          </ul>
+        </div>
         <div key="TableSummary" className="flex items-center justify-between w-full mt-1 pt-1 rounded ">
           <TableItems table={table} searchedTable={searchedTable} handleUndo={handleUndo} locale={locale} />
 
           <button
             key={show ? "animate" : ""}
-            className={`flex end gap-3 animate-fadeIn ${unfilteredRows === 0 ? "hidden" : ""}`}
-            onClick={() => setShow(!show)}
+            className={`flex end gap-3 animate-fadeIn ${unfilteredRows === 0 && !deferred ? "hidden" : ""}`}
+            onClick={toggleShow}
           >
             <div key="zoomIcon" className="text-primary">
               {show ? zoomOutIcon : zoomInIcon}
@@ -117,6 +164,21 @@ export const TableContainer = ({ id, table, updateTable, locale }: TableContaine
             />
           </div>
         </div>
+        <div key="LoadMore" className={`flex flex-col gap-2 w-full mt-2 ${morePages ? "" : "hidden"}`}>
+          <p className="text-base md:text-lg font-body max-w-2xl">
+            {deferred
+              ? text.notLoadedDeferred
+              : `${text.pagesLoaded} ${loadedPages} / ${table.pageCount ?? 1}. ${text.notLoadedShared}`}
+          </p>
+          <div className="flex">
+            <PrimaryButton
+              label={deferred ? text.loadRows : text.loadMore}
+              onClick={() => onLoadMore?.()}
+              color="bg-tertiary text-grey1"
+              spinning={loadingMore}
+            />
+          </div>
+        </div>
         <div
           key="Visualizations"
           className={`pt-2 grid w-full gap-4 transition-all ${
@@ -238,4 +300,23 @@ const translations = {
   searchPlaceholder: new TextBundle().add("en", "Search").add("nl", "Zoeken"),
   showTable: new TextBundle().add("en", "Show table").add("nl", "Tabel tonen"),
   hideTable: new TextBundle().add("en", "Hide table").add("nl", "Tabel verbergen"),
+  showingSample: new TextBundle().add("en", "Showing a sample of").add("nl", "Getoond wordt een steekproef van"),
+  rows: new TextBundle().add("en", "rows").add("nl", "rijen"),
+  allRowsShared: new TextBundle()
+    .add("en", "All rows of this table will be shared, except the rows you delete.")
+    .add("nl", "Alle rijen van deze tabel worden gedeeld, behalve de rijen die u verwijdert."),
+  computedOver: new TextBundle().add("en", "Computed over all").add("nl", "Berekend over alle"),
+  sum: new TextBundle().add("en", "sum").add("nl", "som"),
+  mean: new TextBundle().add("en", "mean").add("nl", "gemiddelde"),
+  min: new TextBundle().add("en", "min").add("nl", "min"),
+  max: new TextBundle().add("en", "max").add("nl", "max"),
+  loadMore: new TextBundle().add("en", "Load more rows").add("nl", "Meer rijen laden"),
+  loadRows: new TextBundle().add("en", "Load rows").add("nl", "Rijen laden"),
+  notLoadedDeferred: new TextBundle()
+    .add("en", "The rows of this table are not loaded yet. If you do not load them, no rows of this table will be shared.")
+    .add("nl", "De rijen van deze tabel zijn nog niet geladen. Als u ze niet laadt, worden er geen rijen van deze tabel gedeeld."),
+  pagesLoaded: new TextBundle().add("en", "Pages loaded:").add("nl", "Pagina's geladen:"),
+  notLoadedShared: new TextBundle()
+    .add("en", "Rows on pages that are not loaded will also be shared.")
+    .add("nl", "Rijen op pagina's die niet zijn geladen worden ook gedeeld."),
 }
@@ -32,7 +32,7 @@ export const DonationPage = (props: Props): JSX.Element => {
   const { locale, resolve } = props
 
   function renderBody (props: Props): JSX.Element {
-    const context = { locale: locale, resolve: props.resolve }
+    const context = { locale: locale, resolve: props.resolve, onTablePage: props.onTablePage }
     const body = props.body
     if (isPropsUIPromptFileInput(body)) {
       return <FileInput {...body} {...context} />
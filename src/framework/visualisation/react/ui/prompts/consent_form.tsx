@@ -7,7 +7,8 @@ import {
   TableWithContext,
   TableContext,
 } from "../../../../types/elements"
-import { PropsUIPromptConsentForm, PropsUIPromptConsentFormTable } from "../../../../types/prompts"
+import { PropsUIPromptConsentForm, PropsUIPromptConsentFormTable, TableColumn } from "../../../../types/prompts"
+import { CommandUITablePage } from "../../../../types/commands"
 import { LabelButton, PrimaryButton } from "../elements/button"
 import { BodyLarge } from "../elements/text"
 import TextBundle from "../../../../text_bundle"
@@ -29,12 +30,18 @@ export const ConsentForm = (props: Props): JSX.Element => {
   const { locale, resolve } = props
   const { description, donateQuestion, donateButton, cancelButton } = prepareCopy(props)
   const [isDonating, setIsDonating] = useState(false)
+  // Id of the table a page was requested for, the form cannot respond again until the page arrives
+  const [loadingTable, setLoadingTable] = useState<string>()
 
   useEffect(() => {
     setTables(parseTables(props.tables))
     setMetaTables(parseTables(props.metaTables))
   }, [props.tables])
 
+  useEffect(() => {
+    props.onTablePage?.(handleTablePage)
+  }, [props.onTablePage])
+
   const updateTable = useCallback((tableId: string, table: TableWithContext) => {
     setTables((tables) => {
       const index = tables.findIndex((table) => table.id === tableId)
@@ -51,6 +58,26 @@ export const ConsentForm = (props: Props): JSX.Element => {
     return text
   }
 
+  // Builds the same structure JSON.parse gives for a data_frame, so cells render and donate identically
+  function decodeColumns(columns: TableColumn[]): any {
+    const dataFrame: any = {}
+    for (const column of columns) {
+      const cells: any = {}
+      for (let row = 0; row < column.values.length; row++) {
+        const value = column.values[row]
+        if (column.kind === "dictionary") {
+          cells[`${row}`] = value === null || value < 0 ? null : column.dictionary?.[value]
+        } else if (column.kind === "bool") {
+          cells[`${row}`] = value === 1
+        } else {
+          cells[`${row}`] = value === null || Number.isNaN(value) ? null : value
+        }
+      }
+      dataFrame[column.name] = cells
+    }
+    return dataFrame
+  }
+
   function columnNames(dataFrame: any): string[] {
     return Object.keys(dataFrame)
   }
@@ -68,11 +95,13 @@ export const ConsentForm = (props: Props): JSX.Element => {
     }
   }
 
-  function rows(data: any): PropsUITableRow[] {
+  // Rows of a page are numbered from offset, so row ids stay unique when pages are appended
+  function rows(data: any, offset: number = 0): PropsUITableRow[] {
     const result: PropsUITableRow[] = []
+    if (columnCount(data) === 0) return result
     const n = rowCount(data)
     for (let row = 0; row <= n; row++) {
-      const id = `${row}`
+      const id = `${offset + row}`
       const cells = columnNames(data).map((column: string) => rowCell(data, column, row))
       result.push({ id, cells })
     }
@@ -89,7 +118,7 @@ export const ConsentForm = (props: Props): JSX.Element => {
     const description =
       tableData.description !== undefined ? Translator.translate(tableData.description, props.locale) : ""
     const deletedRowCount = 0
-    const dataFrame = JSON.parse(tableData.data_frame)
+    const dataFrame = tableData.columns != null ? decodeColumns(tableData.columns) : JSON.parse(tableData.data_frame)
     const headCells = columnNames(dataFrame).map((column: string) => column)
     const head: PropsUITableHead = {
       __type__: "PropsUITableHead",
@@ -113,16 +142,52 @@ export const ConsentForm = (props: Props): JSX.Element => {
       visualizations: tableData.visualizations,
       folded: tableData.folded || false,
       deleteOption: tableData.delete_option,
+      pageSize: tableData.page_size,
+      pageCount: tableData.page_count ?? undefined,
+      loadedPages: tableData.page_size != null && tableData.page_count == null ? 0 : 1,
+      previewSize: tableData.preview_size,
+      aggregates: tableData.aggregates ?? undefined,
+    }
+  }
+
+  function requestPage(table: TableWithContext): void {
+    if (loadingTable !== undefined || isDonating) return
+    setLoadingTable(table.id)
+    resolve?.({ __type__: "PayloadTablePageRequest", value: { table_id: table.id, page: table.loadedPages ?? 1 } })
+  }
+
+  function handleTablePage(command: CommandUITablePage): void {
+    const dataFrame = command.columns != null ? decodeColumns(command.columns) : JSON.parse(command.data_frame ?? "{}")
+    setTables((tables) =>
+      tables.map((table) => (table.id === command.table_id ? appendPage(table, command, dataFrame) : table))
+    )
+    setLoadingTable(undefined)
+  }
+
+  function appendPage(table: TableWithContext, command: CommandUITablePage, dataFrame: any): TableWithContext {
+    const pageRows = rows(dataFrame, command.page * (table.pageSize ?? 0))
+    // A deferred table learns its columns from its first page
+    const head = table.head.cells.length > 0 ? table.head : { ...table.head, cells: columnNames(dataFrame) }
+    return {
+      ...table,
+      head,
+      body: { ...table.body, rows: table.body.rows.concat(pageRows) },
+      originalBody: { ...table.originalBody, rows: table.originalBody.rows.concat(pageRows) },
+      pageCount: command.page_count,
+      loadedPages: command.page + 1,
+      aggregates: command.aggregates ?? table.aggregates,
     }
   }
 
   function handleDonate(): void {
+    if (loadingTable !== undefined) return
     setIsDonating(true)
     const value = serializeConsentData()
     resolve?.({ __type__: "PayloadJSON", value })
   }
 
   function handleCancel(): void {
+    if (loadingTable !== undefined) return
     resolve?.({ __type__: "PayloadFalse", value: false })
   }
 
@@ -178,7 +243,15 @@ export const ConsentForm = (props: Props): JSX.Element => {
         <div className="grid gap-8 max-w-full">
           {tables.map((table) => {
             return (
-              <TableContainer key={table.id} id={table.id} table={table} updateTable={updateTable} locale={locale} />
+              <TableContainer
+                key={table.id}
+                id={table.id}
+                table={table}
+                updateTable={updateTable}
+                locale={locale}
+                onLoadMore={() => requestPage(table)}
+                loadingMore={loadingTable === table.id}
+              />
             )
           })}
         </div>
@@ -191,6 +264,7 @@ export const ConsentForm = (props: Props): JSX.Element => {
               onClick={handleDonate}
               color="bg-success text-white"
               spinning={isDonating}
+              enabled={loadingTable === undefined}
             />
             <LabelButton label={cancelButton} onClick={handleCancel} color="text-grey1" />
           </div>
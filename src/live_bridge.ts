@@ -1,11 +1,16 @@
-import { CommandSystem, isCommandSystem } from './framework/types/commands'
+import { CommandSystem, CommandSystemDonate, isCommandSystem } from './framework/types/commands'
 import { Bridge } from './framework/types/modules'
 
+// A chunk that is not acknowledged within this time is resent
+const CHUNK_ACKNOWLEDGEMENT_TIMEOUT = 60000
+
 export default class LiveBridge implements Bridge {
   port: MessagePort
+  acknowledgeChunks: boolean
 
-  constructor (port: MessagePort) {
+  constructor (port: MessagePort, acknowledgeChunks = false) {
     this.port = port
+    this.acknowledgeChunks = acknowledgeChunks
   }
 
   static create (window: Window, callback: (bridge: Bridge, locale: string) => void): void {
@@ -13,7 +18,8 @@ export default class LiveBridge implements Bridge {
       console.log('MESSAGE RECEIVED', event)
       // Skip webpack messages
       if (event.data.action === 'live-init') {
-        const bridge = new LiveBridge(event.ports[0])
+        // Hosts that acknowledge chunks reply to every chunk with { delivered: boolean } on the port sent with it
+        const bridge = new LiveBridge(event.ports[0], event.data.acknowledgeChunks === true)
         const locale = event.data.locale
         console.log('LOCALE', locale)
         callback(bridge, locale)
@@ -30,6 +36,30 @@ export default class LiveBridge implements Bridge {
     }
   }
 
+  async sendChunk (command: CommandSystemDonate): Promise<boolean> {
+    if (!this.acknowledgeChunks) {
+      this.send(command)
+      return true
+    }
+
+    return await new Promise<boolean>((resolve) => {
+      const channel = new MessageChannel()
+      const timeout = setTimeout(() => {
+        this.log('error', 'chunk was not acknowledged', command.key)
+        channel.port1.close()
+        resolve(false)
+      }, CHUNK_ACKNOWLEDGEMENT_TIMEOUT)
+
+      channel.port1.onmessage = (event) => {
+        clearTimeout(timeout)
+        channel.port1.close()
+        resolve(event.data?.delivered === true)
+      }
+      this.log('info', 'send chunk', command.key)
+      this.port.postMessage(command, [channel.port2])
+    })
+  }
+
   private log (level: 'info' | 'error', ...message: any[]): void {
     const logger = level === 'info' ? console.log : console.error
     logger('[LiveBridge]', ...message)